@@ -4,12 +4,22 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 import os
 
+from app.services.db_routing import RoutingSession
+
 # Inicializar extensiones
-db = SQLAlchemy()
+# (RoutingSession: lecturas de endpoints @read_replica a la réplica si está configurada)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
-def create_app(config_name=None):
-    """Factory para crear la aplicación Flask"""
+def create_app(config_name=None, with_routes=True):
+    """
+    Factory para crear la aplicación Flask
+
+    Args:
+        config_name (str): 'development', 'production' o 'testing'
+        with_routes (bool): False para scripts de administración (solo BD y modelos):
+            omite blueprints, métricas, contabilidad de uso y captura de tráfico
+    """
 
     if config_name is None:
         config_name = os.environ.get('ENVIRONMENT', 'development')
@@ -18,6 +28,10 @@ def create_app(config_name=None):
     import os as os_module
     template_dir = os_module.path.abspath(os_module.path.join(os_module.path.dirname(__file__), '..', 'templates'))
 
+    # Logging asíncrono (cola + hilo listener, JSON) antes de cualquier log del arranque
+    from app.services.log_pipeline import setup_logging
+    setup_logging()
+
     app = Flask(__name__, template_folder=template_dir)
     
     # Configuración básica
@@ -27,17 +41,17 @@ def create_app(config_name=None):
     # Inicializar extensiones
     db.init_app(app)
 
+    # Versión de configuración (ETag y cachés por worker): se incrementa en cada escritura
+    # de métodos, zonas u orígenes, también desde los scripts de administración
+    from app.services.config_cache import init_config_version
+    init_config_version()
+
     # Configurar Flask-Login
     login_manager.init_app(app)
     login_manager.login_view = 'shipping.login'
     login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
     login_manager.login_message_category = 'warning'
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        from app.models import AdminUser
-        return AdminUser.query.get(int(user_id))
-
     # ========================================
     # MANEJAR RECONEXIÓN DE BD
     # ========================================
@@ -46,10 +60,48 @@ def create_app(config_name=None):
         """Cerrar sesión de BD al final de cada request"""
         db.session.remove()
     
+    if with_routes:
+        register_web(app)
+
+    # Migraciones versionadas: una consulta a schema_version; aplica pendientes bajo lock
+    with app.app_context():
+        from app.migrations import migrate_on_boot
+        migrate_on_boot(db.engine, auto_migrate=app.config.get('AUTO_MIGRATE', True))
+
+    return app
+
+
+def register_web(app):
+    """Blueprints, endpoints y middleware del servicio web"""
+
     # Registrar blueprints
     from app.routes import shipping
     app.register_blueprint(shipping.bp)
 
+    # Usuario de la sesión con caché por worker (sin consultar la BD en cada request)
+    from app.services.user_cache import init_user_cache
+    init_user_cache(login_manager)
+
+    # Métricas Prometheus (/metrics)
+    from app.services.metrics import init_metrics
+    init_metrics(app, db)
+
+    # Contabilidad de uso de Google Maps (volcado periódico a google_api_usage)
+    from app.services.usage import usage_tracker
+    usage_tracker.init_app(app)
+
+    # Mapa de calor de demanda (volcado periódico a quote_demand_cells)
+    from app.services.demand_heatmap import demand_aggregator
+    demand_aggregator.init_app(app)
+
+    # Direcciones validadas para el autocompletado (volcado periódico a address_suggestions)
+    from app.services.address_index import address_recorder
+    address_recorder.init_app(app)
+
+    # Captura de tráfico para replay (opt-in con TRAFFIC_CAPTURE_FILE)
+    from app.services.traffic_capture import init_traffic_capture
+    init_traffic_capture(app)
+
     # Contexto global para templates
     @app.context_processor
     def inject_config():
@@ -63,45 +115,3 @@ def create_app(config_name=None):
     def index():
         """Dashboard principal"""
         return render_template('base.html')
-
-    # Auto-migración: Agregar columnas de días de la semana si no existen
-    with app.app_context():
-        try:
-            from sqlalchemy import text, inspect
-            inspector = inspect(db.engine)
-
-            # Verificar si existe la tabla shipping_methods
-            if 'shipping_methods' in inspector.get_table_names():
-                columns = [col['name'] for col in inspector.get_columns('shipping_methods')]
-
-                # Si no existe la columna available_monday, agregar todas las columnas de días
-                if 'available_monday' not in columns:
-                    print("⚙️  Agregando columnas de días de la semana...")
-                    db.session.execute(text("""
-                        ALTER TABLE shipping_methods
-                        ADD COLUMN available_monday BOOLEAN DEFAULT TRUE,
-                        ADD COLUMN available_tuesday BOOLEAN DEFAULT TRUE,
-                        ADD COLUMN available_wednesday BOOLEAN DEFAULT TRUE,
-                        ADD COLUMN available_thursday BOOLEAN DEFAULT TRUE,
-                        ADD COLUMN available_friday BOOLEAN DEFAULT TRUE,
-                        ADD COLUMN available_saturday BOOLEAN DEFAULT TRUE,
-                        ADD COLUMN available_sunday BOOLEAN DEFAULT TRUE
-                    """))
-                    db.session.commit()
-                    print("✓ Columnas de días agregadas")
-
-                    # Configurar "Envío Hoy" para lunes a viernes
-                    print("⚙️  Configurando 'Envío Hoy' para lunes a viernes...")
-                    db.session.execute(text("""
-                        UPDATE shipping_methods
-                        SET available_saturday = FALSE,
-                            available_sunday = FALSE
-                        WHERE code = 'envio_hoy'
-                    """))
-                    db.session.commit()
-                    print("✓ 'Envío Hoy' configurado para lunes a viernes")
-        except Exception as e:
-            print(f"⚠️  Error en auto-migración: {e}")
-            db.session.rollback()
-
-    return app
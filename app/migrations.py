@@ -0,0 +1,349 @@
+# app/migrations.py
+"""
+Migraciones versionadas del esquema
+- Las versiones aplicadas se guardan en schema_version (una fila por migración)
+- Al arrancar, create_app() lee las versiones aplicadas (una consulta sobre la PK) y solo
+  si hay migraciones pendientes las aplica bajo un lock (GET_LOCK en MySQL), de modo
+  que varios workers o contenedores arrancando a la vez no compiten. Si una migración
+  falla, el arranque falla (no se sirve sobre un esquema a medio migrar)
+- La migración 000 crea las tablas que falten desde los modelos: una base vacía queda
+  completa aunque las demás no tengan nada que alterar. Las migraciones que alteran
+  una tabla fallan si la tabla no existe, en vez de quedar registradas sin aplicarse
+- Cada migración es idempotente (verifica antes de alterar) para poder adoptar bases
+  existentes creadas con db.create_all(), con database/init.sql o con la auto-migración
+  anterior
+
+Para agregar una migración: escribir una función fn(conn) y sumarla al final de MIGRATIONS
+con la siguiente versión. CLI: python migrate.py [status|upgrade|stamp]
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import text, inspect
+
+Migration = namedtuple('Migration', ['version', 'name', 'upgrade'])
+
+LOCK_NAME = 'shipping_schema_migrations'
+LOCK_TIMEOUT_SECONDS = 120
+
+# Lock dentro del proceso (SQLite no tiene GET_LOCK)
+_process_lock = threading.Lock()
+
+
+# ========================================
+# HELPERS
+# ========================================
+
+def _table_exists(conn, table):
+    return inspect(conn).has_table(table)
+
+
+def _columns(conn, table):
+    return {col['name'] for col in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn, table):
+    return {index['name'] for index in inspect(conn).get_indexes(table)}
+
+
+def _require_table(conn, table):
+    """Fallar si la tabla no existe: la migración no puede quedar registrada sin aplicarse"""
+    if not _table_exists(conn, table):
+        raise RuntimeError(f"La tabla {table} no existe (¿falta la migración 000_baseline?)")
+
+
+def _create_model_indexes(conn, model):
+    """Crear los índices declarados en el modelo que falten"""
+    table = model.__table__
+    _require_table(conn, table.name)
+    existing = _indexes(conn, table.name)
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(conn)
+
+
+def _add_columns(conn, table, columns):
+    """
+    Agregar columnas que falten. columns: [(nombre, ddl)]
+    Retorna las columnas agregadas (vacío si ya estaban). Lanza RuntimeError si la
+    tabla no existe.
+    """
+    _require_table(conn, table)
+    existing = _columns(conn, table)
+    added = []
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+            added.append(name)
+    return added
+
+
+def _create_model_table(conn, model):
+    """Crear la tabla de un modelo si no existe"""
+    model.__table__.create(conn, checkfirst=True)
+
+
+def _long_text(conn):
+    return 'LONGTEXT' if conn.dialect.name == 'mysql' else 'TEXT'
+
+
+# ========================================
+# MIGRACIONES
+# ========================================
+
+def m000_baseline(conn):
+    """Crear las tablas que falten desde los modelos (base vacía o adoptada)"""
+    from app import db
+    from app import models  # noqa: F401  (registra las tablas en db.metadata)
+    # Solo crea tablas ausentes; las existentes (p. ej. de init.sql) las completan las siguientes
+    db.metadata.create_all(conn, checkfirst=True)
+
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def m001_weekday_columns(conn):
+    """Disponibilidad por día de la semana; 'Envío Hoy' solo de lunes a viernes"""
+    added = _add_columns(conn, 'shipping_methods', [
+        (f'available_{day}', 'BOOLEAN DEFAULT TRUE') for day in WEEKDAYS
+    ])
+    if added:
+        conn.execute(text("""
+            UPDATE shipping_methods
+            SET available_saturday = FALSE,
+                available_sunday = FALSE
+            WHERE code = 'envio_hoy'
+        """))
+
+
+def m002_pricing_mode(conn):
+    """Modo de tarifa por método (rangos de km o polígonos)"""
+    _add_columns(conn, 'shipping_methods', [
+        ('pricing_mode', "VARCHAR(20) DEFAULT 'distance'")
+    ])
+
+
+def m003_polygon_zones(conn):
+    """Zonas poligonales"""
+    _add_columns(conn, 'shipping_zones', [
+        ('zone_type', "VARCHAR(20) DEFAULT 'distance'"),
+        ('name', 'VARCHAR(100) NULL'),
+        ('polygon', f'{_long_text(conn)} NULL'),
+    ])
+
+
+def m004_multi_origin(conn):
+    """Tabla de bodegas y origin_id en métodos, zonas y cotizaciones"""
+    from app.models import ShippingOrigin
+    _create_model_table(conn, ShippingOrigin)
+    for table in ('shipping_methods', 'shipping_zones', 'shipping_quotes'):
+        _add_columns(conn, table, [('origin_id', 'INT NULL')])
+
+
+def m005_google_api_usage(conn):
+    """Contabilidad de uso de Google Maps"""
+    from app.models import GoogleApiUsage
+    _create_model_table(conn, GoogleApiUsage)
+
+
+def m006_quote_history_indexes(conn):
+    """Índices para el historial de cotizaciones (keyset por created_at, id y filtros)"""
+    # InnoDB crea índices en línea (sin bloquear escrituras), pero en tablas grandes
+    # conviene ejecutar python migrate.py upgrade fuera de horario punta
+    from app.models import ShippingQuote
+    _create_model_indexes(conn, ShippingQuote)
+
+
+def m007_quote_demand_cells(conn):
+    """Agregación de demanda por celda geohash (mapa de calor de destinos)"""
+    from app.models import QuoteDemandCell
+    _create_model_table(conn, QuoteDemandCell)
+
+
+def m008_quote_dedup(conn):
+    """Columnas del modo dedup de cotizaciones (clave única, contador de hits, último visto)"""
+    from app.models import ShippingQuote
+    _add_columns(conn, 'shipping_quotes', [
+        ('dedup_key', 'VARCHAR(64) NULL'),
+        ('hit_count', 'INT NOT NULL DEFAULT 1'),
+        ('last_seen_at', 'DATETIME NULL'),
+    ])
+    _create_model_indexes(conn, ShippingQuote)
+
+
+def m009_address_suggestions(conn):
+    """Direcciones validadas para el autocompletado de direcciones"""
+    from app.models import AddressSuggestion
+    _create_model_table(conn, AddressSuggestion)
+
+
+def m010_cache_invalidations(conn):
+    """Invalidaciones de cachés en memoria publicadas desde el panel"""
+    from app.models import CacheInvalidation
+    _create_model_table(conn, CacheInvalidation)
+
+
+def m011_config_version(conn):
+    """Versión explícita de la configuración (ETag y clave de las cachés por worker)"""
+    from app.models import ConfigVersion
+    _create_model_table(conn, ConfigVersion)
+    if conn.execute(text("SELECT COUNT(*) FROM config_version")).scalar() == 0:
+        conn.execute(text("INSERT INTO config_version (id, version, updated_at) "
+                          "VALUES (1, 1, CURRENT_TIMESTAMP)"))
+
+
+MIGRATIONS = [
+    Migration(0, 'baseline', m000_baseline),
+    Migration(1, 'weekday_columns', m001_weekday_columns),
+    Migration(2, 'pricing_mode', m002_pricing_mode),
+    Migration(3, 'polygon_zones', m003_polygon_zones),
+    Migration(4, 'multi_origin', m004_multi_origin),
+    Migration(5, 'google_api_usage', m005_google_api_usage),
+    Migration(6, 'quote_history_indexes', m006_quote_history_indexes),
+    Migration(7, 'quote_demand_cells', m007_quote_demand_cells),
+    Migration(8, 'quote_dedup', m008_quote_dedup),
+    Migration(9, 'address_suggestions', m009_address_suggestions),
+    Migration(10, 'cache_invalidations', m010_cache_invalidations),
+    Migration(11, 'config_version', m011_config_version),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ========================================
+# RUNNER
+# ========================================
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """))
+
+
+def applied_versions(engine) -> set:
+    """Versiones aplicadas (vacío si schema_version no existe). Una consulta sobre la PK."""
+    try:
+        with engine.connect() as conn:
+            return set(conn.execute(text("SELECT version FROM schema_version")).scalars())
+    except Exception:
+        return set()
+
+
+def current_version(engine) -> int:
+    """Versión más alta aplicada (0 si no hay ninguna)"""
+    return max(applied_versions(engine), default=0)
+
+
+def pending_migrations(applied: set):
+    """
+    Migraciones no registradas en schema_version, en orden
+
+    Por conjunto y no por versión máxima: una base marcada con las versiones
+    1..10 sin la 000 (tablas que nunca se crearon) recibe la 000.
+    """
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+class _MigrationLock:
+    """GET_LOCK de MySQL sobre una conexión dedicada; en otros motores, lock de proceso"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.conn = None
+
+    def __enter__(self):
+        _process_lock.acquire()
+        if self.engine.dialect.name == 'mysql':
+            self.conn = self.engine.connect()
+            acquired = self.conn.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {'name': LOCK_NAME, 'timeout': LOCK_TIMEOUT_SECONDS}
+            ).scalar()
+            if acquired != 1:
+                self.conn.close()
+                _process_lock.release()
+                raise RuntimeError(f"No se obtuvo el lock de migraciones en {LOCK_TIMEOUT_SECONDS} s")
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if self.conn is not None:
+                self.conn.execute(text("SELECT RELEASE_LOCK(:name)"), {'name': LOCK_NAME})
+                self.conn.close()
+        finally:
+            _process_lock.release()
+
+
+def upgrade(engine, target: int = None) -> list:
+    """
+    Aplicar migraciones pendientes bajo lock. Retorna las versiones aplicadas.
+
+    La versión se vuelve a leer dentro del lock: si otro proceso ya migró, no hace nada.
+    """
+    target = LATEST_VERSION if target is None else target
+    applied = []
+
+    with _MigrationLock(engine):
+        with engine.begin() as conn:
+            _ensure_version_table(conn)
+
+        for migration in pending_migrations(applied_versions(engine)):
+            if migration.version > target:
+                break
+            logging.info(f"Aplicando migración {migration.version:03d}_{migration.name}...")
+            # En MySQL el DDL hace commit implícito: por eso cada migración es idempotente
+            with engine.begin() as conn:
+                migration.upgrade(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {'v': migration.version, 'n': migration.name, 't': datetime.utcnow()}
+                )
+            applied.append(migration.version)
+
+    return applied
+
+
+def stamp(engine, version: int):
+    """Marcar migraciones hasta `version` como aplicadas sin ejecutarlas"""
+    with _MigrationLock(engine):
+        with engine.begin() as conn:
+            _ensure_version_table(conn)
+        applied = applied_versions(engine)
+        with engine.begin() as conn:
+            for migration in pending_migrations(applied):
+                if migration.version <= version:
+                    conn.execute(
+                        text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                        {'v': migration.version, 'n': migration.name, 't': datetime.utcnow()}
+                    )
+
+
+def migrate_on_boot(engine, auto_migrate: bool = True):
+    """
+    Chequeo de arranque: una consulta a schema_version; migra solo si hay pendientes
+
+    Si una migración falla se relanza la excepción: el worker no arranca sobre un
+    esquema a medio migrar (el ORM fallaría en cada cotización).
+    """
+    pending = [f"{m.version:03d}_{m.name}" for m in pending_migrations(applied_versions(engine))]
+    if not pending:
+        return
+
+    if not auto_migrate:
+        logging.warning(f"Migraciones pendientes ({', '.join(pending)}): ejecutar python migrate.py upgrade")
+        return
+
+    try:
+        applied = upgrade(engine)
+    except Exception as e:
+        logging.error(f"Error aplicando migraciones: {e}")
+        raise
+    if applied:
+        logging.info(f"✓ Esquema migrado a la versión {LATEST_VERSION}")
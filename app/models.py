@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime, time, timedelta
+import hashlib
 import json
 
 try:
@@ -23,31 +24,188 @@ def chile_time_now():
     """Obtener solo la hora actual en zona horaria de Chile"""
     return chile_now().time()
 
+def is_schedule_open(start_time, end_time, weekday_availability, current_datetime):
+    """
+    Verificar horario y día de la semana de un método
+
+    Separado del modelo para evaluarlo sobre datos cacheados, sin consultar la BD.
+    """
+    # Verificar día de la semana (0=Lunes, 6=Domingo)
+    if not weekday_availability[current_datetime.weekday()]:
+        return False
+
+    # Verificar horario
+    now = current_datetime.time()
+
+    # Si es el mismo día (start_time <= end_time)
+    if start_time <= end_time:
+        return start_time <= now <= end_time
+    # Si cruza medianoche (start_time > end_time)
+    else:
+        return now >= start_time or now <= end_time
+
+def _merge_value(current, new, mode):
+    """Valor de una columna al actualizar: 'add' suma al existente, 'set' lo reemplaza"""
+    return current + new if mode == 'add' else new
+
+def _dialect_upsert(conn, table, rows, update_cols, keys, return_id=False):
+    """
+    Insertar filas o actualizar las que ya existen con la misma clave única
+    (ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT en SQLite/PostgreSQL y
+    SELECT + UPDATE/INSERT fila a fila en los demás motores)
+
+    Args:
+        conn: Connection o Session
+        rows: filas a insertar (un solo executemany)
+        update_cols: {columna: 'set' o 'add'} a aplicar si la fila ya existe
+        keys: columnas de la restricción única
+        return_id: retornar el id de la fila (solo con una fila)
+    """
+    if not rows:
+        return None
+    bind = conn.get_bind() if hasattr(conn, 'get_bind') else conn
+    dialect = bind.dialect.name
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        values = {name: _merge_value(table.c[name], stmt.inserted[name], mode)
+                  for name, mode in update_cols.items()}
+        if return_id:
+            # LAST_INSERT_ID(id) hace que lastrowid devuelva el id de la fila existente
+            values['id'] = db.func.last_insert_id(table.c.id)
+            return conn.execute(stmt.values(**rows[0]).on_duplicate_key_update(**values)).lastrowid
+        conn.execute(stmt.on_duplicate_key_update(**values), rows)
+        return None
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        values = {name: _merge_value(table.c[name], stmt.excluded[name], mode)
+                  for name, mode in update_cols.items()}
+        if return_id:
+            stmt = stmt.values(**rows[0]).on_conflict_do_update(index_elements=list(keys), set_=values)
+            return conn.execute(stmt.returning(table.c.id)).scalar()
+        conn.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=values), rows)
+        return None
+
+    # Sin upsert nativo: dos requests concurrentes pueden chocar con la restricción única
+    # (IntegrityError para quien llega segundo)
+    row_id = None
+    for row in rows:
+        match = db.and_(*(table.c[name] == row[name] for name in keys))
+        existing = conn.execute(db.select(table.c.id).where(match)).first()
+        if existing is None:
+            row_id = conn.execute(table.insert().values(**row)).inserted_primary_key[0]
+        else:
+            row_id = existing.id
+            conn.execute(table.update().where(table.c.id == row_id).values(**{
+                name: _merge_value(table.c[name], row.get(name), mode) for name, mode in update_cols.items()
+            }))
+    return row_id if return_id else None
+
 # AGREGAR ESTOS MODELOS AL FINAL DE app/models.py
 
+class ShippingOrigin(db.Model):
+    """Modelo para orígenes de despacho (bodegas)"""
+    __tablename__ = 'shipping_origins'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    code = db.Column(db.String(50), unique=True, nullable=False)
+    address = db.Column(db.String(255))      # Dirección legible
+    lat = db.Column(db.Float, nullable=False)
+    lng = db.Column(db.Float, nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ShippingOrigin {self.code}>'
+
+    def to_geo(self):
+        """Formato de origen que espera RouterService"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'lat': self.lat,
+            'lng': self.lng,
+            'formatted_address': self.address or self.name
+        }
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'code': self.code,
+            'address': self.address,
+            'lat': self.lat,
+            'lng': self.lng,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class ShippingZone(db.Model):
-    """Modelo para zonas de envío por kilometraje"""
+    """Modelo para zonas de envío por kilometraje o por polígono"""
     __tablename__ = 'shipping_zones'
     
     id = db.Column(db.Integer, primary_key=True)
+    zone_type = db.Column(db.String(20), default='distance')  # 'distance' o 'polygon'
+    name = db.Column(db.String(100))                           # Nombre (ej: comuna) para zonas poligonales
     min_km = db.Column(db.Float, nullable=False)
     max_km = db.Column(db.Float, nullable=False)
+    polygon = db.Column(db.Text)  # JSON [[lat, lng], ...] (solo zone_type='polygon')
     price_clp = db.Column(db.Integer, nullable=False)  # Precio en pesos chilenos
+    origin_id = db.Column(db.Integer, db.ForeignKey('shipping_origins.id'))  # NULL = aplica a todos los orígenes
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
+        if self.is_polygon:
+            return f'<ShippingZone polygon {self.name}: ${self.price_clp:,}>'
         return f'<ShippingZone {self.min_km}-{self.max_km}km: ${self.price_clp:,}>'
+
+    @property
+    def is_polygon(self):
+        return self.zone_type == 'polygon'
+
+    # Regla única para elegir entre zonas por distancia que cubren la misma distancia
+    # (cotización en vivo y simulador de tarifas): las del origen antes que las
+    # compartidas, luego la de menor min_km (límite compartido) y la de menor id
+    @classmethod
+    def distance_match_order(cls):
+        """Cláusulas ORDER BY de la regla (find_zone_for_distance)"""
+        return (cls.origin_id.is_(None), cls.min_km, cls.id)
+
+    @staticmethod
+    def distance_match_key(zone):
+        """Clave de orden de la regla para una zona como dict (pricing_simulator)"""
+        return (zone['origin_id'] is None, zone['min_km'], zone['id'])
+
+    @property
+    def range_text(self):
+        """Texto legible del alcance de la zona"""
+        if self.is_polygon:
+            return self.name or f'Polígono #{self.id}'
+        return f'{self.min_km}-{self.max_km} km'
     
     def to_dict(self):
         return {
             'id': self.id,
+            'zone_type': self.zone_type or 'distance',
+            'name': self.name,
             'min_km': self.min_km,
             'max_km': self.max_km,
+            'polygon': json.loads(self.polygon) if self.polygon else None,
             'price_clp': self.price_clp,
             'price_formatted': f'${self.price_clp:,}',
-            'range_text': f'{self.min_km}-{self.max_km} km',
+            'range_text': self.range_text,
+            'origin_id': self.origin_id,
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -65,6 +223,9 @@ class ShippingMethod(db.Model):
     start_time = db.Column(db.Time, nullable=False)  # Hora de inicio
     end_time = db.Column(db.Time, nullable=False)    # Hora de fin
     max_km = db.Column(db.Float, default=7.0)        # Distancia máxima
+    # Modo de tarifa: 'distance' (rangos de km, requiere ruta) o 'polygon' (punto en polígono, solo geocodificación)
+    pricing_mode = db.Column(db.String(20), default='distance')
+    origin_id = db.Column(db.Integer, db.ForeignKey('shipping_origins.id'))  # NULL = despacha desde cualquier origen
 
     # Días de la semana disponibles (0=Lunes, 6=Domingo)
     available_monday = db.Column(db.Boolean, default=True)
@@ -81,16 +242,10 @@ class ShippingMethod(db.Model):
     def __repr__(self):
         return f'<ShippingMethod {self.name}>'
     
-    def is_available_now(self):
-        """Verificar si el método está disponible en este momento (hora de Chile)"""
-        if not self.is_active:
-            return False
-
-        # Verificar día de la semana (0=Lunes, 6=Domingo)
-        current_datetime = chile_now()
-        weekday = current_datetime.weekday()
-
-        weekday_availability = [
+    @property
+    def weekday_availability(self):
+        """Disponibilidad por día (0=Lunes, 6=Domingo)"""
+        return (
             self.available_monday,
             self.available_tuesday,
             self.available_wednesday,
@@ -98,20 +253,13 @@ class ShippingMethod(db.Model):
             self.available_friday,
             self.available_saturday,
             self.available_sunday
-        ]
+        )
 
-        if not weekday_availability[weekday]:
+    def is_available_now(self):
+        """Verificar si el método está disponible en este momento (hora de Chile)"""
+        if not self.is_active:
             return False
-
-        # Verificar horario
-        now = current_datetime.time()
-
-        # Si es el mismo día (start_time <= end_time)
-        if self.start_time <= self.end_time:
-            return self.start_time <= now <= self.end_time
-        # Si cruza medianoche (start_time > end_time)
-        else:
-            return now >= self.start_time or now <= self.end_time
+        return is_schedule_open(self.start_time, self.end_time, self.weekday_availability, chile_now())
     
     def to_dict(self):
         return {
@@ -123,6 +271,8 @@ class ShippingMethod(db.Model):
             'start_time': self.start_time.strftime('%H:%M') if self.start_time else None,
             'end_time': self.end_time.strftime('%H:%M') if self.end_time else None,
             'max_km': self.max_km,
+            'pricing_mode': self.pricing_mode or 'distance',
+            'origin_id': self.origin_id,
             'available_days': {
                 'monday': self.available_monday,
                 'tuesday': self.available_tuesday,
@@ -140,6 +290,16 @@ class ShippingMethod(db.Model):
 class ShippingQuote(db.Model):
     """Modelo para cotizaciones de envío"""
     __tablename__ = 'shipping_quotes'
+    __table_args__ = (
+        # Historial con paginación keyset sobre (created_at, id) y un índice por filtro
+        db.Index('ix_quotes_created_id', 'created_at', 'id'),
+        db.Index('ix_quotes_session_created', 'session_id', 'created_at', 'id'),
+        db.Index('ix_quotes_method_created', 'shipping_method_id', 'created_at', 'id'),
+        db.Index('ix_quotes_zone_created', 'zone_id', 'created_at', 'id'),
+        db.Index('ix_quotes_price_created', 'price_clp', 'created_at', 'id'),
+        # Modo dedup (QUOTE_DEDUP): una fila por sesión + destino + método
+        db.Index('uq_quotes_dedup_key', 'dedup_key', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(100))  # Para identificar sesión de Jumpseller
@@ -153,10 +313,14 @@ class ShippingQuote(db.Model):
     duration_minutes = db.Column(db.Integer) # Tiempo de viaje estimado
     shipping_method_id = db.Column(db.Integer, db.ForeignKey('shipping_methods.id'))
     zone_id = db.Column(db.Integer, db.ForeignKey('shipping_zones.id'))
+    origin_id = db.Column(db.Integer, db.ForeignKey('shipping_origins.id'))  # Origen elegido para la cotización
     price_clp = db.Column(db.Integer, nullable=False)
     is_available = db.Column(db.Boolean, default=True)
     router_response = db.Column(db.Text)  # Respuesta completa de RouterService
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    dedup_key = db.Column(db.String(64))                         # NULL fuera del modo dedup
+    hit_count = db.Column(db.Integer, nullable=False, default=1)  # Cotizaciones representadas por la fila
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relaciones
     shipping_method = db.relationship('ShippingMethod', backref='quotes')
@@ -165,8 +329,37 @@ class ShippingQuote(db.Model):
     def __repr__(self):
         return f'<ShippingQuote {self.distance_km}km: ${self.price_clp:,}>'
     
-    def to_dict(self):
-        return {
+    @staticmethod
+    def make_dedup_key(session_id, destination_address, shipping_method_id):
+        """Hash de sesión + destino normalizado + método"""
+        destination = ' '.join((destination_address or '').lower().split())
+        raw = f"{session_id}|{destination}|{shipping_method_id}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def upsert(cls, session, values):
+        """
+        Insertar o sumar un hit a la fila con el mismo dedup_key. Retorna el id de la fila.
+
+        Se actualizan precio, zona, origen y distancia (la configuración pudo cambiar);
+        router_response y created_at conservan la primera cotización.
+        """
+        now = datetime.utcnow()
+        values = dict(values, created_at=now, last_seen_at=now, hit_count=1)
+        refreshed = ('distance_km', 'duration_minutes', 'zone_id', 'origin_id', 'origin_address',
+                     'origin_lat', 'origin_lng', 'price_clp', 'is_available', 'last_seen_at')
+        update_cols = dict({name: 'set' for name in refreshed}, hit_count='add')
+        return _dialect_upsert(session, cls.__table__, [values], update_cols, keys=('dedup_key',),
+                               return_id=True)
+
+    def to_dict(self, include_router_response=False):
+        """
+        Detalle de una cotización (incluye método y zona completos)
+
+        Para listados usar serialize_quote_rows (columnas proyectadas) o cargar las
+        relaciones con joinedload: aquí cada relación no cargada es una consulta.
+        """
+        data = {
             'id': self.id,
             'session_id': self.session_id,
             'origin_address': self.origin_address,
@@ -175,12 +368,17 @@ class ShippingQuote(db.Model):
             'duration_minutes': self.duration_minutes,
             'shipping_method': self.shipping_method.to_dict() if self.shipping_method else None,
             'zone': self.zone.to_dict() if self.zone else None,
+            'origin_id': self.origin_id,
             'price_clp': self.price_clp,
             'price_formatted': f'${self.price_clp:,}',
             'is_available': self.is_available,
-            'router_response': json.loads(self.router_response) if self.router_response else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'hit_count': self.hit_count,
+            'last_seen_at': self.last_seen_at.isoformat() if self.last_seen_at else None
         }
+        if include_router_response:
+            data['router_response'] = json.loads(self.router_response) if self.router_response else None
+        return data
 
 
 class AdminUser(db.Model):
@@ -217,4 +415,162 @@ class AdminUser(db.Model):
         return False
 
     def get_id(self):
-        return str(self.id)
+        # Id de sesión con la huella del password: cambiarlo cierra las sesiones abiertas
+        from app.services.user_cache import session_token
+        return session_token(self.id, self.password_hash)
+
+
+class GoogleApiUsage(db.Model):
+    """Uso agregado de Google Maps APIs por día, endpoint, resultado y nivel de caché"""
+    __tablename__ = 'google_api_usage'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'endpoint', 'api', 'outcome', 'cache_tier', name='uq_google_usage'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    endpoint = db.Column(db.String(50), nullable=False)    # callback, quote, test-address, batch
+    api = db.Column(db.String(30), nullable=False)         # geocode, distance_matrix
+    outcome = db.Column(db.String(50), nullable=False)     # OK, ZERO_RESULTS, OVER_QUERY_LIMIT, avoided...
+    cache_tier = db.Column(db.String(50), nullable=False)  # 'none' = llamada facturada
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GoogleApiUsage {self.day} {self.endpoint} {self.api} {self.outcome}: {self.count}>'
+
+    @classmethod
+    def upsert(cls, conn, day, endpoint, api, outcome, cache_tier, units):
+        """Sumar unidades a la fila del día"""
+        values = {
+            'day': day, 'endpoint': endpoint, 'api': api, 'outcome': outcome,
+            'cache_tier': cache_tier, 'count': units, 'updated_at': datetime.utcnow()
+        }
+        _dialect_upsert(conn, cls.__table__, [values], {'count': 'add', 'updated_at': 'set'},
+                        keys=('day', 'endpoint', 'api', 'outcome', 'cache_tier'))
+
+
+class QuoteDemandCell(db.Model):
+    """Demanda de cotizaciones agregada por celda geohash, nivel de precisión y día"""
+    __tablename__ = 'quote_demand_cells'
+    __table_args__ = (
+        db.UniqueConstraint('level', 'geohash', 'day', name='uq_demand_cell'),
+        # Consulta del mapa: nivel fijo, rango de días y bounding box
+        db.Index('ix_demand_level_day_lat_lng', 'level', 'day', 'lat', 'lng'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    level = db.Column(db.Integer, nullable=False)             # Precisión geohash (caracteres)
+    geohash = db.Column(db.String(12), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    lat = db.Column(db.Float, nullable=False)                 # Centro de la celda
+    lng = db.Column(db.Float, nullable=False)
+    quote_count = db.Column(db.Integer, nullable=False, default=0)
+    distance_km_sum = db.Column(db.Float, nullable=False, default=0.0)
+    price_clp_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<QuoteDemandCell {self.level}:{self.geohash} {self.day}: {self.quote_count}>'
+
+    @classmethod
+    def upsert_many(cls, conn, rows):
+        """
+        Sumar cotizaciones a las celdas del día en un solo executemany
+
+        rows: [{level, geohash, day, lat, lng, quote_count, distance_km_sum, price_clp_sum}]
+        """
+        now = datetime.utcnow()
+        rows = [dict(row, updated_at=now) for row in rows]
+        update_cols = {'quote_count': 'add', 'distance_km_sum': 'add', 'price_clp_sum': 'add',
+                       'updated_at': 'set'}
+        _dialect_upsert(conn, cls.__table__, rows, update_cols, keys=('level', 'geohash', 'day'))
+
+
+class AddressSuggestion(db.Model):
+    """Dirección validada por geocodificación, fuente del autocompletado (/api/address/suggest)"""
+    __tablename__ = 'address_suggestions'
+    __table_args__ = (
+        db.UniqueConstraint('address_key', name='uq_address_key'),
+        # Recarga incremental del índice en memoria (filas nuevas o actualizadas)
+        db.Index('ix_address_updated_id', 'updated_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    address_key = db.Column(db.String(64), nullable=False)       # sha256 de la dirección normalizada
+    formatted_address = db.Column(db.String(500), nullable=False)
+    lat = db.Column(db.Float, nullable=False)
+    lng = db.Column(db.Float, nullable=False)
+    granularity = db.Column(db.String(30))
+    validation_level = db.Column(db.String(20))                  # 'accept' o 'warning'
+    confidence = db.Column(db.Float)
+    location_type = db.Column(db.String(30))
+    place_id = db.Column(db.String(255))
+    hit_count = db.Column(db.Integer, nullable=False, default=1)  # Cotizaciones con este destino
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AddressSuggestion {self.formatted_address} ({self.hit_count})>'
+
+    @staticmethod
+    def make_address_key(folded_address):
+        return hashlib.sha256(folded_address.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def upsert_many(cls, conn, rows, replace_hits=False):
+        """
+        Insertar o actualizar direcciones en un solo executemany
+
+        rows: [{address_key, formatted_address, lat, lng, granularity, validation_level,
+                confidence, location_type, place_id, hit_count}]
+        replace_hits: True fija hit_count (reconstrucción); False lo suma (uso en vivo)
+        """
+        now = datetime.utcnow()
+        rows = [dict(row, created_at=now, updated_at=now) for row in rows]
+        refreshed = ('formatted_address', 'lat', 'lng', 'granularity', 'validation_level',
+                     'confidence', 'location_type', 'place_id', 'updated_at')
+        update_cols = dict({name: 'set' for name in refreshed},
+                           hit_count='set' if replace_hits else 'add')
+        _dialect_upsert(conn, cls.__table__, rows, update_cols, keys=('address_key',))
+
+
+class CacheInvalidation(db.Model):
+    """Invalidación de cachés en memoria publicada desde el panel; cada worker aplica las nuevas"""
+    __tablename__ = 'cache_invalidations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tier = db.Column(db.String(30))                    # None = todas las cachés
+    kind = db.Column(db.String(20), nullable=False)    # key, prefix, place_id, bbox, all
+    value = db.Column(db.String(500))                  # bbox: 'sur,oeste,norte,este'
+    created_by = db.Column(db.String(80))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheInvalidation {self.id} {self.tier or "*"} {self.kind}={self.value}>'
+
+
+class ConfigVersion(db.Model):
+    """
+    Versión de la configuración pública (métodos, zonas y orígenes): una sola fila (id=1)
+    que se incrementa en la misma transacción de cada escritura (eventos ORM en config_cache.py)
+    """
+    __tablename__ = 'config_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def bump(cls, conn):
+        """Incrementar la versión (crea la fila si no existe)"""
+        table = cls.__table__
+        now = datetime.utcnow()
+        updated = conn.execute(table.update().where(table.c.id == 1).values(
+            version=table.c.version + 1, updated_at=now
+        )).rowcount
+        if not updated:
+            conn.execute(table.insert().values(id=1, version=1, updated_at=now))
+
+    def __repr__(self):
+        return f'<ConfigVersion {self.version}>'
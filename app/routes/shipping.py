@@ -1,13 +1,28 @@
 # app/routes/shipping.py
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, Response, stream_with_context, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
-from app.models import ShippingZone, ShippingMethod, ShippingQuote, AdminUser
+from app.models import ShippingZone, ShippingMethod, ShippingQuote, ShippingOrigin, AdminUser, GoogleApiUsage, chile_now, is_schedule_open
 from app.services.router_service import router_service
-from datetime import datetime, time
+from app.services.zone_index import PolygonZoneIndex, parse_polygon
+from app.services.metrics import observe_stage, observe_request
+from app.services.usage import track_endpoint, usage_tracker, summarize_usage
+from app.services.demand_heatmap import demand_aggregator, record_checkout_demand, query_heatmap
+from app.services.config_cache import config_cache, CONFIG_CACHE_MAX_AGE
+from app.services.callback_cache import callback_cache, seconds_until_schedule_change
+from app.services.db_routing import read_replica
+from app.services.address_index import suggest_addresses, address_index, ADDRESS_SUGGEST_MAX_LIMIT
+from app.services.cache_admin import (
+    invalidation_sync, parse_invalidation, apply_invalidation, ADDRESS_INDEX_TIER
+)
+from datetime import datetime, time, timedelta
+import base64
+import csv
+import io
 import json
 import logging
 import os
+import zlib
 from functools import wraps
 
 bp = Blueprint('shipping', __name__, url_prefix='/shipping')
@@ -24,16 +39,131 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def find_zone_for_distance(distance_km):
-    """Encontrar zona de envío para una distancia específica"""
+def find_zone_for_distance(distance_km, origin_id=None):
+    """
+    Encontrar zona de envío para una distancia específica
+
+    Con origin_id se consideran las zonas de ese origen y las compartidas
+    (origin_id NULL), prefiriendo las del origen; entre zonas que cubren la distancia
+    decide ShippingZone.distance_match_order (la misma regla que el simulador).
+    """
     zone = ShippingZone.query.filter(
         ShippingZone.min_km <= distance_km,
         ShippingZone.max_km >= distance_km,
-        ShippingZone.is_active == True
-    ).first()
+        ShippingZone.is_active == True,
+        db.or_(ShippingZone.zone_type == 'distance', ShippingZone.zone_type.is_(None)),
+        db.or_(ShippingZone.origin_id == origin_id, ShippingZone.origin_id.is_(None))
+    ).order_by(*ShippingZone.distance_match_order()).first()
 
     return zone
 
+# Modos de tarifa por método de envío
+PRICING_MODES = ('distance', 'polygon')
+
+# Índice de zonas poligonales (por worker). Se reconstruye cuando cambia la versión de
+# configuración (fila config_version, la misma de los ETag y de callback_cache: cualquier
+# edición de una zona la incrementa) o al modificar zonas en este worker.
+_polygon_index = {'index': None, 'version': None}
+
+def invalidate_polygon_index():
+    """Forzar reconstrucción del índice de polígonos en la próxima consulta"""
+    _polygon_index['index'] = None
+
+def get_polygon_index():
+    """Obtener índice de zonas poligonales activas (reconstruye si cambió la configuración)"""
+    version = config_cache.current_version()
+    index = _polygon_index['index']
+    if index is None or _polygon_index['version'] != version:
+        zones = ShippingZone.query.filter_by(zone_type='polygon', is_active=True).all()
+        index = PolygonZoneIndex()
+        index.build([
+            {'id': z.id, 'name': z.name, 'price_clp': z.price_clp, 'polygon': z.polygon,
+             'origin_id': z.origin_id}
+            for z in zones
+        ])
+        _polygon_index['index'] = index
+        _polygon_index['version'] = version
+        logging.info("Índice de polígonos reconstruido: %d zonas", index.zone_count)
+    return index
+
+def find_zone_for_method(method, route_result, origin):
+    """
+    Encontrar zona de precio para un método despachado desde un origen
+
+    - 'distance': rango de km sobre la distancia de ruta (respeta max_km)
+    - 'polygon': punto en polígono sobre el destino geocodificado
+
+    Returns:
+        ShippingZone | PolygonZoneMatch | None
+    """
+    if method.pricing_mode == 'polygon':
+        destination = route_result['destination']
+        return get_polygon_index().find(destination['lat'], destination['lng'], origin['id'])
+
+    distance_km = origin['route']['distance_km']
+    if distance_km > method.max_km:
+        return None
+    return find_zone_for_distance(distance_km, origin['id'])
+
+def select_origin_for_method(method, route_result):
+    """
+    Elegir el origen más cercano que puede despachar el método y tiene zona de precio
+
+    Returns:
+        tuple: (origin, zone) o (None, None) si ningún origen califica
+    """
+    best_origin, best_zone = None, None
+
+    for origin in route_result['origins']:
+        if origin['route'] is None:
+            continue
+        if method.origin_id is not None and origin['id'] != method.origin_id:
+            continue
+        if best_origin and origin['route']['distance_km'] >= best_origin['route']['distance_km']:
+            continue
+
+        zone = find_zone_for_method(method, route_result, origin)
+        if zone:
+            best_origin, best_zone = origin, zone
+
+    return best_origin, best_zone
+
+def get_active_origins():
+    """Orígenes de despacho activos en formato RouterService (None = usar DEFAULT_ORIGIN_ADDRESS)"""
+    origins = ShippingOrigin.query.filter_by(is_active=True).order_by(ShippingOrigin.id).all()
+    return [origin.to_geo() for origin in origins] or None
+
+def zone_label(zone):
+    """Texto legible de la zona (rango de km o nombre del polígono)"""
+    if isinstance(zone, ShippingZone):
+        return zone.range_text
+    return zone.name or f'Polígono #{zone.id}'
+
+# Modo dedup: una fila por sesión + destino + método, con contador de hits
+# (python dedup_quotes.py convierte el historial existente)
+QUOTE_DEDUP = os.environ.get('QUOTE_DEDUP', 'false').lower() == 'true'
+
+def save_quote(values):
+    """
+    Guardar una cotización en la transacción actual
+
+    En modo dedup (y con sesión) hace upsert y retorna el id de la fila; si no, agrega
+    una fila nueva a la sesión (id asignado recién en el commit, retorna None).
+    """
+    if QUOTE_DEDUP and values.get('session_id'):
+        values['dedup_key'] = ShippingQuote.make_dedup_key(
+            values['session_id'], values['destination_address'], values['shipping_method_id']
+        )
+        return ShippingQuote.upsert(db.session, values)
+
+    quote = ShippingQuote(**values)
+    db.session.add(quote)
+    return quote.id
+
+def methods_need_route(methods):
+    """True si algún método requiere distancia de ruta (Distance Matrix)"""
+    return any(method.pricing_mode != 'polygon' for method in methods)
+
 # ========================================
 # AUTENTICACIÓN - LOGIN/LOGOUT
 # ========================================
@@ -109,6 +239,10 @@ def jumpseller_callback():
     POST /shipping/api/jumpseller/callback
     Recibe datos de Jumpseller y devuelve tarifas de envío disponibles
     """
+    with observe_request('jumpseller_callback'), track_endpoint('callback'):
+        return _jumpseller_callback()
+
+def _jumpseller_callback():
     try:
         data = request.get_json()
 
@@ -138,16 +272,44 @@ def jumpseller_callback():
         if not destination:
             destination = to_address.get('municipality_name', '') + ', Chile'
 
-        # Origen: Usar string vacío para que RouterService use las coordenadas por defecto del .env
-        origin = ''  # RouterService usará DEFAULT_ORIGIN_ADDRESS automáticamente
+        # Origen: Usar string vacío para que RouterService use los orígenes configurados
+        origin = ''  # Sin orígenes en BD, RouterService usará DEFAULT_ORIGIN_ADDRESS
 
         # ID de referencia para tracking
         cart_id = req_data.get('cart_id', '')
         order_id = req_data.get('order_id', '')
         reference_id = f"JS-{cart_id or order_id}"
 
-        # Calcular distancia usando RouterService
-        route_result = router_service.get_distance_and_time(origin, destination)
+        # Callback repetido (re-render del checkout): misma respuesta sin Google ni escrituras.
+        # La clave incluye la versión de configuración y qué métodos están en horario ahora.
+        cache_key = None
+        if cart_id or order_id:
+            now = chile_now()
+            schedules = active_method_schedules()
+            cache_key = callback_cache.make_key(
+                cart_id or order_id, destination, config_cache.current_version(),
+                availability_bits(schedules, now)
+            )
+            # Invalidaciones del panel publicadas por otros workers (vacían esta caché)
+            invalidation_sync.sync(worker_caches)
+            cached = callback_cache.get(cache_key)
+            if cached is not None:
+                return Response(cached, mimetype='application/json')
+
+        # Obtener métodos de envío disponibles en este horario
+        with observe_stage('config_query'):
+            available_methods = [
+                method for method in ShippingMethod.query.filter_by(is_active=True).all()
+                if method.is_available_now()
+            ]
+            active_origins = get_active_origins()
+
+        # Calcular distancia usando RouterService: todos los orígenes en una sola
+        # llamada (sin Distance Matrix si todos los métodos son por polígono)
+        route_result = router_service.get_distance_and_time(
+            origin, destination, with_route=methods_need_route(available_methods),
+            origins=active_origins
+        )
 
         if not route_result['success']:
             # Si falla, devolver array vacío de rates
@@ -157,50 +319,46 @@ def jumpseller_callback():
                 'error': route_result.get('error', 'No se pudo calcular la ruta')
             }), 200
 
-        distance_km = route_result['route']['distance_km']
-        duration_minutes = route_result['route']['duration_minutes']
-
-        # Obtener métodos de envío disponibles
-        available_methods = ShippingMethod.query.filter_by(is_active=True).all()
         rates = []
+        demand = []  # (lat, lng, km, precio) por método; el checkout se registra una vez tras el commit
 
         for method in available_methods:
-            # Verificar si está dentro del horario
-            if not method.is_available_now():
-                continue
-
-            # Verificar si está dentro del rango de distancia
-            if distance_km > method.max_km:
-                continue
-
-            # Encontrar zona de precio
-            zone = find_zone_for_distance(distance_km)
+            # Elegir origen más cercano y zona de precio (rango de km o polígono según el método)
+            with observe_stage('zone_lookup'):
+                ship_origin, zone = select_origin_for_method(method, route_result)
 
             if not zone:
                 continue
 
+            distance_km = ship_origin['route']['distance_km']
+            duration_minutes = ship_origin['route']['duration_minutes']
+
             # Crear cotización en la base de datos
-            quote = ShippingQuote(
+            save_quote(dict(
                 session_id=cart_id or order_id,
-                origin_address=route_result['origin']['formatted_address'],
+                origin_address=ship_origin['formatted_address'],
                 destination_address=route_result['destination']['formatted_address'],
-                origin_lat=route_result['origin']['lat'],
-                origin_lng=route_result['origin']['lng'],
+                origin_lat=ship_origin['lat'],
+                origin_lng=ship_origin['lng'],
                 destination_lat=route_result['destination']['lat'],
                 destination_lng=route_result['destination']['lng'],
                 distance_km=distance_km,
                 duration_minutes=duration_minutes,
                 shipping_method_id=method.id,
                 zone_id=zone.id,
+                origin_id=ship_origin['id'],
                 price_clp=zone.price_clp,
                 is_available=True,
                 router_response=json.dumps(route_result)  # Guardar toda la respuesta
-            )
-
-            db.session.add(quote)
+            ))
+            demand.append((route_result['destination']['lat'], route_result['destination']['lng'],
+                           distance_km, zone.price_clp))
 
             # Formatear tarifa según especificación de Jumpseller
-            rate_description = f"{method.description} - {distance_km:.1f} km, aprox. {duration_minutes} min"
+            if duration_minutes is None:
+                rate_description = f"{method.description} - {zone_label(zone)}"
+            else:
+                rate_description = f"{method.description} - {distance_km:.1f} km, aprox. {duration_minutes} min"
 
             rates.append({
                 'rate_id': f"{method.code}_{zone.id}",
@@ -210,12 +368,20 @@ def jumpseller_callback():
                 'total_price': str(zone.price_clp)  # Jumpseller espera string
             })
 
-        db.session.commit()
+        with observe_stage('db_commit'):
+            db.session.commit()
 
-        return jsonify({
+        record_checkout_demand(demand)
+
+        response = jsonify({
             'reference_id': reference_id,
             'rates': rates
         })
+        if cache_key is not None:
+            # Vence antes si abre o cierra el horario de algún método
+            callback_cache.set(cache_key, response.get_data(),
+                               ttl=seconds_until_schedule_change(schedules, now))
+        return response
 
     except Exception as e:
         db.session.rollback()
@@ -232,21 +398,22 @@ def jumpseller_services():
     Endpoint para listar servicios disponibles para Jumpseller
 
     GET /shipping/api/jumpseller/services
+    Con ETag: If-None-Match responde 304 sin consultar la BD.
     """
     try:
-        methods = ShippingMethod.query.filter_by(is_active=True).all()
-
-        services = [
-            {
-                'service_name': method.name,
-                'service_code': method.code
+        def build():
+            methods = ShippingMethod.query.filter_by(is_active=True).order_by(ShippingMethod.id).all()
+            return {
+                'services': [
+                    {
+                        'service_name': method.name,
+                        'service_code': method.code
+                    }
+                    for method in methods
+                ]
             }
-            for method in methods
-        ]
 
-        return jsonify({
-            'services': services
-        })
+        return cached_config_response(config_cache.etag('services'), build)
 
     except Exception as e:
         logging.error(f"Error al obtener servicios: {str(e)}")
@@ -266,6 +433,10 @@ def get_shipping_quote():
         "session_id": "optional_session_id"
     }
     """
+    with observe_request('quote'), track_endpoint('quote'):
+        return _get_shipping_quote()
+
+def _get_shipping_quote():
     try:
         data = request.get_json()
         
@@ -285,57 +456,63 @@ def get_shipping_quote():
                 'error': 'La dirección de destino es requerida'
             }), 400
         
-        # Calcular distancia usando RouterService
-        route_result = router_service.get_distance_and_time(origin, destination)
+        # Obtener métodos de envío disponibles en este horario
+        with observe_stage('config_query'):
+            available_methods = [
+                method for method in ShippingMethod.query.filter_by(is_active=True).all()
+                if method.is_available_now()
+            ]
+            active_origins = get_active_origins()
+
+        # Calcular distancia usando RouterService: todos los orígenes en una sola
+        # llamada (sin Distance Matrix si todos los métodos son por polígono)
+        route_result = router_service.get_distance_and_time(
+            origin, destination, with_route=methods_need_route(available_methods),
+            origins=None if origin else active_origins
+        )
         
         if not route_result['success']:
             return jsonify({
                 'success': False,
                 'error': f"Error al calcular ruta: {route_result.get('error', 'Unknown')}",
                 'router_status': route_result.get('status')
-            }), 400
+            }), 429 if route_result.get('status') == 'RATE_LIMITED' else 400
         
         distance_km = route_result['route']['distance_km']
-        duration_minutes = route_result['route']['duration_minutes']
-        
-        # Obtener métodos de envío disponibles
-        available_methods = ShippingMethod.query.filter_by(is_active=True).all()
         shipping_options = []
+        demand = []  # (lat, lng, km, precio) por método; el checkout se registra una vez tras el commit
         
         for method in available_methods:
-            # Verificar si está dentro del horario
-            if not method.is_available_now():
-                continue
-            
-            # Verificar si está dentro del rango de distancia
-            if distance_km > method.max_km:
-                continue
-            
-            # Encontrar zona de precio
-            zone = find_zone_for_distance(distance_km)
+            # Elegir origen más cercano y zona de precio (rango de km o polígono según el método)
+            with observe_stage('zone_lookup'):
+                ship_origin, zone = select_origin_for_method(method, route_result)
             
             if not zone:
                 continue
+
+            method_distance_km = ship_origin['route']['distance_km']
+            duration_minutes = ship_origin['route']['duration_minutes']
             
             # Crear cotización en la base de datos
-            quote = ShippingQuote(
+            quote_id = save_quote(dict(
                 session_id=session_id,
-                origin_address=route_result['origin']['formatted_address'],
+                origin_address=ship_origin['formatted_address'],
                 destination_address=route_result['destination']['formatted_address'],
-                origin_lat=route_result['origin']['lat'],
-                origin_lng=route_result['origin']['lng'],
+                origin_lat=ship_origin['lat'],
+                origin_lng=ship_origin['lng'],
                 destination_lat=route_result['destination']['lat'],
                 destination_lng=route_result['destination']['lng'],
-                distance_km=distance_km,
+                distance_km=method_distance_km,
                 duration_minutes=duration_minutes,
                 shipping_method_id=method.id,
                 zone_id=zone.id,
+                origin_id=ship_origin['id'],
                 price_clp=zone.price_clp,
                 is_available=True,
                 router_response=json.dumps(route_result)  # Guardar toda la respuesta
-            )
-            
-            db.session.add(quote)
+            ))
+            demand.append((route_result['destination']['lat'], route_result['destination']['lng'],
+                           method_distance_km, zone.price_clp))
             
             shipping_options.append({
                 'method_code': method.code,
@@ -343,15 +520,21 @@ def get_shipping_quote():
                 'description': method.description,
                 'price_clp': zone.price_clp,
                 'price_formatted': f'${zone.price_clp:,}',
-                'distance_km': distance_km,
+                'distance_km': method_distance_km,
                 'duration_minutes': duration_minutes,
-                'duration_text': f'{duration_minutes} minutos',
+                'duration_text': f'{duration_minutes} minutos' if duration_minutes is not None else None,
                 'available_until': method.end_time.strftime('%H:%M'),
-                'zone_range': f'{zone.min_km}-{zone.max_km} km',
-                'quote_id': quote.id
+                'pricing_mode': method.pricing_mode or 'distance',
+                'zone_range': zone_label(zone),
+                'origin_id': ship_origin['id'],
+                'origin_name': ship_origin['name'] or ship_origin['formatted_address'],
+                'quote_id': quote_id
             })
         
-        db.session.commit()
+        with observe_stage('db_commit'):
+            db.session.commit()
+
+        record_checkout_demand(demand)
         
         if not shipping_options:
             return jsonify({
@@ -360,7 +543,7 @@ def get_shipping_quote():
                 'distance_km': distance_km,
                 'max_distance': 7.0,
                 'available_zones': [
-                    f'{z.min_km}-{z.max_km}km' 
+                    z.range_text
                     for z in ShippingZone.query.filter_by(is_active=True).all()
                 ]
             }), 400
@@ -399,9 +582,10 @@ def test_address():
             }), 400
         
         # Probar geocodificación
-        geo_result = router_service.geocode_address(address)
+        with track_endpoint('test-address'):
+            geo_result = router_service.validate_and_geocode_address(address)
         
-        if geo_result:
+        if geo_result.get('success'):
             return jsonify({
                 'success': True,
                 'address': address,
@@ -410,9 +594,9 @@ def test_address():
         else:
             return jsonify({
                 'success': False,
-                'error': 'No se pudo geocodificar la dirección',
+                'error': geo_result.get('error', 'No se pudo geocodificar la dirección'),
                 'address': address
-            }), 400
+            }), 429 if geo_result.get('throttled') else 400
             
     except Exception as e:
         return jsonify({
@@ -420,17 +604,97 @@ def test_address():
             'error': str(e)
         }), 500
 
+@bp.route('/api/address/suggest', methods=['GET'])
+def address_suggest():
+    """
+    Autocompletado de direcciones desde el índice local (sin llamar a Google)
+
+    GET /shipping/api/address/suggest?q=providencia 12&limit=8
+    Cada sugerencia incluye la geocodificación: cotizar con su formatted_address
+    no vuelve a geocodificar.
+    """
+    with observe_request('address_suggest'):
+        query = request.args.get('q', '')
+        limit = max(1, min(request.args.get('limit', 8, type=int) or 8, ADDRESS_SUGGEST_MAX_LIMIT))
+
+        suggestions = [{
+            'formatted_address': entry['formatted_address'],
+            'lat': entry['lat'],
+            'lng': entry['lng'],
+            'granularity': entry['granularity'],
+            'validation_level': entry['validation_level'],
+            'confidence': entry['confidence'],
+            'location_type': entry['location_type'],
+            'place_id': entry['place_id'],
+        } for entry in suggest_addresses(query[:200], limit)]
+
+        response = jsonify({
+            'success': True,
+            'query': query,
+            'suggestions': suggestions
+        })
+        # Cada tecla es un request: el navegador puede reutilizar la respuesta un momento
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        return response
+
+# ========================================
+# CONFIGURACIÓN PÚBLICA CON ETAG
+# ========================================
+
+def cached_config_response(etag, build, max_age=CONFIG_CACHE_MAX_AGE):
+    """
+    Respuesta JSON de configuración con ETag fuerte y Cache-Control
+
+    Si If-None-Match coincide responde 304 sin construir el cuerpo; si no, el cuerpo
+    se serializa una vez por ETag (build solo corre cuando no está en caché).
+    max_age=0 obliga al cliente a revalidar siempre (Cache-Control: no-cache).
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = config_cache.get(etag, lambda: current_app.json.response(build()).get_data())
+        response = Response(body, mimetype='application/json')
+
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def active_method_schedules():
+    """Horario y días de los métodos activos, cacheados por versión de configuración"""
+    def build():
+        methods = ShippingMethod.query.filter_by(is_active=True).order_by(ShippingMethod.id).all()
+        return [(m.start_time, m.end_time, m.weekday_availability) for m in methods]
+
+    return config_cache.get(f"schedules-{config_cache.current_version()}", build)
+
+
+def availability_bits(schedules, now):
+    """'1'/'0' por método activo según si está dentro de su horario (sin consultar la BD)"""
+    return ''.join('1' if is_schedule_open(start, end, days, now) else '0' for start, end, days in schedules)
+
+
 @bp.route('/api/methods', methods=['GET'])
 def get_shipping_methods():
     """Obtener métodos de envío disponibles"""
     try:
-        methods = ShippingMethod.query.filter_by(is_active=True).all()
-        
-        return jsonify({
-            'success': True,
-            'methods': [method.to_dict() for method in methods],
-            'count': len(methods)
-        })
+        # is_available_now depende de la hora: forma parte del ETag, calculado sin la BD
+        availability = availability_bits(active_method_schedules(), chile_now())
+
+        def build():
+            methods = ShippingMethod.query.filter_by(is_active=True).order_by(ShippingMethod.id).all()
+            return {
+                'success': True,
+                'methods': [method.to_dict() for method in methods],
+                'count': len(methods)
+            }
+
+        # Sin max-age: la disponibilidad cambia con el reloj, el cliente revalida (304 barato)
+        return cached_config_response(config_cache.etag('methods', availability), build, max_age=0)
         
     except Exception as e:
         return jsonify({
@@ -442,13 +706,15 @@ def get_shipping_methods():
 def get_shipping_zones():
     """Obtener zonas de envío y tarifas"""
     try:
-        zones = ShippingZone.query.filter_by(is_active=True).order_by(ShippingZone.min_km).all()
-        
-        return jsonify({
-            'success': True,
-            'zones': [zone.to_dict() for zone in zones],
-            'count': len(zones)
-        })
+        def build():
+            zones = ShippingZone.query.filter_by(is_active=True).order_by(ShippingZone.min_km).all()
+            return {
+                'success': True,
+                'zones': [zone.to_dict() for zone in zones],
+                'count': len(zones)
+            }
+
+        return cached_config_response(config_cache.etag('zones'), build)
         
     except Exception as e:
         return jsonify({
@@ -481,11 +747,13 @@ def manage_zones():
     return render_template('shipping/zones.html', zones=zones, title='Zonas de Envío')
 
 @bp.route('/admin/quotes')
+@admin_required
+@read_replica
 def view_quotes():
-    """Ver cotizaciones realizadas"""
-    page = request.args.get('page', 1, type=int)
-    quotes = ShippingQuote.query.order_by(ShippingQuote.created_at.desc()).limit(50).all()
-    return render_template('shipping/quotes.html', quotes=quotes, title='Cotizaciones')
+    """Ver cotizaciones realizadas (la tabla se carga desde /admin/api/quotes)"""
+    methods = ShippingMethod.query.order_by(ShippingMethod.name).all()
+    zones = ShippingZone.query.order_by(ShippingZone.min_km).all()
+    return render_template('shipping/quotes.html', methods=methods, zones=zones, title='Cotizaciones')
 
 # ========================================
 # API CRUD PARA ADMIN (simplificado)
@@ -511,27 +779,400 @@ def api_get_zones():
         'zones': [zone.to_dict() for zone in zones]
     })
 
+# ========================================
+# HISTORIAL DE COTIZACIONES (PAGINACIÓN KEYSET)
+# ========================================
+
+QUOTES_PAGE_DEFAULT = 50
+QUOTES_PAGE_MAX = 200
+
+# Columnas del listado (sin router_response, que puede pesar varios KB por fila)
+QUOTE_LIST_COLUMNS = (
+    ShippingQuote.id, ShippingQuote.created_at, ShippingQuote.session_id,
+    ShippingQuote.destination_address, ShippingQuote.distance_km, ShippingQuote.duration_minutes,
+    ShippingQuote.price_clp, ShippingQuote.shipping_method_id, ShippingQuote.zone_id,
+    ShippingQuote.origin_id, ShippingQuote.is_available, ShippingQuote.hit_count,
+    ShippingQuote.last_seen_at
+)
+
+
+def encode_quote_cursor(created_at, quote_id):
+    """Cursor opaco con la posición (created_at, id) de la última fila entregada"""
+    raw = f"{created_at.isoformat()}|{quote_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_quote_cursor(cursor):
+    """Inverso de encode_quote_cursor. Lanza ValueError si el cursor es inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, quote_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(quote_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+
+def parse_date_arg(value, end_of_day=False):
+    """'YYYY-MM-DD' o ISO 8601. Con end_of_day una fecha sola incluye el día completo."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Fecha inválida: {value}')
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def build_quote_history_query(args):
+    """
+    Query de historial con filtros. Cada filtro tiene un índice (col, created_at, id)
+    para que el orden created_at DESC, id DESC se resuelva recorriendo el índice.
+
+    Lanza ValueError si algún parámetro es inválido.
+    """
+    query = db.session.query(*QUOTE_LIST_COLUMNS)
+
+    session_id = args.get('session_id')
+    if session_id:
+        query = query.filter(ShippingQuote.session_id == session_id)
+
+    method = args.get('method')
+    if method:
+        if method.isdigit():
+            method_id = int(method)
+        else:
+            method_id = db.session.query(ShippingMethod.id).filter_by(code=method).scalar()
+            if method_id is None:
+                raise ValueError(f'Método no encontrado: {method}')
+        query = query.filter(ShippingQuote.shipping_method_id == method_id)
+
+    zone_id = args.get('zone_id')
+    if zone_id:
+        if not zone_id.isdigit():
+            raise ValueError('zone_id debe ser numérico')
+        query = query.filter(ShippingQuote.zone_id == int(zone_id))
+
+    min_price = args.get('min_price', type=int)
+    max_price = args.get('max_price', type=int)
+    if (args.get('min_price') and min_price is None) or (args.get('max_price') and max_price is None):
+        raise ValueError('min_price/max_price deben ser enteros')
+    if min_price is not None:
+        query = query.filter(ShippingQuote.price_clp >= min_price)
+    if max_price is not None:
+        query = query.filter(ShippingQuote.price_clp <= max_price)
+
+    date_from = parse_date_arg(args.get('date_from'))
+    date_to = parse_date_arg(args.get('date_to'), end_of_day=True)
+    if date_from:
+        query = query.filter(ShippingQuote.created_at >= date_from)
+    if date_to:
+        query = query.filter(ShippingQuote.created_at < date_to)
+
+    return query
+
+
+def quote_labels(rows):
+    """
+    Código/nombre de método y etiqueta de zona para los ids presentes en `rows`
+
+    Dos consultas en total (tablas pequeñas), en vez de una carga lazy por fila.
+    """
+    method_ids = {row.shipping_method_id for row in rows if row.shipping_method_id}
+    zone_ids = {row.zone_id for row in rows if row.zone_id}
+    methods = {
+        m.id: m for m in db.session.query(ShippingMethod.id, ShippingMethod.code, ShippingMethod.name)
+        .filter(ShippingMethod.id.in_(method_ids))
+    } if method_ids else {}
+    zones = {
+        z.id: zone_label(z) for z in ShippingZone.query.filter(ShippingZone.id.in_(zone_ids))
+    } if zone_ids else {}
+    return methods, zones
+
+
+def serialize_quote_rows(rows, include_router_response=False):
+    """
+    Serializador plano para listados (filas de QUOTE_LIST_COLUMNS)
+
+    No toca relaciones ni is_available_now(); router_response solo se parsea si se pide
+    (la fila debe traer esa columna).
+    """
+    methods, zones = quote_labels(rows)
+
+    items = []
+    for row in rows:
+        method = methods.get(row.shipping_method_id)
+        item = {
+            'id': row.id,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'session_id': row.session_id,
+            'destination_address': row.destination_address,
+            'distance_km': row.distance_km,
+            'duration_minutes': row.duration_minutes,
+            'price_clp': row.price_clp,
+            'method_id': row.shipping_method_id,
+            'method_code': method.code if method else None,
+            'method_name': method.name if method else None,
+            'zone_id': row.zone_id,
+            'zone_label': zones.get(row.zone_id),
+            'origin_id': row.origin_id,
+            'is_available': row.is_available,
+            'hit_count': row.hit_count,
+            'last_seen_at': row.last_seen_at.isoformat() if row.last_seen_at else None
+        }
+        if include_router_response:
+            item['router_response'] = json.loads(row.router_response) if row.router_response else None
+        items.append(item)
+    return items
+
+
+def fetch_quote_page(args):
+    """
+    Una página del historial: (items, next_cursor)
+
+    Keyset: WHERE (created_at, id) < (cursor) ORDER BY created_at DESC, id DESC LIMIT n+1.
+    El costo no depende de qué tan profundo se navegue (no hay OFFSET).
+    """
+    limit = min(max(args.get('limit', QUOTES_PAGE_DEFAULT, type=int) or QUOTES_PAGE_DEFAULT, 1), QUOTES_PAGE_MAX)
+    include_router_response = args.get('include') == 'router_response'
+    query = build_quote_history_query(args)
+    if include_router_response:
+        query = query.add_columns(ShippingQuote.router_response)
+
+    cursor = args.get('cursor')
+    if cursor:
+        cursor_created_at, cursor_id = decode_quote_cursor(cursor)
+        # created_at <= c permite el range scan; el OR desempata por id
+        query = query.filter(
+            ShippingQuote.created_at <= cursor_created_at,
+            db.or_(
+                ShippingQuote.created_at < cursor_created_at,
+                ShippingQuote.id < cursor_id
+            )
+        )
+
+    rows = query.order_by(ShippingQuote.created_at.desc(), ShippingQuote.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = serialize_quote_rows(rows, include_router_response=include_router_response)
+
+    next_cursor = None
+    if has_more and rows and rows[-1].created_at:
+        next_cursor = encode_quote_cursor(rows[-1].created_at, rows[-1].id)
+
+    return items, next_cursor
+
+
+@bp.route('/admin/api/quotes', methods=['GET'])
+@admin_required
+@read_replica
+def api_get_quotes():
+    """
+    API: Historial de cotizaciones con paginación keyset
+
+    Query params: limit (máx 200), cursor (next_cursor de la página anterior),
+    session_id, method (id o código), zone_id, min_price, max_price,
+    date_from, date_to (YYYY-MM-DD, date_to inclusive),
+    include=router_response (respuesta completa de RouterService, más pesada)
+    """
+    try:
+        items, next_cursor = fetch_quote_page(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'quotes': items,
+        'count': len(items),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
+# Filas por consulta al exportar (cada chunk es una consulta corta e independiente)
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+
+EXPORT_COLUMNS = [
+    'id', 'created_at', 'session_id', 'destination_address', 'distance_km', 'duration_minutes',
+    'price_clp', 'method_code', 'zone_label', 'origin_id', 'is_available', 'hit_count'
+]
+
+
+def iter_quote_export_rows(args, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Recorrer el historial filtrado en orden (created_at, id) ascendente, en chunks
+
+    Cada chunk es una consulta keyset de `chunk_size` filas seguida de un rollback:
+    no hay un SELECT largo abierto (ni snapshot de InnoDB retenido) mientras el cliente
+    descarga, y la memoria queda acotada a un chunk.
+    """
+    methods = {m.id: m.code for m in db.session.query(ShippingMethod.id, ShippingMethod.code)}
+    zones = {z.id: zone_label(z) for z in ShippingZone.query.all()}
+    base_query = build_quote_history_query(args)
+    db.session.rollback()
+
+    last_created_at, last_id = None, None
+    while True:
+        query = base_query
+        if last_created_at is not None:
+            query = query.filter(
+                ShippingQuote.created_at >= last_created_at,
+                db.or_(
+                    ShippingQuote.created_at > last_created_at,
+                    ShippingQuote.id > last_id
+                )
+            )
+        rows = query.order_by(ShippingQuote.created_at.asc(), ShippingQuote.id.asc()).limit(chunk_size).all()
+        # Cerrar la transacción de lectura antes de entregar el chunk
+        db.session.rollback()
+
+        if not rows:
+            return
+
+        for row in rows:
+            yield {
+                'id': row.id,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'session_id': row.session_id,
+                'destination_address': row.destination_address,
+                'distance_km': row.distance_km,
+                'duration_minutes': row.duration_minutes,
+                'price_clp': row.price_clp,
+                'method_code': methods.get(row.shipping_method_id),
+                'zone_label': zones.get(row.zone_id),
+                'origin_id': row.origin_id,
+                'is_available': row.is_available,
+                'hit_count': row.hit_count
+            }
+
+        if len(rows) < chunk_size or rows[-1].created_at is None:
+            return
+        last_created_at, last_id = rows[-1].created_at, rows[-1].id
+
+
+def encode_export_chunks(rows, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Serializar filas a CSV o NDJSON, entregando un bloque de texto por chunk"""
+    buffer = io.StringIO()
+    writer = None
+    if export_format == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Comprimir en gzip de forma incremental (sin armar el archivo en memoria)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@bp.route('/admin/api/quotes/export', methods=['GET'])
+@admin_required
+@read_replica
+def api_export_quotes():
+    """
+    API: Exportar historial de cotizaciones en streaming
+
+    Query params: format ('csv' o 'ndjson'), gzip (1 para .gz) y los mismos filtros
+    que /admin/api/quotes (session_id, method, zone_id, min_price, max_price, date_from, date_to)
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({
+            'success': False,
+            'error': "format debe ser 'csv' o 'ndjson'"
+        }), 400
+
+    try:
+        # Validar filtros antes de empezar a responder
+        build_quote_history_query(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    use_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    args = request.args.copy()
+
+    chunks = encode_export_chunks(iter_quote_export_rows(args), export_format)
+    if use_gzip:
+        body = gzip_chunks(chunks)
+    else:
+        body = (chunk.encode('utf-8') for chunk in chunks)
+
+    filename = f"cotizaciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if use_gzip:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    elif export_format == 'csv':
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        content_type = 'application/x-ndjson; charset=utf-8'
+
+    logging.info(f"Exportando cotizaciones ({export_format}, gzip={use_gzip}) para {current_user.username}")
+
+    return Response(
+        stream_with_context(body),
+        content_type=content_type,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            # Evitar que nginx acumule la respuesta completa antes de enviarla
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @bp.route('/admin/api/quotes/stats', methods=['GET'])
+@admin_required
+@read_replica
 def api_quotes_stats():
     """API: Estadísticas de cotizaciones"""
     try:
         from datetime import date, timedelta
         
         today = date.today()
+        # SUM(hit_count): en modo dedup una fila representa varias cotizaciones
+        # (se cuentan en el día de la primera)
+        quote_count = db.func.coalesce(db.func.sum(ShippingQuote.hit_count), 0)
         
-        # Cotizaciones de hoy
-        today_quotes = ShippingQuote.query.filter(
-            db.func.date(ShippingQuote.created_at) == today
-        ).count()
+        # Cotizaciones de hoy (rango sobre created_at para usar el índice)
+        today_quotes = db.session.query(quote_count).filter(
+            ShippingQuote.created_at >= datetime.combine(today, time.min)
+        ).scalar()
         
-        # Total de cotizaciones
-        total_quotes = ShippingQuote.query.count()
+        # Total de cotizaciones y filas guardadas en un solo recorrido de la tabla
+        total_quotes, stored_rows = db.session.query(quote_count, db.func.count(ShippingQuote.id)).one()
         
         return jsonify({
             'success': True,
             'stats': {
-                'today_quotes': today_quotes,
-                'total_quotes': total_quotes
+                'today_quotes': int(today_quotes),
+                'total_quotes': int(total_quotes),
+                'stored_rows': stored_rows
             }
         })
         
@@ -541,6 +1182,228 @@ def api_quotes_stats():
             'error': str(e)
         }), 500
 
+@bp.route('/admin/api/google-usage', methods=['GET'])
+@admin_required
+@read_replica
+def api_google_usage():
+    """
+    API: Uso y costo estimado de Google Maps por día y endpoint
+
+    GET /shipping/admin/api/google-usage?days=30
+    Incluye llamadas evitadas por caché/polígonos y el ahorro estimado.
+    """
+    try:
+        from datetime import date, timedelta
+
+        days = min(request.args.get('days', 30, type=int), 366)
+        since = date.today() - timedelta(days=days - 1)
+
+        # Incluir lo pendiente de este worker (los demás vuelcan cada USAGE_FLUSH_INTERVAL;
+        # leyendo de la réplica aparece tras su atraso, como máximo REPLICA_MAX_LAG_SECONDS)
+        usage_tracker.flush()
+
+        rows = GoogleApiUsage.query.filter(GoogleApiUsage.day >= since).all()
+
+        return jsonify({
+            'success': True,
+            'since': since.isoformat(),
+            'usage': summarize_usage(rows)
+        })
+
+    except Exception as e:
+        logging.error(f"Error al obtener uso de Google Maps: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/admin/api/heatmap', methods=['GET'])
+@admin_required
+def api_demand_heatmap():
+    """
+    API: Mapa de calor de demanda (celdas geohash precalculadas)
+
+    Lee el primario (sin @read_replica): el volcado de este worker justo antes de la
+    consulta escribe en el primario y la réplica podría no tenerlo todavía.
+
+    GET /shipping/admin/api/heatmap?south=-33.6&west=-70.8&north=-33.3&east=-70.5&zoom=12
+        &date_from=2026-01-01&date_to=2026-01-31
+    Sin fechas: últimos 30 días. Superponer con /api/zones para comparar con las zonas.
+    """
+    try:
+        south, west, north, east = (
+            float(request.args[name]) for name in ('south', 'west', 'north', 'east')
+        )
+    except (KeyError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'south, west, north y east son obligatorios y numéricos'
+        }), 400
+
+    try:
+        zoom = int(request.args.get('zoom', 11))
+        date_from = parse_date_arg(request.args.get('date_from'))
+        date_to = parse_date_arg(request.args.get('date_to'))
+        if not date_from and not date_to:
+            date_from = datetime.utcnow() - timedelta(days=29)
+        # La tabla agrega por día: comparar con fechas, no timestamps
+        date_from = date_from.date() if date_from else None
+        date_to = date_to.date() if date_to else None
+
+        # Incluir lo pendiente de este worker (los demás vuelcan cada HEATMAP_FLUSH_INTERVAL)
+        demand_aggregator.flush()
+
+        heatmap = query_heatmap(south, west, north, east, zoom, date_from, date_to)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error al obtener mapa de calor: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'date_from': date_from.isoformat() if date_from else None,
+        'date_to': date_to.isoformat() if date_to else None,
+        **heatmap
+    })
+
+@bp.route('/admin/api/pricing/simulate', methods=['POST'])
+@admin_required
+@read_replica
+def api_simulate_pricing():
+    """
+    API: Simular una tabla de zonas/métodos sobre el historial de cotizaciones
+
+    POST /shipping/admin/api/pricing/simulate
+    {"proposal": {"zones": [{"id": 3, "price_clp": 4000}], "methods": [{"code": "envio_hoy", "max_km": 9}]},
+     "date_from": "2026-01-01", "date_to": "2026-03-31"}
+    Sin fechas: últimos 90 días. Retorna baseline (config actual), proposed y delta de
+    ingreso ofrecido y cobertura. No modifica la configuración.
+    """
+    try:
+        from app.services.pricing_simulator import run_simulation
+    except ImportError:
+        return jsonify({
+            'success': False,
+            'error': 'El simulador requiere numpy (pip install -r requirements.txt)'
+        }), 503
+
+    data = request.get_json(silent=True) or {}
+    try:
+        date_from = parse_date_arg(data.get('date_from'))
+        date_to = parse_date_arg(data.get('date_to'), end_of_day=True)
+        if not date_from and not date_to:
+            # Día completo: la misma clave de caché del historial durante el día
+            date_from = datetime.combine(datetime.utcnow().date() - timedelta(days=89), time.min)
+
+        report = run_simulation(data.get('proposal') or {}, date_from, date_to)
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error al simular tarifas: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, **report})
+
+# ========================================
+# CACHÉS EN MEMORIA
+# ========================================
+
+def worker_caches():
+    """Cachés de RouterService de este worker ({} si aún no atendió cotizaciones)"""
+    return router_service.caches() if router_service.is_initialized else {}
+
+# Invalidaciones aplicadas fuera de RouterService (p. ej. desde el user_loader del panel)
+invalidation_sync.caches = worker_caches
+
+@bp.route('/admin/api/cache', methods=['GET'])
+@admin_required
+def api_cache_summary():
+    """
+    API: Resumen de las cachés en memoria del worker que responde
+
+    GET /shipping/admin/api/cache
+    Por caché: hits, misses, evicciones, invalidaciones, hit ratio, memoria estimada e
+    histograma de antigüedad. Tamaño constante (no lista entradas).
+    """
+    invalidation_sync.sync(worker_caches)
+    caches = worker_caches()
+
+    return jsonify({
+        'success': True,
+        'worker_pid': os.getpid(),
+        'caches': [cache.summary() for cache in caches.values()],
+        'address_index': address_index.summary(),
+        'callback_cache_entries': len(callback_cache.entries),
+        'invalidations': invalidation_sync.state()
+    })
+
+@bp.route('/admin/api/cache/<tier>/entries', methods=['GET'])
+@admin_required
+def api_cache_entries(tier):
+    """
+    API: Entradas de una caché, paginadas (orden de inserción)
+
+    GET /shipping/admin/api/cache/geocode_memory/entries?offset=0&limit=50&prefix=av. providencia
+    """
+    cache = worker_caches().get(tier)
+    if cache is None:
+        return jsonify({
+            'success': False,
+            'error': f'Caché {tier} no existe o está vacía en este worker'
+        }), 404
+
+    offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+    limit = max(1, min(request.args.get('limit', 50, type=int) or 50, 500))
+    entries, has_more = cache.entries(offset, limit, request.args.get('prefix') or None)
+
+    return jsonify({
+        'success': True,
+        'worker_pid': os.getpid(),
+        'tier': tier,
+        'offset': offset,
+        'limit': limit,
+        'entries': entries,
+        'next_offset': offset + limit if has_more else None
+    })
+
+@bp.route('/admin/api/cache/invalidate', methods=['POST'])
+@admin_required
+def api_cache_invalidate():
+    """
+    API: Invalidar entradas de las cachés en todos los workers
+
+    POST /shipping/admin/api/cache/invalidate
+    {"tier": "geocode_memory" (opcional: todas), y uno de:
+     "key": "Av. Providencia 1234, Providencia" | "prefix": "Av. Providencia" |
+     "place_id": "ChIJ..." | "bbox": [sur, oeste, norte, este] | "all": true}
+    Se aplica de inmediato en este worker; los demás la aplican en a lo sumo
+    CACHE_INVALIDATION_POLL segundos. Salvo "all", también quita las direcciones del
+    índice del autocompletado; sin tier, vacía además las respuestas del callback.
+    """
+    caches = worker_caches()
+    tiers = ('geocode_memory', 'route_memory', ADDRESS_INDEX_TIER)
+    try:
+        tier, kind, value = parse_invalidation(request.get_json(silent=True) or {}, tiers)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        invalidation_id = invalidation_sync.publish(tier, kind, value, created_by=current_user.username)
+    except Exception as e:
+        logging.error(f"Error al publicar invalidación de caché: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    removed = apply_invalidation(caches, tier, kind, value)
+
+    return jsonify({
+        'success': True,
+        'invalidation_id': invalidation_id,
+        'worker_pid': os.getpid(),
+        'removed_in_this_worker': removed,
+        'propagation_seconds': invalidation_sync.poll_interval
+    })
+
 # ========================================
 # INICIALIZACIÓN DE DATOS POR DEFECTO
 # ========================================
@@ -595,6 +1458,7 @@ def init_default_data():
             db.session.add(zone)
         
         db.session.commit()
+        config_cache.invalidate()
         
         return jsonify({
             'success': True,
@@ -638,6 +1502,13 @@ def create_method():
                 'error': f'Ya existe un método con el código "{data["code"]}"'
             }), 400
 
+        pricing_mode = data.get('pricing_mode', 'distance')
+        if pricing_mode not in PRICING_MODES:
+            return jsonify({
+                'success': False,
+                'error': f'Modo de tarifa inválido: {pricing_mode}'
+            }), 400
+
         # Parsear horas
         from datetime import datetime as dt
         start_time = dt.strptime(data['start_time'], '%H:%M').time()
@@ -651,11 +1522,14 @@ def create_method():
             start_time=start_time,
             end_time=end_time,
             max_km=float(data['max_km']),
+            pricing_mode=pricing_mode,
+            origin_id=data.get('origin_id'),
             is_active=data.get('is_active', True)
         )
 
         db.session.add(method)
         db.session.commit()
+        config_cache.invalidate()
 
         return jsonify({
             'success': True,
@@ -705,6 +1579,15 @@ def update_method(method_id):
             method.max_km = float(data['max_km'])
         if 'is_active' in data:
             method.is_active = data['is_active']
+        if 'pricing_mode' in data:
+            if data['pricing_mode'] not in PRICING_MODES:
+                return jsonify({
+                    'success': False,
+                    'error': f'Modo de tarifa inválido: {data["pricing_mode"]}'
+                }), 400
+            method.pricing_mode = data['pricing_mode']
+        if 'origin_id' in data:
+            method.origin_id = data['origin_id']
 
         # Parsear y actualizar horas si se proveen
         if 'start_time' in data:
@@ -715,6 +1598,7 @@ def update_method(method_id):
             method.end_time = dt.strptime(data['end_time'], '%H:%M').time()
 
         db.session.commit()
+        config_cache.invalidate()
 
         return jsonify({
             'success': True,
@@ -752,6 +1636,7 @@ def delete_method(method_id):
 
         db.session.delete(method)
         db.session.commit()
+        config_cache.invalidate()
 
         return jsonify({
             'success': True,
@@ -780,6 +1665,7 @@ def toggle_method_status(method_id):
 
         method.is_active = not method.is_active
         db.session.commit()
+        config_cache.invalidate()
 
         status = 'activado' if method.is_active else 'desactivado'
         return jsonify({
@@ -807,6 +1693,9 @@ def create_zone():
     try:
         data = request.get_json()
 
+        if data.get('zone_type') == 'polygon':
+            return create_polygon_zone(data)
+
         # Validar campos requeridos
         required_fields = ['min_km', 'max_km', 'price_clp']
         for field in required_fields:
@@ -828,8 +1717,11 @@ def create_zone():
             }), 400
 
         # Validar que no haya solapamiento con otras zonas activas
+        origin_id = data.get('origin_id')
         overlapping_zones = ShippingZone.query.filter(
             ShippingZone.is_active == True,
+            db.or_(ShippingZone.zone_type == 'distance', ShippingZone.zone_type.is_(None)),
+            ShippingZone.origin_id.is_(None) if origin_id is None else ShippingZone.origin_id == origin_id,
             db.or_(
                 db.and_(ShippingZone.min_km <= min_km, ShippingZone.max_km > min_km),
                 db.and_(ShippingZone.min_km < max_km, ShippingZone.max_km >= max_km),
@@ -849,11 +1741,14 @@ def create_zone():
             min_km=min_km,
             max_km=max_km,
             price_clp=price_clp,
+            origin_id=data.get('origin_id'),
             is_active=data.get('is_active', True)
         )
 
         db.session.add(zone)
         db.session.commit()
+        invalidate_polygon_index()
+        config_cache.invalidate()
 
         return jsonify({
             'success': True,
@@ -883,6 +1778,9 @@ def update_zone(zone_id):
 
         data = request.get_json()
 
+        if zone.is_polygon:
+            return update_polygon_zone(zone, data)
+
         # Obtener valores actualizados o mantener los existentes
         min_km = float(data.get('min_km', zone.min_km))
         max_km = float(data.get('max_km', zone.max_km))
@@ -896,9 +1794,12 @@ def update_zone(zone_id):
             }), 400
 
         # Validar que no haya solapamiento con otras zonas activas (excepto la misma)
+        origin_id = data.get('origin_id', zone.origin_id)
         overlapping_zones = ShippingZone.query.filter(
             ShippingZone.id != zone_id,
             ShippingZone.is_active == True,
+            db.or_(ShippingZone.zone_type == 'distance', ShippingZone.zone_type.is_(None)),
+            ShippingZone.origin_id.is_(None) if origin_id is None else ShippingZone.origin_id == origin_id,
             db.or_(
                 db.and_(ShippingZone.min_km <= min_km, ShippingZone.max_km > min_km),
                 db.and_(ShippingZone.min_km < max_km, ShippingZone.max_km >= max_km),
@@ -918,10 +1819,14 @@ def update_zone(zone_id):
         zone.max_km = max_km
         zone.price_clp = price_clp
 
+        if 'origin_id' in data:
+            zone.origin_id = data['origin_id']
         if 'is_active' in data:
             zone.is_active = data['is_active']
 
         db.session.commit()
+        invalidate_polygon_index()
+        config_cache.invalidate()
 
         return jsonify({
             'success': True,
@@ -937,6 +1842,76 @@ def update_zone(zone_id):
             'error': str(e)
         }), 500
 
+def create_polygon_zone(data):
+    """Crear zona poligonal (tarifa por punto en polígono, sin rango de km)"""
+    for field in ['name', 'polygon', 'price_clp']:
+        if field not in data:
+            return jsonify({
+                'success': False,
+                'error': f'Campo requerido: {field}'
+            }), 400
+
+    try:
+        rings = parse_polygon(data['polygon'])
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            'success': False,
+            'error': f'Polígono inválido: {str(e)}'
+        }), 400
+
+    zone = ShippingZone(
+        zone_type='polygon',
+        name=data['name'],
+        min_km=0.0,
+        max_km=0.0,
+        polygon=json.dumps([[list(p) for p in ring] for ring in rings]),
+        price_clp=int(data['price_clp']),
+        origin_id=data.get('origin_id'),
+        is_active=data.get('is_active', True)
+    )
+
+    db.session.add(zone)
+    db.session.commit()
+    invalidate_polygon_index()
+    config_cache.invalidate()
+
+    return jsonify({
+        'success': True,
+        'message': 'Zona creada correctamente',
+        'zone': zone.to_dict()
+    })
+
+def update_polygon_zone(zone, data):
+    """Actualizar zona poligonal existente"""
+    if 'polygon' in data:
+        try:
+            rings = parse_polygon(data['polygon'])
+        except (ValueError, TypeError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Polígono inválido: {str(e)}'
+            }), 400
+        zone.polygon = json.dumps([[list(p) for p in ring] for ring in rings])
+
+    if 'name' in data:
+        zone.name = data['name']
+    if 'price_clp' in data:
+        zone.price_clp = int(data['price_clp'])
+    if 'origin_id' in data:
+        zone.origin_id = data['origin_id']
+    if 'is_active' in data:
+        zone.is_active = data['is_active']
+
+    db.session.commit()
+    invalidate_polygon_index()
+    config_cache.invalidate()
+
+    return jsonify({
+        'success': True,
+        'message': 'Zona actualizada correctamente',
+        'zone': zone.to_dict()
+    })
+
 @bp.route('/admin/api/zones/<int:zone_id>', methods=['DELETE'])
 @admin_required
 def delete_zone(zone_id):
@@ -959,6 +1934,8 @@ def delete_zone(zone_id):
 
         db.session.delete(zone)
         db.session.commit()
+        invalidate_polygon_index()
+        config_cache.invalidate()
 
         return jsonify({
             'success': True,
@@ -987,6 +1964,8 @@ def toggle_zone_status(zone_id):
 
         zone.is_active = not zone.is_active
         db.session.commit()
+        invalidate_polygon_index()
+        config_cache.invalidate()
 
         status = 'activada' if zone.is_active else 'desactivada'
         return jsonify({
@@ -1001,4 +1980,156 @@ def toggle_zone_status(zone_id):
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+# ========================================
+# CRUD PARA ORÍGENES DE DESPACHO (BODEGAS)
+# ========================================
+
+@bp.route('/admin/api/origins', methods=['GET'])
+@admin_required
+def api_get_origins():
+    """API: Obtener orígenes de despacho"""
+    origins = ShippingOrigin.query.order_by(ShippingOrigin.id).all()
+    return jsonify({
+        'success': True,
+        'origins': [origin.to_dict() for origin in origins]
+    })
+
+@bp.route('/admin/api/origins', methods=['POST'])
+@admin_required
+def create_origin():
+    """API: Crear nuevo origen de despacho"""
+    try:
+        data = request.get_json()
+
+        # Validar campos requeridos
+        required_fields = ['name', 'code', 'lat', 'lng']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({
+                    'success': False,
+                    'error': f'Campo requerido: {field}'
+                }), 400
+
+        if ShippingOrigin.query.filter_by(code=data['code']).first():
+            return jsonify({
+                'success': False,
+                'error': f'Ya existe un origen con el código "{data["code"]}"'
+            }), 400
+
+        origin = ShippingOrigin(
+            name=data['name'],
+            code=data['code'],
+            address=data.get('address'),
+            lat=float(data['lat']),
+            lng=float(data['lng']),
+            is_active=data.get('is_active', True)
+        )
+
+        db.session.add(origin)
+        db.session.commit()
+        config_cache.invalidate()
+
+        return jsonify({
+            'success': True,
+            'message': 'Origen creado correctamente',
+            'origin': origin.to_dict()
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error al crear origen: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/admin/api/origins/<int:origin_id>', methods=['PUT'])
+@admin_required
+def update_origin(origin_id):
+    """API: Actualizar origen de despacho"""
+    try:
+        origin = ShippingOrigin.query.get(origin_id)
+        if not origin:
+            return jsonify({
+                'success': False,
+                'error': 'Origen no encontrado'
+            }), 404
+
+        data = request.get_json()
+
+        if 'code' in data and data['code'] != origin.code:
+            if ShippingOrigin.query.filter_by(code=data['code']).first():
+                return jsonify({
+                    'success': False,
+                    'error': f'Ya existe un origen con el código "{data["code"]}"'
+                }), 400
+            origin.code = data['code']
+
+        if 'name' in data:
+            origin.name = data['name']
+        if 'address' in data:
+            origin.address = data['address']
+        if 'lat' in data:
+            origin.lat = float(data['lat'])
+        if 'lng' in data:
+            origin.lng = float(data['lng'])
+        if 'is_active' in data:
+            origin.is_active = data['is_active']
+
+        db.session.commit()
+        config_cache.invalidate()
+
+        return jsonify({
+            'success': True,
+            'message': 'Origen actualizado correctamente',
+            'origin': origin.to_dict()
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error al actualizar origen: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/admin/api/origins/<int:origin_id>', methods=['DELETE'])
+@admin_required
+def delete_origin(origin_id):
+    """API: Eliminar origen de despacho"""
+    try:
+        origin = ShippingOrigin.query.get(origin_id)
+        if not origin:
+            return jsonify({
+                'success': False,
+                'error': 'Origen no encontrado'
+            }), 404
+
+        # Verificar si tiene cotizaciones, métodos o zonas asociadas
+        quotes_count = ShippingQuote.query.filter_by(origin_id=origin_id).count()
+        linked_count = (ShippingMethod.query.filter_by(origin_id=origin_id).count() +
+                        ShippingZone.query.filter_by(origin_id=origin_id).count())
+        if quotes_count > 0 or linked_count > 0:
+            return jsonify({
+                'success': False,
+                'error': f'No se puede eliminar. Hay {quotes_count} cotizaciones y {linked_count} métodos/zonas asociados a este origen. Desactívalo en su lugar.'
+            }), 400
+
+        db.session.delete(origin)
+        db.session.commit()
+        config_cache.invalidate()
+
+        return jsonify({
+            'success': True,
+            'message': 'Origen eliminado correctamente'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error al eliminar origen: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
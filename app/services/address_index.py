@@ -0,0 +1,386 @@
+# app/services/address_index.py
+"""
+Autocompletado de direcciones con un índice de prefijos local (sin llamar a Google)
+- Fuente: destinos validados (accept/warning) de cada cotización con ruta; se
+  acumulan en memoria por worker y un hilo de fondo los vuelca a address_suggestions
+  cada ADDRESS_FLUSH_INTERVAL segundos (hit_count = cotizaciones, la popularidad)
+- Índice en memoria: arreglo ordenado de claves normalizadas (minúsculas, sin tildes
+  ni puntuación) con búsqueda binaria; cada dirección se indexa completa y desde cada
+  palabra de la calle ("providencia 12" encuentra "Av. Providencia 1234, ...")
+- Se carga completo una vez por worker (en un hilo de fondo) y luego cada
+  ADDRESS_INDEX_REFRESH segundos solo las filas nuevas o actualizadas (updated_at)
+- Cada sugerencia trae el resultado de geocodificación: si el checkout cotiza con esa
+  formatted_address, RouterService la encuentra aquí y no llama a Google
+- rebuild_address_index.py reconstruye la tabla desde shipping_quotes
+"""
+
+import os
+import re
+import bisect
+import logging
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.services.buffered_aggregator import BufferedAggregator
+
+ADDRESS_INDEX_REFRESH = float(os.environ.get('ADDRESS_INDEX_REFRESH', 60))
+ADDRESS_FLUSH_INTERVAL = float(os.environ.get('ADDRESS_FLUSH_INTERVAL', 60))
+ADDRESS_SUGGEST_MIN_CHARS = int(os.environ.get('ADDRESS_SUGGEST_MIN_CHARS', 3))
+ADDRESS_SUGGEST_MAX_LIMIT = 20
+
+# Coincidencias revisadas por consulta antes de ordenar por popularidad
+SCAN_LIMIT = 200
+# Claves nuevas que se acumulan en el tramo pequeño antes de fusionarlo con el principal
+DELTA_MAX_KEYS = 5000
+# Palabras de la calle (antes de la primera coma) desde las que también se indexa
+STREET_WORD_KEYS = 3
+# Margen al pedir filas actualizadas: volcados de otros workers que confirmaron tarde
+REFRESH_OVERLAP = timedelta(seconds=max(ADDRESS_FLUSH_INTERVAL, 60) * 2)
+LOAD_CHUNK_SIZE = 20000
+
+VALID_LEVELS = ('accept', 'warning')
+GEOCODE_FIELDS = ('formatted_address', 'lat', 'lng', 'granularity', 'validation_level',
+                  'confidence', 'location_type', 'place_id')
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def fold_address(address: str) -> str:
+    """'Av. Providencia 1.234, Ñuñoa' -> 'av providencia 1 234 nunoa'"""
+    text = (address or '').lower()
+    if not text.isascii():
+        # Sin tildes (ñ -> n); se descarta lo que no tiene equivalente ASCII
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_PUNCTUATION.sub(' ', text).split())
+
+
+def index_keys(formatted_address: str) -> Tuple[str, List[str]]:
+    """(dirección normalizada, claves de búsqueda): la completa y desde cada palabra de la calle"""
+    folded = fold_address(formatted_address)
+    keys = [folded]
+    street_words = len(fold_address(formatted_address.split(',')[0]).split(' '))
+    words = folded.split(' ')
+    position = 0
+    for index, word in enumerate(words[:min(street_words, STREET_WORD_KEYS)]):
+        if index > 0:
+            keys.append(folded[position:])
+        position += len(word) + 1
+    return folded, keys
+
+
+def _matcher(kind: str, value):
+    """
+    Predicado (dirección normalizada, entrada) para una invalidación del panel:
+    'key' (misma dirección normalizada), 'prefix', 'place_id' o 'bbox' (sur, oeste, norte, este)
+    """
+    if kind == 'key':
+        target = fold_address(value)
+        return lambda folded, entry: folded == target
+    if kind == 'prefix':
+        target = fold_address(value)
+        return lambda folded, entry: folded.startswith(target)
+    if kind == 'place_id':
+        return lambda folded, entry: entry.get('place_id') == value
+    if kind == 'bbox':
+        south, west, north, east = value
+        return lambda folded, entry: (entry.get('lat') is not None and entry.get('lng') is not None and
+                                      south <= entry['lat'] <= north and west <= entry['lng'] <= east)
+    raise ValueError(f"Tipo de invalidación no soportado por el índice de direcciones: {kind}")
+
+
+def _scan(keys, ids, prefix, seen, candidates, entries):
+    """Agregar a candidates las entradas cuyas claves empiezan con prefix (búsqueda binaria)"""
+    start = bisect.bisect_left(keys, prefix)
+    for position in range(start, min(start + SCAN_LIMIT, len(keys))):
+        if not keys[position].startswith(prefix):
+            break
+        entry_id = ids[position]
+        if entry_id not in seen:
+            seen.add(entry_id)
+            # Las entradas invalidadas dejan sus claves hasta la próxima reconstrucción
+            entry = entries.get(entry_id)
+            if entry is not None:
+                candidates.append(entry)
+
+
+class AddressPrefixIndex:
+    """
+    Arreglos ordenados (clave, id) + entradas por id
+
+    Las claves nuevas van a un tramo pequeño ordenado (delta) que se fusiona con el
+    principal al superar DELTA_MAX_KEYS: un refresco incremental no reordena todo.
+    Cada actualización reemplaza las referencias (los lectores no toman lock).
+    """
+
+    def __init__(self, refresh_interval: float = 60):
+        self.refresh_interval = refresh_interval
+        self.main = ([], [])    # (claves ordenadas, id de la entrada de cada clave)
+        self.delta = ([], [])   # Igual, agregadas desde la última fusión
+        self.entries = {}       # {id: {geocode + hit_count}}
+        self.by_folded = {}     # {dirección normalizada: id}
+        self.watermark = None   # Máximo updated_at cargado
+        self.loaded_at = None   # monotonic de la última carga
+        self.removed_ids = set()  # Invalidados desde el panel
+        self.lock = threading.Lock()        # Una recarga a la vez
+        self.write_lock = threading.Lock()  # apply / invalidate
+
+    @property
+    def size(self) -> int:
+        return len(self.entries)
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict]:
+        """Completar un prefijo: más populares primero, luego accept antes que warning y más cortas"""
+        prefix = fold_address(query)
+        if len(prefix) < ADDRESS_SUGGEST_MIN_CHARS:
+            return []
+
+        entries = self.entries
+        seen = set()
+        candidates = []
+        _scan(*self.main, prefix, seen, candidates, entries)
+        _scan(*self.delta, prefix, seen, candidates, entries)
+
+        candidates.sort(key=lambda entry: (-entry['hit_count'], entry['validation_level'] != 'accept',
+                                           len(entry['formatted_address'])))
+        return candidates[:limit]
+
+    def lookup(self, address: str) -> Optional[Dict]:
+        """Entrada cuya dirección normalizada es exactamente `address`"""
+        entry_id = self.by_folded.get(fold_address(address))
+        return self.entries.get(entry_id) if entry_id is not None else None
+
+    def apply(self, rows):
+        """Incorporar filas de address_suggestions (nuevas o actualizadas)"""
+        with self.write_lock:
+            rows = [row for row in rows if row.id not in self.removed_ids]
+            if rows:
+                self._apply(rows)
+
+    def _apply(self, rows):
+        entries = dict(self.entries)
+        by_folded = dict(self.by_folded)
+        new_pairs = []
+        watermark = self.watermark
+
+        for row in rows:
+            entry = {field: getattr(row, field) for field in GEOCODE_FIELDS}
+            entry['hit_count'] = row.hit_count or 1
+            if row.id not in entries:
+                folded, keys = index_keys(row.formatted_address)
+                new_pairs.extend((key, row.id) for key in keys)
+                by_folded[folded] = row.id
+            entries[row.id] = entry
+            if row.updated_at and (watermark is None or row.updated_at > watermark):
+                watermark = row.updated_at
+
+        main, delta = self.main, self.delta
+        if new_pairs:
+            pairs = list(zip(*delta)) + new_pairs
+            pairs.sort()
+            if len(pairs) > DELTA_MAX_KEYS:
+                # Fusión con el tramo principal: timsort mezcla dos tramos ordenados en tiempo lineal
+                pairs = list(zip(*main)) + pairs
+                pairs.sort()
+                main = ([key for key, _ in pairs], [entry_id for _, entry_id in pairs])
+                delta = ([], [])
+            else:
+                delta = ([key for key, _ in pairs], [entry_id for _, entry_id in pairs])
+
+        # Entradas antes que claves: un lector concurrente nunca ve un id sin entrada;
+        # entre main y delta a lo sumo ve una clave repetida (suggest deduplica por id)
+        self.entries = entries
+        self.by_folded = by_folded
+        self.main = main
+        self.delta = delta
+        self.watermark = watermark
+
+    def invalidate(self, kind: str, value) -> int:
+        """
+        Quitar entradas del índice (invalidación desde el panel); suggest omite sus claves
+
+        Para que no vuelvan en la próxima recarga, el panel también las borra de
+        address_suggestions (delete_suggestions).
+        """
+        matches = _matcher(kind, value)
+        with self.write_lock:
+            entries = self.entries
+            removed = {entry_id for folded, entry_id in self.by_folded.items()
+                       if entry_id in entries and matches(folded, entries[entry_id])}
+            if not removed:
+                return 0
+            # Un id borrado no vuelve (si la dirección se valida de nuevo, la fila es nueva)
+            self.removed_ids |= removed
+            self.entries = {entry_id: entry for entry_id, entry in entries.items() if entry_id not in removed}
+            self.by_folded = {folded: entry_id for folded, entry_id in self.by_folded.items()
+                              if entry_id not in removed}
+        logging.info(f"Índice de direcciones: {len(removed)} direcciones invalidadas ({kind})")
+        return len(removed)
+
+    def summary(self) -> Dict:
+        """Resumen para el panel de cachés"""
+        return {
+            'tier': 'address_index',
+            'entries': self.size,
+            'keys': len(self.main[0]) + len(self.delta[0]),
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'loaded_seconds_ago': round(time.monotonic() - self.loaded_at, 1) if self.loaded_at else None,
+        }
+
+    def refresh(self):
+        """Cargar filas nuevas/actualizadas desde la última carga (todo la primera vez)"""
+        from app import db
+        from app.models import AddressSuggestion
+
+        columns = (AddressSuggestion.id, AddressSuggestion.hit_count, AddressSuggestion.updated_at) + \
+            tuple(getattr(AddressSuggestion, field) for field in GEOCODE_FIELDS)
+        since = self.watermark - REFRESH_OVERLAP if self.watermark else None
+        rows = []
+        last_id = 0
+        while True:
+            query = db.session.query(*columns).filter(AddressSuggestion.id > last_id)
+            if since is not None:
+                query = query.filter(AddressSuggestion.updated_at >= since)
+            chunk = query.order_by(AddressSuggestion.id).limit(LOAD_CHUNK_SIZE).all()
+            if not chunk:
+                break
+            rows.extend(chunk)
+            last_id = chunk[-1].id
+        db.session.rollback()
+
+        # Un solo reemplazo del índice con todas las filas
+        self.apply(rows)
+
+        if since is None:
+            logging.info("Índice de direcciones cargado: %d direcciones", self.size)
+        self.loaded_at = time.monotonic()
+        return len(rows)
+
+    def refresh_if_due(self):
+        """
+        Refrescar desde la BD en un hilo de fondo si venció el intervalo
+
+        Nunca bloquea el request: mientras carga se responde con lo ya cargado (vacío en
+        la primera carga del worker). El hilo se crea por worker, después del fork.
+        """
+        from flask import has_app_context, current_app
+
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.refresh_interval:
+            return
+        if not has_app_context() or not self.lock.acquire(blocking=False):
+            return
+
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    self.refresh()
+            except Exception as e:
+                logging.error(f"Error refrescando índice de direcciones: {e}")
+                self.loaded_at = time.monotonic()  # Reintentar en el próximo intervalo
+            finally:
+                self.lock.release()
+
+        threading.Thread(target=run, name='address-index-refresh', daemon=True).start()
+
+
+class AddressRecorder(BufferedAggregator):
+    """Direcciones validadas acumuladas en memoria con volcado periódico (como demand_aggregator)"""
+
+    label = 'direcciones validadas'
+    # pending: {address_key: fila para AddressSuggestion.upsert_many}
+
+    def record(self, geocode: Dict):
+        """
+        Registrar el destino de una cotización (resultado de validate_and_geocode_address);
+        ignora fallidos y rechazados
+        """
+        if not geocode.get('success') or geocode.get('validation_level') not in VALID_LEVELS:
+            return
+        if geocode.get('lat') is None or geocode.get('lng') is None:
+            return
+
+        from app.models import AddressSuggestion
+
+        folded = fold_address(geocode['formatted_address'])
+        if not folded:
+            return
+        key = AddressSuggestion.make_address_key(folded)
+
+        with self.lock:
+            row = self.pending.get(key)
+            if row is None:
+                row = self.pending[key] = {field: geocode.get(field) for field in GEOCODE_FIELDS}
+                row['formatted_address'] = row['formatted_address'][:500]
+                row['address_key'] = key
+                row['hit_count'] = 0
+            row['hit_count'] += 1
+        self._ensure_flusher()
+
+    def discard(self, kind: str, value) -> int:
+        """Quitar direcciones pendientes de volcar que coinciden con una invalidación del panel"""
+        matches = _matcher(kind, value)
+        with self.lock:
+            keys = [key for key, row in self.pending.items()
+                    if matches(fold_address(row['formatted_address']), row)]
+            for key in keys:
+                del self.pending[key]
+        return len(keys)
+
+    def _write(self, conn, pending: Dict):
+        """Volcar a address_suggestions"""
+        from app.models import AddressSuggestion
+
+        AddressSuggestion.upsert_many(conn, list(pending.values()))
+
+    def _restore(self, pending: Dict):
+        for key, row in pending.items():
+            current = self.pending.setdefault(key, dict(row, hit_count=0))
+            current['hit_count'] += row['hit_count']
+
+
+address_index = AddressPrefixIndex(refresh_interval=ADDRESS_INDEX_REFRESH)
+address_recorder = AddressRecorder(flush_interval=ADDRESS_FLUSH_INTERVAL)
+
+
+def suggest_addresses(query: str, limit: int = 8) -> List[Dict]:
+    """Sugerencias para el texto escrito (refresca el índice si corresponde)"""
+    address_index.refresh_if_due()
+    return address_index.suggest(query, limit)
+
+
+def find_indexed_address(address: str) -> Optional[Dict]:
+    """Geocodificación guardada para una dirección ya validada, o None"""
+    address_index.refresh_if_due()
+    return address_index.lookup(address)
+
+
+def delete_suggestions(kind: str, value) -> int:
+    """
+    Borrar de address_suggestions las direcciones de una invalidación del panel (sin commit)
+
+    'prefix' compara formatted_address con LIKE (la colación de MySQL no distingue
+    mayúsculas ni tildes); el índice en memoria compara la dirección normalizada.
+    """
+    from app import db
+    from app.models import AddressSuggestion
+
+    query = db.session.query(AddressSuggestion)
+    if kind == 'key':
+        query = query.filter(AddressSuggestion.address_key ==
+                             AddressSuggestion.make_address_key(fold_address(value)))
+    elif kind == 'prefix':
+        escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(AddressSuggestion.formatted_address.like(f'{escaped}%', escape='\\'))
+    elif kind == 'place_id':
+        query = query.filter(AddressSuggestion.place_id == value)
+    elif kind == 'bbox':
+        south, west, north, east = value
+        query = query.filter(AddressSuggestion.lat.between(south, north),
+                             AddressSuggestion.lng.between(west, east))
+    else:
+        raise ValueError(f"Tipo de invalidación no soportado por el índice de direcciones: {kind}")
+    return query.delete(synchronize_session=False)
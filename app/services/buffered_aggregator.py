@@ -0,0 +1,106 @@
+# app/services/buffered_aggregator.py
+"""
+Base de los agregadores en memoria con volcado periódico a la BD
+(uso de Google Maps, mapa de calor de demanda y direcciones validadas)
+- record() solo suma bajo lock: el request nunca escribe en la BD
+- Un hilo de fondo por proceso vuelca cada flush_interval segundos; se crea en el
+  primer registro (con preload_app, init_app corre en el master antes del fork)
+- Al salir del proceso se vuelca lo pendiente (atexit)
+- Si el volcado falla, lo tomado se reincorpora para el próximo intento
+"""
+
+import os
+import atexit
+import logging
+import threading
+import time
+from typing import Dict
+
+
+class BufferedAggregator:
+    """Pendientes en memoria ({clave: acumulado}) con volcado en un hilo de fondo"""
+
+    # Qué se vuelca (mensajes de log)
+    label = 'agregados'
+
+    def __init__(self, flush_interval: float = 60):
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.app = None
+        self.flusher_pid = None
+
+    def init_app(self, app):
+        """Guardar la app para volcar fuera de un request (hilo de fondo y atexit)"""
+        self.app = app
+        atexit.register(self.flush_with_app)
+
+    def _write(self, conn, pending: Dict):
+        """Escribir los pendientes tomados en una transacción"""
+        raise NotImplementedError
+
+    def _restore(self, pending: Dict):
+        """Reincorporar pendientes cuyo volcado falló (con self.lock tomado)"""
+        raise NotImplementedError
+
+    def _ensure_flusher(self):
+        """Iniciar el hilo de volcado de este proceso si aún no existe"""
+        if self.flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+
+        if self.app is None:
+            # Scripts sin init_app: usar la app del contexto que registra
+            from flask import has_app_context, current_app
+            if has_app_context():
+                self.init_app(current_app._get_current_object())
+
+        threading.Thread(target=self._run, name=f'{type(self).__name__}-flush', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(self.flush_interval - (time.monotonic() - self.last_flush), 0.01))
+            if time.monotonic() - self.last_flush < self.flush_interval:
+                continue  # Hubo un volcado manual entremedio
+            try:
+                self.flush_with_app()
+            except Exception as e:
+                logging.error(f"Error volcando {self.label}: {e}")
+                self.last_flush = time.monotonic()
+
+    def _take(self) -> Dict:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        return pending
+
+    def flush(self):
+        """Volcar pendientes a la BD (requiere contexto de app)"""
+        pending = self._take()
+        if not pending:
+            return
+
+        from app import db
+
+        try:
+            with db.engine.begin() as conn:
+                self._write(conn, pending)
+        except Exception as e:
+            logging.error(f"Error volcando {self.label}: {e}")
+            # Reincorporar para el próximo intento
+            with self.lock:
+                self._restore(pending)
+
+    def flush_with_app(self):
+        """Volcar usando la app registrada si no hay contexto activo"""
+        from flask import has_app_context
+
+        if has_app_context():
+            self.flush()
+        elif self.app is not None:
+            with self.app.app_context():
+                self.flush()
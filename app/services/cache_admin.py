@@ -0,0 +1,204 @@
+# app/services/cache_admin.py
+"""
+Administración de las cachés en memoria (geocodificación, rutas e índice de direcciones)
+- Resúmenes O(1) por caché: hits, misses, expiradas, evicciones, invalidaciones, hit ratio,
+  memoria estimada e histograma de antigüedad (contadores mantenidos al insertar y quitar)
+- Inspección paginada de entradas
+- Invalidación por clave, prefijo, place_id, bounding box o todo: se aplica de inmediato
+  en el worker que atiende el panel y se publica en cache_invalidations; los demás workers
+  la aplican la próxima vez que usan RouterService, consultando la tabla como máximo cada
+  CACHE_INVALIDATION_POLL segundos (una consulta por PK con su propia conexión)
+- Las direcciones invalidadas también se quitan del índice de direcciones y de
+  address_suggestions, para que no se vuelvan a servir desde ahí
+- Los contadores son del worker que responde; /metrics agrega hits y misses de todos
+- La misma tabla propaga los cambios de usuarios del panel (tier admin_users, publicados
+  por user_cache): el user_loader también consulta las invalidaciones nuevas
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.services.address_index import address_index, address_recorder
+from app.services.callback_cache import callback_cache
+from app.services.user_cache import admin_user_cache, ADMIN_USER_TIER
+
+CACHE_INVALIDATION_POLL = float(os.environ.get('CACHE_INVALIDATION_POLL', 5))
+
+INVALIDATION_KINDS = ('key', 'prefix', 'place_id', 'bbox', 'all')
+ADDRESS_INDEX_TIER = 'address_index'
+
+# Largo mínimo de un prefijo (evita vaciar media caché con un typo)
+MIN_PREFIX_CHARS = 3
+
+
+def parse_bbox(value) -> Tuple[float, float, float, float]:
+    """[sur, oeste, norte, este] como lista o 'sur,oeste,norte,este'"""
+    if isinstance(value, str):
+        value = value.split(',')
+    try:
+        south, west, north, east = (float(v) for v in value)
+    except (TypeError, ValueError):
+        raise ValueError('bbox debe ser [sur, oeste, norte, este]')
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError('bbox fuera de rango (sur <= norte, oeste <= este)')
+    return south, west, north, east
+
+
+def parse_invalidation(data: Dict, tiers) -> Tuple[Optional[str], str, Any]:
+    """
+    (tier, tipo, valor) desde el JSON del panel; ValueError si es inválido
+
+    data: {"tier": opcional, y uno de "key", "prefix", "place_id", "bbox" o "all": true}
+    """
+    tier = data.get('tier') or None
+    if tier is not None and tier not in tiers:
+        raise ValueError(f"tier desconocido: {tier} (válidos: {', '.join(tiers)})")
+
+    kinds = [kind for kind in INVALIDATION_KINDS if data.get(kind) not in (None, '', False)]
+    if len(kinds) != 1:
+        raise ValueError(f"Indica exactamente uno de: {', '.join(INVALIDATION_KINDS)}")
+    kind = kinds[0]
+
+    if kind == 'all':
+        if tier == ADDRESS_INDEX_TIER:
+            raise ValueError('El índice de direcciones no se vacía completo (ver rebuild_address_index.py)')
+        return tier, kind, None
+    if kind == 'bbox':
+        return tier, kind, parse_bbox(data['bbox'])
+
+    value = str(data[kind]).strip()
+    if not value or (kind == 'prefix' and len(value) < MIN_PREFIX_CHARS):
+        raise ValueError(f"{kind} vacío o demasiado corto")
+    return tier, kind, value[:500]
+
+
+def encode_value(kind: str, value) -> Optional[str]:
+    return ','.join(repr(v) for v in value) if kind == 'bbox' else value
+
+
+def decode_value(kind: str, value: Optional[str]):
+    return parse_bbox(value) if kind == 'bbox' else value
+
+
+def apply_invalidation(caches: Dict, tier: Optional[str], kind: str, value) -> Dict[str, int]:
+    """
+    Aplicar una invalidación a las cachés de este worker
+
+    Args:
+        caches: {tier: AddressCache} de RouterService ({} si aún no se creó)
+        tier: una caché o None para todas (incluye las respuestas del callback; 'all'
+            sin tier no toca el índice de direcciones)
+
+    Returns:
+        Dict[str, int]: entradas quitadas por caché
+    """
+    removed = {}
+    if tier == ADMIN_USER_TIER:
+        # Usuario desactivado, borrado o con otro password: se recarga desde la BD
+        admin_user_cache.invalidate(value if kind == 'key' else None)
+        return removed
+    for name, cache in caches.items():
+        if tier in (None, name):
+            removed[name] = cache.invalidate(kind, value)
+    if tier == ADDRESS_INDEX_TIER or (tier is None and kind != 'all'):
+        removed[ADDRESS_INDEX_TIER] = address_index.invalidate(kind, value)
+        address_recorder.discard(kind, value)
+    if tier is None:
+        # Las respuestas del callback incluyen rutas y precios ya calculados
+        callback_cache.clear()
+    return removed
+
+
+class CacheInvalidationSync:
+    """Últimas invalidaciones aplicadas por este worker (polling de cache_invalidations)"""
+
+    def __init__(self, poll_interval: float = 5):
+        self.poll_interval = poll_interval
+        self.last_id = None
+        self.checked_at = 0.0
+        # Al aplicar por primera vez: invalidaciones publicadas desde que arrancó el proceso
+        self.started_at = datetime.utcnow()
+        self.lock = threading.Lock()
+        # Cachés de RouterService del worker (las registra el blueprint; sin él, ninguna)
+        self.caches = dict
+
+    def sync(self, caches: Optional[Callable[[], Dict]] = None):
+        """
+        Aplicar invalidaciones nuevas si venció el intervalo
+
+        caches: función que entrega las cachés del worker (por defecto self.caches)
+        """
+        from flask import has_app_context
+
+        caches = caches or self.caches
+
+        if time.monotonic() - self.checked_at < self.poll_interval or not has_app_context():
+            return
+        if not self.lock.acquire(blocking=False):
+            return
+
+        try:
+            from app import db
+
+            with db.engine.connect() as conn:
+                if self.last_id is None:
+                    self.last_id = conn.execute(text('SELECT MAX(id) FROM cache_invalidations')).scalar() or 0
+                    rows = conn.execute(text(
+                        'SELECT id, tier, kind, value FROM cache_invalidations '
+                        'WHERE id <= :last_id AND created_at >= :since ORDER BY id'
+                    ), {'last_id': self.last_id, 'since': self.started_at}).all()
+                else:
+                    rows = conn.execute(text(
+                        'SELECT id, tier, kind, value FROM cache_invalidations WHERE id > :last_id ORDER BY id'
+                    ), {'last_id': self.last_id}).all()
+
+            if rows:
+                current = caches()
+                for row in rows:
+                    apply_invalidation(current, row.tier, row.kind, decode_value(row.kind, row.value))
+                    self.last_id = max(self.last_id, row.id)
+        except Exception as e:
+            logging.error(f"Error aplicando invalidaciones de caché: {e}")
+        finally:
+            self.checked_at = time.monotonic()
+            self.lock.release()
+
+    def publish(self, tier: Optional[str], kind: str, value, created_by: Optional[str] = None) -> int:
+        """
+        Registrar una invalidación para los demás workers (y borrar las direcciones
+        afectadas de address_suggestions) en una sola transacción
+
+        Returns:
+            int: id de la invalidación
+        """
+        from app import db
+        from app.models import CacheInvalidation
+        from app.services.address_index import delete_suggestions
+
+        try:
+            if tier == ADDRESS_INDEX_TIER or (tier is None and kind != 'all'):
+                delete_suggestions(kind, value)
+            invalidation = CacheInvalidation(tier=tier, kind=kind, value=encode_value(kind, value),
+                                             created_by=created_by)
+            db.session.add(invalidation)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return invalidation.id
+
+    def state(self) -> Dict:
+        return {
+            'last_applied_id': self.last_id,
+            'poll_interval_seconds': self.poll_interval,
+            'checked_seconds_ago': round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        }
+
+
+invalidation_sync = CacheInvalidationSync(poll_interval=CACHE_INVALIDATION_POLL)
@@ -0,0 +1,103 @@
+# app/services/callback_cache.py
+"""
+Caché de respuestas del callback de Jumpseller
+- Jumpseller repite el callback con el mismo carrito y dirección en cada re-render
+  del checkout; la respuesta se reutiliza sin geocodificar, rutear ni insertar cotizaciones
+- Clave: (cart_id/order_id, destino canónico, versión de configuración, métodos
+  disponibles en este momento)
+- Cada entrada vence a los CALLBACK_CACHE_TTL segundos o cuando abre/cierra la ventana
+  horaria de algún método (o cambia el día), lo que ocurra primero
+- En memoria por worker, acotada a CALLBACK_CACHE_MAX_ENTRIES (se descartan las más antiguas)
+"""
+
+import os
+import time
+import threading
+import unicodedata
+from datetime import timedelta
+from typing import Optional
+
+from app.services.metrics import record_cache
+
+CALLBACK_CACHE_TTL = float(os.environ.get('CALLBACK_CACHE_TTL', 300))
+CALLBACK_CACHE_MAX_ENTRIES = int(os.environ.get('CALLBACK_CACHE_MAX_ENTRIES', 10000))
+
+
+def canonical_destination(destination: str) -> str:
+    """Minúsculas, sin tildes ni espacios repetidos: 'Av. Providencia  1234' == 'av. providencia 1234'"""
+    normalized = unicodedata.normalize('NFKD', destination or '')
+    without_accents = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+    return ' '.join(without_accents.lower().split())
+
+
+def seconds_until_schedule_change(schedules, now) -> float:
+    """
+    Segundos hasta el próximo inicio o fin de horario de algún método, o el cambio de día
+
+    schedules: [(start_time, end_time, weekday_availability)] de los métodos activos
+    """
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    candidates = [midnight]
+
+    for start_time, end_time, _ in schedules:
+        # end_time es inclusivo: el método deja de estar disponible justo después
+        for boundary, offset in ((start_time, timedelta(0)), (end_time, timedelta(microseconds=1))):
+            moment = now.replace(hour=boundary.hour, minute=boundary.minute,
+                                 second=boundary.second, microsecond=boundary.microsecond) + offset
+            if moment <= now:
+                moment += timedelta(days=1)
+            candidates.append(moment)
+
+    return max((min(candidates) - now).total_seconds(), 0.0)
+
+
+class CallbackResponseCache:
+    """Respuestas serializadas del callback con vencimiento por entrada"""
+
+    tier = 'callback_response'  # Etiqueta para métricas
+
+    def __init__(self, ttl: float = 300, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}  # {key: (expires_at monotonic, body)}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(reference: str, destination: str, config_version: str, availability: str) -> tuple:
+        return (reference, canonical_destination(destination), config_version, availability)
+
+    def get(self, key) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            record_cache(self.tier, 'miss')
+            return None
+
+        expires_at, body = entry
+        if time.monotonic() >= expires_at:
+            with self.lock:
+                self.entries.pop(key, None)
+            record_cache(self.tier, 'expired')
+            return None
+
+        record_cache(self.tier, 'hit')
+        return body
+
+    def set(self, key, body: bytes, ttl: float = None):
+        """Guardar la respuesta; ttl se acota a CALLBACK_CACHE_TTL"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic() + ttl, body)
+            # Descartar las más antiguas (orden de inserción)
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+
+callback_cache = CallbackResponseCache(ttl=CALLBACK_CACHE_TTL, max_entries=CALLBACK_CACHE_MAX_ENTRIES)
@@ -0,0 +1,101 @@
+# app/services/config_cache.py
+"""
+Caché HTTP de la configuración pública (/api/jumpseller/services, /api/methods, /api/zones)
+- La versión de configuración es la fila única de config_version: cada INSERT, UPDATE o
+  DELETE ORM de ShippingMethod, ShippingZone o ShippingOrigin la incrementa en la misma
+  transacción (init_config_version), así que cualquier edición (polígono, nombre, precio)
+  cambia la versión aunque ocurra en el mismo segundo que otra
+- Leerla es una consulta por clave primaria; cada worker la reutiliza durante
+  CONFIG_VERSION_TTL segundos sin tocar la BD; los endpoints de administración la invalidan
+  al modificar métodos, zonas u orígenes (los demás workers toman el cambio al vencer el TTL)
+- Cambios con SQL directo (fuera del ORM) deben incrementar config_version a mano
+- Los cuerpos JSON se serializan una vez por versión y se sirven con ETag fuerte;
+  un If-None-Match que coincide responde 304 sin consultar la BD
+- La versión también forma parte de la clave de callback_cache.py y del índice de
+  polígonos (routes/shipping.py)
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from sqlalchemy import text
+
+CONFIG_VERSION_TTL = float(os.environ.get('CONFIG_VERSION_TTL', 30))
+
+# Cache-Control de las respuestas (segundos que el cliente puede reutilizarlas sin preguntar)
+CONFIG_CACHE_MAX_AGE = int(os.environ.get('CONFIG_CACHE_MAX_AGE', 60))
+
+# Consulta por clave primaria (fila única id=1)
+VERSION_SQL = text("SELECT version FROM config_version WHERE id = 1")
+
+
+class ConfigCache:
+    """Versión de configuración y cuerpos serializados por versión (por worker)"""
+
+    def __init__(self, ttl: float = 30):
+        self.ttl = ttl
+        self.version = None
+        self.checked_at = 0.0
+        self.entries = {}  # {clave con versión: cuerpo o datos}; se vacía al cambiar de versión
+        self.lock = threading.Lock()
+
+    def invalidate(self):
+        """Forzar relectura de la versión en la próxima consulta"""
+        with self.lock:
+            self.checked_at = 0.0
+
+    def current_version(self) -> str:
+        """Versión vigente; consulta la BD solo si venció el TTL o se invalidó"""
+        if self.version is not None and time.monotonic() - self.checked_at < self.ttl:
+            return self.version
+
+        from app import db
+
+        version = f"v{db.session.execute(VERSION_SQL).scalar() or 0}"
+
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self.entries = {}
+            self.checked_at = time.monotonic()
+        return version
+
+    def etag(self, key: str, variant: str = '') -> str:
+        """ETag de un recurso en la versión actual (variant: estado que no está en la BD)"""
+        version = self.current_version()
+        return f"{key}-{version}-{variant}" if variant else f"{key}-{version}"
+
+    def get(self, key: str, build: Callable[[], Any]) -> Any:
+        """
+        Valor cacheado para `key` (que debe incluir la versión, p. ej. un ETag);
+        lo construye consultando la BD si no está
+        """
+        cached = self.entries.get(key)
+        if cached is not None:
+            return cached
+
+        value = build()
+        with self.lock:
+            self.entries[key] = value
+        return value
+
+
+config_cache = ConfigCache(ttl=CONFIG_VERSION_TTL)
+
+
+def _on_config_write(mapper, connection, target):
+    from app.models import ConfigVersion
+    ConfigVersion.bump(connection)
+
+
+def init_config_version():
+    """Incrementar config_version en cada escritura ORM de métodos, zonas y orígenes"""
+    from sqlalchemy import event
+    from app.models import ShippingMethod, ShippingOrigin, ShippingZone
+
+    for model in (ShippingMethod, ShippingZone, ShippingOrigin):
+        for event_name in ('after_insert', 'after_update', 'after_delete'):
+            if not event.contains(model, event_name, _on_config_write):
+                event.listen(model, event_name, _on_config_write)
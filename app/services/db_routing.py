@@ -0,0 +1,135 @@
+# app/services/db_routing.py
+"""
+Enrutamiento de lecturas a la réplica (bind 'replica' de SQLALCHEMY_BINDS)
+- Solo los endpoints marcados con @read_replica (panel admin y analítica de solo lectura)
+  leen de la réplica; el checkout (/api/quote, callback) y todo lo que escribe sigue en
+  el primario
+- Cada worker mide el atraso de la réplica cada REPLICA_LAG_CHECK_INTERVAL segundos;
+  si supera REPLICA_MAX_LAG_SECONDS, la replicación está detenida o la réplica no
+  responde, las lecturas vuelven al primario hasta la siguiente medición
+- La decisión se toma una vez por request: un mismo request no mezcla réplica y primario
+- Sin réplica configurada todo queda igual que antes (un solo engine)
+"""
+
+import time
+import logging
+import threading
+from functools import wraps
+
+from flask import g, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+from app.services.metrics import record_db_read_route
+
+REPLICA_BIND = 'replica'
+
+
+def measure_replica_lag(engine):
+    """
+    Segundos de atraso de la réplica (0 si el servidor no es réplica o no es MySQL)
+
+    Retorna None si la replicación está detenida (Seconds_Behind_Source NULL)
+    """
+    with engine.connect() as conn:
+        if engine.dialect.name != 'mysql':
+            conn.execute(text('SELECT 1'))
+            return 0.0
+
+        try:
+            row = conn.execute(text('SHOW REPLICA STATUS')).mappings().first()
+        except Exception:
+            # MySQL < 8.0.22 / MariaDB
+            conn.rollback()
+            row = conn.execute(text('SHOW SLAVE STATUS')).mappings().first()
+
+        if row is None:
+            return 0.0
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        return None if lag is None else float(lag)
+
+
+class ReplicaMonitor:
+    """Estado de la réplica por worker, refrescado como máximo cada check_interval segundos"""
+
+    def __init__(self):
+        self.healthy = False
+        self.lag = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def is_usable(self, engine, max_lag: float, check_interval: float) -> bool:
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= check_interval:
+            # Un solo hilo mide; el resto usa el último estado conocido
+            if self.lock.acquire(blocking=self.checked_at is None):
+                try:
+                    self.check(engine, max_lag)
+                finally:
+                    self.lock.release()
+        return self.healthy
+
+    def check(self, engine, max_lag: float):
+        was_healthy = self.healthy
+        try:
+            self.lag = measure_replica_lag(engine)
+            self.healthy = self.lag is not None and self.lag <= max_lag
+            if not self.healthy:
+                reason = 'replicación detenida' if self.lag is None else f'atraso {self.lag:.0f}s > {max_lag:.0f}s'
+                if was_healthy or self.checked_at is None:
+                    logging.warning(f"Réplica de lectura fuera de servicio ({reason}), leyendo del primario")
+            elif not was_healthy and self.checked_at is not None:
+                logging.info(f"Réplica de lectura recuperada (atraso {self.lag:.0f}s)")
+        except Exception as e:
+            self.lag = None
+            self.healthy = False
+            if was_healthy or self.checked_at is None:
+                logging.warning(f"No se pudo consultar la réplica de lectura, leyendo del primario: {e}")
+        self.checked_at = time.monotonic()
+
+
+replica_monitor = ReplicaMonitor()
+
+
+def read_replica(view):
+    """Marcar un endpoint de solo lectura: sus consultas pueden ir a la réplica"""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        g.db_read_replica = True
+        return view(*args, **kwargs)
+    return decorated
+
+
+def _replica_engine_for_request(engines):
+    """Engine de la réplica si este request puede usarlo, si no None"""
+    if not has_request_context() or not g.get('db_read_replica'):
+        return None
+
+    engine = engines.get(REPLICA_BIND)
+    if engine is None:
+        return None
+
+    route = g.get('db_read_route')
+    if route is None:
+        config = current_app.config
+        usable = replica_monitor.is_usable(
+            engine,
+            max_lag=config.get('REPLICA_MAX_LAG_SECONDS', 5),
+            check_interval=config.get('REPLICA_LAG_CHECK_INTERVAL', 10),
+        )
+        route = g.db_read_route = 'replica' if usable else 'primary'
+        record_db_read_route(route)
+
+    return engine if route == 'replica' else None
+
+
+class RoutingSession(Session):
+    """Sesión de Flask-SQLAlchemy que envía las lecturas de endpoints @read_replica a la réplica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # Escrituras (flush del ORM o INSERT/UPDATE/DELETE explícitos) siempre al primario
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            engine = _replica_engine_for_request(self._db.engines)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
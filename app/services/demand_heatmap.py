@@ -0,0 +1,235 @@
+# app/services/demand_heatmap.py
+"""
+Mapa de calor de demanda sobre los destinos cotizados
+- Cada checkout (una request de cotización con tarifas) suma 1 a su celda geohash en varios
+  niveles de precisión (HEATMAP_LEVELS), por día, junto con la distancia y el precio de la
+  tarifa más barata ofrecida; no se cuenta una vez por método
+- El endpoint del admin lee el primario: el volcado previo a la consulta escribe en el
+  primario y la réplica podría no tenerlo todavía
+- Se agrega en memoria por worker y un hilo de fondo vuelca a quote_demand_cells cada
+  HEATMAP_FLUSH_INTERVAL segundos (una fila por celda/día, no por cotización)
+- El endpoint del admin consulta solo las celdas del bounding box al nivel que
+  corresponde al zoom, en vez de enviar millones de puntos al navegador
+- rebuild_heatmap.py recalcula la tabla desde shipping_quotes
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from app.services.buffered_aggregator import BufferedAggregator
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Niveles mantenidos: 4 ≈ 39 km, 5 ≈ 4,9 km, 6 ≈ 1,2 km, 7 ≈ 150 m de ancho de celda
+HEATMAP_LEVELS = tuple(
+    int(level) for level in os.environ.get('HEATMAP_LEVELS', '4,5,6,7').split(',') if level.strip()
+)
+
+# Zoom mínimo (estilo Leaflet/Google Maps, 0-21) a partir del cual se usa cada nivel
+ZOOM_LEVELS = ((14, 7), (11, 6), (9, 5), (0, 4))
+
+# Máximo de celdas devueltas por consulta
+HEATMAP_MAX_CELLS = int(os.environ.get('HEATMAP_MAX_CELLS', 5000))
+
+
+def geohash_encode(lat: float, lng: float, level: int) -> str:
+    """Geohash de `level` caracteres para un punto"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < level:
+        value, interval = (lng, lng_range) if even else (lat, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            interval[0] = mid
+        else:
+            bits <<= 1
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) de una celda geohash"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if (value >> shift) & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def cell_size(level: int) -> Tuple[float, float]:
+    """Alto y ancho en grados de una celda del nivel"""
+    lng_bits = (5 * level + 1) // 2
+    lat_bits = 5 * level // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def level_for_zoom(zoom: int) -> int:
+    """Nivel geohash para un zoom de mapa (limitado a los niveles mantenidos)"""
+    for min_zoom, level in ZOOM_LEVELS:
+        if zoom >= min_zoom:
+            break
+    available = [l for l in HEATMAP_LEVELS if l <= level] or [min(HEATMAP_LEVELS)]
+    return max(available)
+
+
+class DemandAggregator(BufferedAggregator):
+    """Celdas agregadas en memoria con volcado periódico a la BD"""
+
+    label = 'mapa de calor de demanda'
+
+    def __init__(self, levels=HEATMAP_LEVELS, flush_interval: int = 60):
+        super().__init__(flush_interval)
+        self.levels = levels
+        # pending: {(level, geohash, day): [count, distance_km_sum, price_clp_sum]}
+
+    def add(self, cells: Dict, lat, lng, distance_km, price_clp, day, count: int = 1):
+        """Sumar `count` cotizaciones iguales a un diccionario de celdas (sin lock)"""
+        geohash = geohash_encode(lat, lng, max(self.levels))
+        for level in self.levels:
+            cell = cells.setdefault((level, geohash[:level], day), [0, 0.0, 0])
+            cell[0] += count
+            cell[1] += (distance_km or 0.0) * count
+            cell[2] += (price_clp or 0) * count
+
+    def record(self, lat, lng, distance_km, price_clp, day=None):
+        """Registrar una cotización; ignora destinos sin coordenadas"""
+        if lat is None or lng is None:
+            return
+        day = day or datetime.utcnow().date()
+
+        with self.lock:
+            self.add(self.pending, lat, lng, distance_km, price_clp, day)
+        self._ensure_flusher()
+
+    def _write(self, conn, cells: Dict):
+        """Volcar celdas a quote_demand_cells"""
+        write_cells(conn, cells)
+
+    def _restore(self, cells: Dict):
+        for key, (count, distance_sum, price_sum) in cells.items():
+            cell = self.pending.setdefault(key, [0, 0.0, 0])
+            cell[0] += count
+            cell[1] += distance_sum
+            cell[2] += price_sum
+
+
+def write_cells(conn, cells: Dict, batch_size: int = 1000):
+    """Upsert de celdas agregadas {(level, geohash, day): [count, distance_sum, price_sum]}"""
+    from app.models import QuoteDemandCell
+
+    rows = []
+    for (level, geohash, day), (count, distance_sum, price_sum) in cells.items():
+        south, west, north, east = geohash_bounds(geohash)
+        rows.append({
+            'level': level, 'geohash': geohash, 'day': day,
+            'lat': (south + north) / 2, 'lng': (west + east) / 2,
+            'quote_count': count, 'distance_km_sum': distance_sum, 'price_clp_sum': price_sum
+        })
+        if len(rows) >= batch_size:
+            QuoteDemandCell.upsert_many(conn, rows)
+            rows = []
+    QuoteDemandCell.upsert_many(conn, rows)
+
+
+demand_aggregator = DemandAggregator(flush_interval=int(os.environ.get('HEATMAP_FLUSH_INTERVAL', 60)))
+
+
+def record_checkout_demand(rates):
+    """
+    Registrar un checkout una sola vez, con la tarifa más barata ofrecida
+
+    Args:
+        rates: [(lat, lng, km, precio)] de cada método cotizado en la request
+    """
+    if rates:
+        demand_aggregator.record(*min(rates, key=lambda rate: rate[3]))
+
+
+def query_heatmap(south: float, west: float, north: float, east: float, zoom: int,
+                  date_from=None, date_to=None) -> Dict:
+    """
+    Celdas del bounding box al nivel del zoom, sumadas sobre el rango de días
+
+    Raises:
+        ValueError: Si el bounding box no es válido
+    """
+    from app import db
+    from app.models import QuoteDemandCell
+
+    if not (-90 <= south < north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("Bounding box inválido (south < north, longitudes entre -180 y 180)")
+    if west > east:
+        raise ValueError("Bounding box que cruza el antimeridiano no soportado")
+
+    level = level_for_zoom(zoom)
+    cell = QuoteDemandCell
+    # Incluir celdas cuyo centro cae fuera del bbox pero que lo intersectan
+    half_lat, half_lng = (size / 2 for size in cell_size(level))
+
+    query = db.session.query(
+        cell.geohash,
+        cell.lat,
+        cell.lng,
+        db.func.sum(cell.quote_count),
+        db.func.sum(cell.distance_km_sum),
+        db.func.sum(cell.price_clp_sum),
+    ).filter(
+        cell.level == level,
+        cell.lat.between(south - half_lat, north + half_lat),
+        cell.lng.between(west - half_lng, east + half_lng),
+    )
+    if date_from:
+        query = query.filter(cell.day >= date_from)
+    if date_to:
+        query = query.filter(cell.day <= date_to)
+
+    rows = query.group_by(cell.geohash, cell.lat, cell.lng).limit(HEATMAP_MAX_CELLS + 1).all()
+    truncated = len(rows) > HEATMAP_MAX_CELLS
+
+    cells: List[Dict] = []
+    for geohash, lat, lng, count, distance_sum, price_sum in rows[:HEATMAP_MAX_CELLS]:
+        count = int(count or 0)
+        if not count:
+            continue
+        cells.append({
+            'geohash': geohash,
+            'lat': lat,
+            'lng': lng,
+            'count': count,
+            'avg_distance_km': round(float(distance_sum) / count, 2),
+            'avg_price_clp': round(float(price_sum) / count)
+        })
+
+    height, width = cell_size(level)
+    return {
+        'level': level,
+        'cell_size_deg': {'lat': height, 'lng': width},
+        'max_count': max((c['count'] for c in cells), default=0),
+        'truncated': truncated,
+        'cells': cells
+    }
@@ -0,0 +1,199 @@
+# app/services/log_pipeline.py
+"""
+Pipeline de logging no bloqueante para el hot path
+- Los registros pasan por una cola acotada a un hilo listener que formatea y escribe
+  a stdout (el worker nunca se bloquea en el pipe de gunicorn; si la cola se llena, se descarta)
+- Formato JSON estructurado (LOG_FORMAT=json, por defecto) o texto
+- Eventos de alto volumen (extra={'event': 'cache_hit'}) se limitan por tipo de evento:
+  a lo más LOG_EVENT_RATE registros por segundo, el resto se cuenta en 'suppressed'
+
+Uso en el hot path (formato perezoso):
+    logging.info("Cache HIT para: %s", address, extra={'event': 'cache_hit'})
+"""
+
+import os
+import sys
+import copy
+import json
+import queue
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Atributos estándar de LogRecord (todo lo demás se considera 'extra')
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, incluyendo los campos de 'extra'"""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                payload[key] = value
+
+        if record.exc_text:
+            payload['exc'] = record.exc_text
+        elif record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class EventRateLimitFilter(logging.Filter):
+    """
+    Limitar registros por tipo de evento (atributo 'event')
+
+    Permite hasta `rate` registros por ventana de 1 segundo para cada evento; los
+    descartados se informan como 'suppressed' en el siguiente registro emitido.
+    Registros sin 'event' y de nivel WARNING o superior siempre pasan.
+    """
+
+    def __init__(self, rate: int = 10):
+        super().__init__()
+        self.rate = rate
+        self.windows = {}  # {event: [window_start, emitted, suppressed]}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event is None or record.levelno >= logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(event)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = window[2] if window else 0
+                self.windows[event] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+
+            if window[1] < self.rate:
+                window[1] += 1
+                return True
+
+            window[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que no formatea en el hilo del request y descarta si la cola está llena"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Como QueueHandler.prepare: msg se resuelve con args en el hilo del request (los
+        # args pueden ser objetos mutables u ORM que no deben leerse desde el listener) y
+        # se quitan args y exc_info. El JSON/texto final se arma en el listener; el
+        # traceback queda en exc_text. Copia: otros handlers ven el registro original.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Pipeline:
+    """Estado del pipeline (uno por proceso)"""
+
+    def __init__(self):
+        self.queue = None
+        self.handler = None
+        self.listener = None
+        self.output_handler = None
+        self.configured = False
+
+    def start_listener(self):
+        self.listener = QueueListener(self.queue, self.output_handler, respect_handler_level=True)
+        self.listener.start()
+
+    def after_fork(self):
+        """Los hilos no sobreviven a fork (gunicorn preload_app): reiniciar en el hijo"""
+        if not self.configured:
+            return
+        # Cola nueva: la del padre puede haber quedado con locks tomados
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.handler.queue = self.queue
+        self.start_listener()
+
+    def stop(self):
+        if self.listener:
+            self.listener.stop()
+
+
+_pipeline = _Pipeline()
+
+
+def setup_logging():
+    """
+    Configurar el logger raíz con el pipeline asíncrono (idempotente)
+
+    Variables de entorno:
+        LOG_LEVEL: nivel del logger raíz (default INFO)
+        LOG_FORMAT: 'json' (default) o 'text'
+        LOG_ASYNC: 'false' para escribir directo a stdout (debug local)
+        LOG_QUEUE_SIZE: tamaño máximo de la cola (default 10000)
+        LOG_EVENT_RATE: registros por segundo por tipo de evento (default 10)
+    """
+    if _pipeline.configured:
+        return
+
+    level = os.environ.get('LOG_LEVEL', 'info').upper()
+    log_format = os.environ.get('LOG_FORMAT', 'json').lower()
+    use_async = os.environ.get('LOG_ASYNC', 'true').lower() != 'false'
+
+    output_handler = logging.StreamHandler(sys.stdout)
+    if log_format == 'json':
+        output_handler.setFormatter(JsonFormatter())
+    else:
+        output_handler.setFormatter(logging.Formatter('%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s'))
+
+    rate_filter = EventRateLimitFilter(rate=int(os.environ.get('LOG_EVENT_RATE', 10)))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    if use_async:
+        _pipeline.queue = queue.Queue(maxsize=int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+        _pipeline.handler = NonBlockingQueueHandler(_pipeline.queue)
+        _pipeline.handler.addFilter(rate_filter)
+        _pipeline.output_handler = output_handler
+        _pipeline.start_listener()
+        root.addHandler(_pipeline.handler)
+
+        os.register_at_fork(after_in_child=_pipeline.after_fork)
+        import atexit
+        atexit.register(_pipeline.stop)
+    else:
+        output_handler.addFilter(rate_filter)
+        root.addHandler(output_handler)
+
+    _pipeline.configured = True
+
+
+def dropped_records() -> int:
+    """Registros descartados por cola llena en este proceso"""
+    return _pipeline.handler.dropped if _pipeline.handler else 0
@@ -0,0 +1,216 @@
+# app/services/metrics.py
+"""
+Métricas de rendimiento en formato Prometheus
+- Histogramas de latencia por etapa (geocode, Distance Matrix, consultas de config, commit)
+- Contadores de llamadas a Google por API y status, y de hits/misses por nivel de caché
+- Tiempo de BD por consulta (eventos de SQLAlchemy)
+- Espera y rechazos de la cuota compartida de Google (quota_governor)
+- Tamaño y espera de los lotes de Distance Matrix (route_batcher)
+
+Con gunicorn (varios workers) se debe definir PROMETHEUS_MULTIPROC_DIR: cada worker
+escribe sus valores en ese directorio y /metrics los agrega. gunicorn_config.py lo
+configura automáticamente. Si prometheus_client no está instalado, todo es no-op.
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Buckets pensados para llamadas HTTP a Google y consultas a MySQL (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _NoopMetric:
+    """Reemplazo sin efecto cuando prometheus_client no está disponible"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_LATENCY = Histogram(
+        'shipping_stage_duration_seconds',
+        'Latencia por etapa de la cotización',
+        ['stage'],
+        buckets=LATENCY_BUCKETS
+    )
+    REQUEST_LATENCY = Histogram(
+        'shipping_request_duration_seconds',
+        'Latencia total por endpoint de cotización',
+        ['endpoint'],
+        buckets=LATENCY_BUCKETS
+    )
+    GOOGLE_CALLS = Counter(
+        'shipping_google_api_calls_total',
+        'Llamadas a Google Maps por API y status',
+        ['api', 'status']
+    )
+    CACHE_REQUESTS = Counter(
+        'shipping_cache_requests_total',
+        'Consultas a caché por nivel y resultado',
+        ['tier', 'result']
+    )
+    DB_QUERY_LATENCY = Histogram(
+        'shipping_db_query_duration_seconds',
+        'Tiempo por consulta SQL',
+        ['operation'],
+        buckets=LATENCY_BUCKETS
+    )
+    DB_READ_ROUTING = Counter(
+        'shipping_db_read_routing_total',
+        'Requests de solo lectura por destino (replica o primary por atraso/error de la réplica)',
+        ['target']
+    )
+    GOOGLE_QUOTA_WAIT = Histogram(
+        'shipping_google_quota_wait_seconds',
+        'Espera por cuota compartida antes de llamar a Google, por API y prioridad',
+        ['api', 'priority'],
+        buckets=LATENCY_BUCKETS
+    )
+    GOOGLE_QUOTA_THROTTLED = Counter(
+        'shipping_google_quota_throttled_total',
+        'Llamadas a Google rechazadas por falta de cuota (sin llegar a Google)',
+        ['api', 'priority']
+    )
+    ROUTE_BATCH_SIZE = Histogram(
+        'shipping_route_batch_destinations',
+        'Destinos por llamada a Distance Matrix con micro-batching (ROUTE_BATCH)',
+        buckets=(1, 2, 3, 5, 8, 12, 17, 25)
+    )
+    ROUTE_BATCH_WAIT = Histogram(
+        'shipping_route_batch_wait_seconds',
+        'Espera de cada request hasta que su lote de Distance Matrix se envía',
+        buckets=LATENCY_BUCKETS
+    )
+    ROUTE_BATCH_TIMEOUTS = Counter(
+        'shipping_route_batch_timeouts_total',
+        'Requests que no recibieron su ruta del lote dentro de ROUTE_BATCH_TIMEOUT'
+    )
+else:
+    STAGE_LATENCY = REQUEST_LATENCY = GOOGLE_CALLS = CACHE_REQUESTS = DB_QUERY_LATENCY = _NoopMetric()
+    DB_READ_ROUTING = GOOGLE_QUOTA_WAIT = GOOGLE_QUOTA_THROTTLED = _NoopMetric()
+    ROUTE_BATCH_SIZE = ROUTE_BATCH_WAIT = ROUTE_BATCH_TIMEOUTS = _NoopMetric()
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Medir la duración de una etapa: with observe_stage('geocode'): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def observe_request(endpoint: str):
+    """Medir la duración total de un endpoint de cotización"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REQUEST_LATENCY.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+
+def record_google_call(api: str, status: str):
+    """Contar una llamada a Google Maps ('geocode' o 'distance_matrix')"""
+    GOOGLE_CALLS.labels(api=api, status=status).inc()
+
+
+def record_cache(tier: str, result: str):
+    """Contar una consulta a caché (result: 'hit', 'miss', 'expired')"""
+    CACHE_REQUESTS.labels(tier=tier, result=result).inc()
+
+
+def record_db_read_route(target: str):
+    """Contar un request de solo lectura según dónde se atendió ('replica' o 'primary')"""
+    DB_READ_ROUTING.labels(target=target).inc()
+
+
+def observe_quota_wait(api: str, priority: str, seconds: float):
+    """Registrar la espera por cuota de una llamada a Google que sí se hizo"""
+    GOOGLE_QUOTA_WAIT.labels(api=api, priority=priority).observe(seconds)
+
+
+def record_quota_throttled(api: str, priority: str):
+    """Contar una llamada a Google rechazada por falta de cuota"""
+    GOOGLE_QUOTA_THROTTLED.labels(api=api, priority=priority).inc()
+
+
+def observe_route_batch(destinations: int):
+    """Registrar el tamaño de un lote de Distance Matrix al enviarlo"""
+    ROUTE_BATCH_SIZE.observe(destinations)
+
+
+def observe_route_batch_wait(seconds: float):
+    """Registrar cuánto esperó un request a que su lote se enviara"""
+    ROUTE_BATCH_WAIT.observe(seconds)
+
+
+def record_route_batch_timeout():
+    """Contar un request que no recibió su ruta del lote a tiempo"""
+    ROUTE_BATCH_TIMEOUTS.inc()
+
+
+def _instrument_db(engine):
+    """Registrar tiempo de cada consulta SQL con eventos de SQLAlchemy"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start_time')
+        if not starts:
+            return
+        operation = statement.lstrip().split(' ', 1)[0].upper() or 'OTHER'
+        DB_QUERY_LATENCY.labels(operation=operation).observe(time.perf_counter() - starts.pop())
+
+
+def generate_metrics() -> bytes:
+    """Exposición en formato texto, agregando todos los workers si hay directorio multiproceso"""
+    if not PROMETHEUS_AVAILABLE:
+        return b'# prometheus_client no instalado\n'
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+
+    return generate_latest()
+
+
+def init_metrics(app, db):
+    """Registrar /metrics e instrumentar el engine de la app"""
+    from flask import Response
+
+    with app.app_context():
+        try:
+            # Primario y réplica de lectura (si está configurada)
+            for engine in db.engines.values():
+                _instrument_db(engine)
+        except Exception as e:
+            logging.error(f"No se pudo instrumentar la BD para métricas: {e}")
+
+    @app.route('/metrics')
+    def metrics():
+        """Métricas en formato de exposición de Prometheus"""
+        return Response(generate_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,639 @@
+# app/services/pricing_simulator.py
+"""
+Simulador what-if de tarifas sobre el historial de cotizaciones (NumPy)
+- Carga shipping_quotes en forma columnar y la reduce a checkouts (sesión + segundo de la
+  cotización): distancia, origen y zona por método, hora de Chile y peso (hit_count)
+- Aplica una tabla de zonas/métodos propuesta con operaciones vectorizadas
+  (máscaras por rango de zona, de horario y de max_km) y la compara
+  con la configuración actual: ingreso ofrecido y checkouts que quedan sin tarifa
+- Mismas reglas que el motor en vivo (find_zone_for_distance, find_zone_for_method,
+  is_schedule_open): rangos de km inclusivos, entre zonas que cubren la distancia decide
+  ShippingZone.distance_match_key (origen antes que compartidas, menor min_km, menor id),
+  max_km y origin_id del método
+- Limitación: los checkouts que no recibieron ninguna tarifa no quedan en el historial,
+  y un método sin fila en el checkout se evalúa con la distancia más corta registrada
+"""
+
+import os
+import copy
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SIMULATOR_MAX_QUOTES = int(os.environ.get('SIMULATOR_MAX_QUOTES', 5000000))
+SIMULATOR_HISTORY_TTL = float(os.environ.get('SIMULATOR_HISTORY_TTL', 600))
+
+CHUNK_SIZE = 50000
+MICROS_PER_DAY = 86400 * 1000000
+
+ZONE_FIELDS = ('min_km', 'max_km', 'price_clp', 'is_active')
+METHOD_FIELDS = ('max_km', 'is_active', 'start_time', 'end_time', 'origin_id')
+
+
+# ========================================
+# HISTORIAL COLUMNAR
+# ========================================
+
+class QuoteHistory:
+    """
+    Historial reducido a arreglos NumPy
+
+    Por checkout: peso, día de la semana y hora (Chile, microsegundos del día), distancia
+    y origen más cercanos registrados. Por par (checkout, método): distancia, origen,
+    zona y precio de la cotización más reciente.
+    """
+
+    def __init__(self, rows, checkouts, weight, weekday, time_of_day, distance, origin,
+                 pair_checkout, pair_method, pair_distance, pair_origin, pair_zone, pair_price,
+                 pair_weight, recorded_revenue, truncated=False, date_from=None, date_to=None):
+        self.rows = rows
+        self.checkouts = checkouts
+        self.weight = weight
+        self.weekday = weekday
+        self.time_of_day = time_of_day
+        self.distance = distance
+        self.origin = origin
+        self.pair_checkout = pair_checkout
+        self.pair_method = pair_method
+        self.pair_distance = pair_distance
+        self.pair_origin = pair_origin
+        self.pair_zone = pair_zone
+        self.pair_price = pair_price
+        self.pair_weight = pair_weight
+        self.recorded_revenue = recorded_revenue
+        self.truncated = truncated
+        self.date_from = date_from
+        self.date_to = date_to
+
+    def summary(self):
+        return {
+            'quote_rows': self.rows,
+            'checkouts': self.checkouts,
+            'weighted_checkouts': int(self.weight.sum()),
+            'recorded_revenue_clp': self.recorded_revenue,
+            'truncated': self.truncated,
+            'date_from': self.date_from.isoformat() if self.date_from else None,
+            'date_to': self.date_to.isoformat() if self.date_to else None,
+        }
+
+
+def chile_local_micros(utc_micros):
+    """Epoch UTC (µs) -> epoch local de Chile (µs), con el offset (y horario de verano) de cada hora"""
+    from app.models import USE_ZONEINFO
+
+    if not USE_ZONEINFO:
+        from app.models import CHILE_UTC_OFFSET
+        return utc_micros + CHILE_UTC_OFFSET * 3600 * 1000000
+
+    from app.models import CHILE_TZ
+    from datetime import timezone
+
+    hours, inverse = np.unique(utc_micros // (3600 * 1000000), return_inverse=True)
+    offsets = np.array([
+        datetime.fromtimestamp(int(hour) * 3600, tz=timezone.utc).astimezone(CHILE_TZ)
+        .utcoffset() // timedelta(microseconds=1)
+        for hour in hours
+    ], dtype=np.int64)
+    return utc_micros + offsets[inverse]
+
+
+def _as_int(values, missing=-1):
+    """Lista con None -> int64 con `missing` (vía float64, sin ciclo en Python)"""
+    floats = np.array(values, dtype=np.float64)
+    return np.where(np.isnan(floats), missing, floats).astype(np.int64)
+
+
+HISTORY_COLUMNS = ('key', 'created', 'method', 'origin', 'zone', 'distance', 'price', 'hit')
+
+
+def chunk_columns(rows):
+    """
+    Tuplas (id, session_id, created_at, método, origen, zona, km, precio, hits) -> arreglos
+
+    created_at llega como datetime (MySQL) o texto ISO (SQLite); ids/precios pueden ser None
+    """
+    ids, session_ids, created_at, method_ids, origin_ids, zone_ids, distances, prices, hits = zip(*rows)
+    created = np.array(created_at, dtype='datetime64[us]').astype(np.int64)
+
+    # Checkout = sesión + segundo de la cotización: las filas de un mismo request (una por
+    # método) comparten ambos; sin leer destination_address (texto largo, la mayor parte
+    # del costo de transferencia). Sin sesión no hay cómo agrupar: cada fila es un checkout
+    # (None no choca con ninguna sesión)
+    seconds = (created // 1000000).tolist()
+    keys = np.fromiter(
+        (hash((session_id, second) if session_id else (None, row_id))
+         for row_id, session_id, second in zip(ids, session_ids, seconds)),
+        dtype=np.int64, count=len(rows)
+    )
+
+    return {
+        'key': keys,
+        'created': created,
+        'method': _as_int(method_ids),
+        'origin': _as_int(origin_ids),
+        'zone': _as_int(zone_ids),
+        'distance': np.array(distances, dtype=np.float64),
+        'price': _as_int(prices, missing=0),
+        'hit': np.maximum(_as_int(hits, missing=1), 1),
+    }
+
+
+def build_history(key, created, method, origin, zone, distance, price, hit, **extra):
+    """Reducir columnas de filas (más reciente primero, ver chunk_columns) a QuoteHistory"""
+    # Filas sin método (-1) no tienen precio que simular y chocarían en pair_keys con el
+    # último método del checkout anterior
+    known = method >= 0
+    if not known.all():
+        key, created, method, origin, zone, distance, price, hit = (
+            column[known] for column in (key, created, method, origin, zone, distance, price, hit)
+        )
+    rows = len(method)
+    _, checkout = np.unique(key, return_inverse=True)
+    checkout = checkout.reshape(-1)
+    checkouts = int(checkout.max()) + 1 if rows else 0
+
+    # Pares (checkout, método): datos de la fila más reciente (primera ocurrencia), peso = suma
+    pair_keys = checkout.astype(np.int64) * (int(method.max(initial=0)) + 1) + method
+    _, first, pair_index = np.unique(pair_keys, return_index=True, return_inverse=True)
+    pair_index = pair_index.reshape(-1)
+    pair_weight = np.bincount(pair_index, weights=hit).astype(np.int64)
+
+    weight = np.zeros(checkouts, dtype=np.int64)
+    np.maximum.at(weight, checkout[first], pair_weight)
+
+    first_seen = np.full(checkouts, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first_seen, checkout, created)
+    local = chile_local_micros(first_seen)
+    # 1970-01-01 fue jueves (0=Lunes)
+    weekday = ((local // MICROS_PER_DAY + 3) % 7).astype(np.int8)
+    time_of_day = local % MICROS_PER_DAY
+
+    # Distancia/origen del checkout: la fila más cercana (NaN al final del orden)
+    nearest = np.lexsort((distance, checkout))
+    starts = np.flatnonzero(np.r_[True, np.diff(checkout[nearest]) != 0]) if rows else nearest
+    checkout_distance = np.full(checkouts, np.nan)
+    checkout_origin = np.full(checkouts, -1, dtype=np.int64)
+    checkout_distance[checkout[nearest[starts]]] = distance[nearest[starts]]
+    checkout_origin[checkout[nearest[starts]]] = origin[nearest[starts]]
+
+    return QuoteHistory(
+        rows=rows,
+        checkouts=checkouts,
+        weight=weight,
+        weekday=weekday,
+        time_of_day=time_of_day,
+        distance=checkout_distance,
+        origin=checkout_origin,
+        pair_checkout=checkout[first],
+        pair_method=method[first],
+        pair_distance=distance[first],
+        pair_origin=origin[first],
+        pair_zone=zone[first],
+        pair_price=price[first],
+        pair_weight=pair_weight,
+        recorded_revenue=int((price * hit).sum()),
+        **extra
+    )
+
+
+HISTORY_SQL = """
+    SELECT id, session_id, created_at, shipping_method_id,
+           origin_id, zone_id, distance_km, price_clp, hit_count
+    FROM shipping_quotes
+    WHERE id < :last_id
+      AND shipping_method_id IS NOT NULL AND created_at IS NOT NULL
+      {filters}
+    ORDER BY id DESC
+    LIMIT :limit
+"""
+
+
+def load_quote_history(date_from=None, date_to=None, max_rows=SIMULATOR_MAX_QUOTES):
+    """
+    Leer shipping_quotes en bloques keyset (más recientes primero) y construir QuoteHistory
+
+    date_from/date_to: datetime sobre created_at (UTC); max_rows acota la memoria
+    (se conservan las cotizaciones más recientes). SQL de texto: tuplas del driver sin
+    conversión de tipos por fila, convertidas a arreglos por bloque.
+    """
+    from app import db
+
+    filters = ''
+    params = {}
+    if date_from:
+        filters += ' AND created_at >= :date_from'
+        params['date_from'] = date_from
+    if date_to:
+        filters += ' AND created_at <= :date_to'
+        params['date_to'] = date_to
+    sql = db.text(HISTORY_SQL.format(filters=filters))
+
+    chunks = []
+    last_id = 2 ** 62
+    loaded = 0
+    truncated = False
+
+    while True:
+        limit = min(CHUNK_SIZE, max_rows - loaded)
+        if limit <= 0:
+            truncated = db.session.execute(sql, {**params, 'last_id': last_id, 'limit': 1}).first() is not None
+            break
+        rows = db.session.execute(sql, {**params, 'last_id': last_id, 'limit': limit}).all()
+        if not rows:
+            break
+        chunks.append(chunk_columns(rows))
+        loaded += len(rows)
+        last_id = rows[-1][0]
+    db.session.rollback()
+
+    columns = {
+        name: np.concatenate([chunk[name] for chunk in chunks]) if chunks else np.zeros(0, dtype=np.int64)
+        for name in HISTORY_COLUMNS
+    }
+    columns['distance'] = columns['distance'].astype(np.float64)
+    return build_history(**columns, truncated=truncated, date_from=date_from, date_to=date_to)
+
+
+class HistoryCache:
+    """Historial cargado por rango de fechas, por worker (recargar millones de filas toma segundos)"""
+
+    def __init__(self, ttl: float = 600, max_entries: int = 4):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}  # {(date_from, date_to): (cargado_en monotonic, QuoteHistory)}
+        self.lock = threading.Lock()  # Una carga a la vez por worker
+
+    def get(self, date_from=None, date_to=None):
+        key = (date_from, date_to)
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+
+            history = load_quote_history(date_from, date_to)
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic(), history)
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            return history
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+
+history_cache = HistoryCache(ttl=SIMULATOR_HISTORY_TTL)
+
+
+# ========================================
+# TABLAS DE TARIFAS (ACTUAL Y PROPUESTA)
+# ========================================
+
+def current_pricing_table():
+    """Métodos y zonas actuales (incluye inactivos: una propuesta puede reactivarlos)"""
+    from app.models import ShippingMethod, ShippingZone
+
+    methods = [{
+        'id': method.id,
+        'code': method.code,
+        'name': method.name,
+        'is_active': bool(method.is_active),
+        'start_time': method.start_time,
+        'end_time': method.end_time,
+        'weekdays': tuple(bool(day) for day in method.weekday_availability),
+        'max_km': float(method.max_km),
+        'pricing_mode': method.pricing_mode or 'distance',
+        'origin_id': method.origin_id,
+    } for method in ShippingMethod.query.order_by(ShippingMethod.id).all()]
+
+    zones = [{
+        'id': zone.id,
+        'zone_type': zone.zone_type or 'distance',
+        'min_km': float(zone.min_km),
+        'max_km': float(zone.max_km),
+        'price_clp': int(zone.price_clp),
+        'origin_id': zone.origin_id,
+        'is_active': bool(zone.is_active),
+    } for zone in ShippingZone.query.order_by(ShippingZone.id).all()]
+
+    return {'methods': methods, 'zones': zones}
+
+
+def _parse_time(value):
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def apply_proposal(table, proposal):
+    """
+    Tabla resultante de aplicar una propuesta sobre la actual
+
+    proposal = {
+        'zones': [{'id': 3, 'price_clp': 4000}, {'id': 5, 'is_active': false},
+                  {'min_km': 7, 'max_km': 9, 'price_clp': 8000}],   # sin id: zona nueva
+        'replace_zones': false,   # true: las zonas por distancia son solo las de la propuesta
+        'methods': [{'code': 'envio_hoy', 'max_km': 9, 'end_time': '18:00'}]
+    }
+    Lanza ValueError si la propuesta es inválida.
+    """
+    if not isinstance(proposal, dict):
+        raise ValueError('La propuesta debe ser un objeto JSON')
+
+    result = copy.deepcopy(table)
+    zones_by_id = {zone['id']: zone for zone in result['zones']}
+
+    if proposal.get('replace_zones'):
+        for zone in result['zones']:
+            if zone['zone_type'] == 'distance':
+                zone['is_active'] = False
+
+    next_id = max(zones_by_id, default=0) + 1
+    for patch in proposal.get('zones') or []:
+        unknown = set(patch) - set(ZONE_FIELDS) - {'id', 'origin_id'}
+        if unknown:
+            raise ValueError(f"Campos de zona no soportados: {', '.join(sorted(unknown))}")
+
+        if patch.get('id') is None:
+            for field in ('min_km', 'max_km', 'price_clp'):
+                if field not in patch:
+                    raise ValueError(f'Zona nueva sin {field}')
+            zone = {'id': next_id, 'zone_type': 'distance', 'origin_id': patch.get('origin_id'),
+                    'is_active': True}
+            next_id += 1
+            result['zones'].append(zone)
+        else:
+            zone = zones_by_id.get(patch['id'])
+            if zone is None:
+                raise ValueError(f"Zona {patch['id']} no existe")
+            if proposal.get('replace_zones') and zone['zone_type'] == 'distance':
+                zone['is_active'] = True
+
+        for field in ZONE_FIELDS:
+            if field in patch:
+                zone[field] = bool(patch[field]) if field == 'is_active' else \
+                    int(patch[field]) if field == 'price_clp' else float(patch[field])
+
+    methods_by_key = {}
+    for method in result['methods']:
+        methods_by_key[('id', method['id'])] = method
+        methods_by_key[('code', method['code'])] = method
+
+    for patch in proposal.get('methods') or []:
+        unknown = set(patch) - set(METHOD_FIELDS) - {'id', 'code'}
+        if unknown:
+            raise ValueError(f"Campos de método no soportados: {', '.join(sorted(unknown))}")
+        key = ('id', patch['id']) if patch.get('id') is not None else ('code', patch.get('code'))
+        method = methods_by_key.get(key)
+        if method is None:
+            raise ValueError(f'Método {key[1]} no existe')
+
+        for field in METHOD_FIELDS:
+            if field not in patch:
+                continue
+            value = patch[field]
+            if field in ('start_time', 'end_time'):
+                value = _parse_time(value)
+            elif field == 'max_km':
+                value = float(value)
+            elif field == 'is_active':
+                value = bool(value)
+            method[field] = value
+
+    validate_zones(result['zones'])
+    return result
+
+
+def validate_zones(zones):
+    """Mismas reglas que el panel: min_km < max_km y sin traslapes (se permite compartir límite)"""
+    scopes = {}
+    for zone in zones:
+        if zone['zone_type'] != 'distance' or not zone['is_active']:
+            continue
+        if zone['min_km'] >= zone['max_km']:
+            raise ValueError(f"Zona {zone['id']}: min_km debe ser menor que max_km")
+        if zone['price_clp'] < 0:
+            raise ValueError(f"Zona {zone['id']}: precio negativo")
+        scopes.setdefault(zone['origin_id'], []).append(zone)
+
+    for scope in scopes.values():
+        scope.sort(key=lambda zone: zone['min_km'])
+        for previous, zone in zip(scope, scope[1:]):
+            if zone['min_km'] < previous['max_km']:
+                raise ValueError(
+                    f"Zonas traslapadas: {previous['min_km']}-{previous['max_km']}km y "
+                    f"{zone['min_km']}-{zone['max_km']}km"
+                )
+
+
+class ZoneTable:
+    """Zonas por distancia de un alcance (un origen o compartidas) en el orden de ShippingZone.distance_match_key"""
+
+    def __init__(self, zones):
+        from app.models import ShippingZone
+
+        zones = sorted(zones, key=ShippingZone.distance_match_key)
+        self.ids = np.array([zone['id'] for zone in zones], dtype=np.int64)
+        self.min_km = np.array([zone['min_km'] for zone in zones], dtype=np.float64)
+        self.max_km = np.array([zone['max_km'] for zone in zones], dtype=np.float64)
+        self.prices = np.array([zone['price_clp'] for zone in zones], dtype=np.int64)
+
+    def lookup(self, distance):
+        """
+        (zone_id, precio) por distancia; zone_id -1 si ninguna zona cubre la distancia
+
+        Primera zona en el orden de la regla con min_km <= distancia <= max_km, como
+        find_zone_for_distance (también con zonas traslapadas). Recorre las zonas de la
+        última a la primera: cada una sobrescribe a las que van después en el orden.
+        """
+        zone_ids = np.full(len(distance), -1, dtype=np.int64)
+        prices = np.zeros(len(distance), dtype=np.int64)
+        for index in range(len(self.ids) - 1, -1, -1):
+            inside = (self.min_km[index] <= distance) & (distance <= self.max_km[index])
+            zone_ids[inside] = self.ids[index]
+            prices[inside] = self.prices[index]
+        return zone_ids, prices
+
+
+def schedule_mask(method, weekday, time_of_day):
+    """Versión vectorizada de is_schedule_open (end_time inclusivo, cruce de medianoche)"""
+    def micros(value):
+        return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+    start, end = micros(method['start_time']), micros(method['end_time'])
+    by_day = np.array(method['weekdays'], dtype=bool)[weekday]
+    if start <= end:
+        in_hours = (time_of_day >= start) & (time_of_day <= end)
+    else:
+        in_hours = (time_of_day >= start) | (time_of_day <= end)
+    return by_day & in_hours
+
+
+# ========================================
+# SIMULACIÓN
+# ========================================
+
+def offered_prices(history, table):
+    """
+    Matriz (métodos × checkouts) de precio ofrecido, -1 donde el método no entrega tarifa
+
+    Returns:
+        (methods, prices)
+    """
+    active_zones = [zone for zone in table['zones'] if zone['is_active']]
+    shared = ZoneTable([zone for zone in active_zones
+                        if zone['zone_type'] == 'distance' and zone['origin_id'] is None])
+    by_origin = {}
+    for zone in active_zones:
+        if zone['zone_type'] == 'distance' and zone['origin_id'] is not None:
+            by_origin.setdefault(zone['origin_id'], []).append(zone)
+    by_origin = {origin_id: ZoneTable(zones) for origin_id, zones in by_origin.items()}
+
+    polygon = sorted((zone['id'], zone['price_clp']) for zone in active_zones if zone['zone_type'] == 'polygon')
+    polygon_ids = np.array([zone_id for zone_id, _ in polygon], dtype=np.int64)
+    polygon_prices = np.array([price for _, price in polygon], dtype=np.int64)
+
+    methods = table['methods']
+    prices = np.full((len(methods), history.checkouts), -1, dtype=np.int64)
+
+    for row, method in enumerate(methods):
+        if not method['is_active']:
+            continue
+
+        # Datos del checkout, reemplazados por los de la fila del método si existe
+        distance = history.distance.copy()
+        origin = history.origin.copy()
+        zone_seen = np.full(history.checkouts, -1, dtype=np.int64)
+        pairs = history.pair_method == method['id']
+        checkouts = history.pair_checkout[pairs]
+        distance[checkouts] = history.pair_distance[pairs]
+        origin[checkouts] = history.pair_origin[pairs]
+        zone_seen[checkouts] = history.pair_zone[pairs]
+
+        available = schedule_mask(method, history.weekday, history.time_of_day)
+        if method['origin_id'] is not None:
+            available &= origin == method['origin_id']
+
+        price = np.zeros(history.checkouts, dtype=np.int64)
+        if method['pricing_mode'] == 'polygon':
+            # El punto no cambia: la zona poligonal registrada con su precio propuesto
+            index = np.minimum(np.searchsorted(polygon_ids, zone_seen), max(len(polygon_ids) - 1, 0))
+            found = (polygon_ids[index] == zone_seen) if len(polygon_ids) else np.zeros_like(available)
+            available &= found
+            if len(polygon_ids):
+                price = polygon_prices[index]
+        else:
+            available &= distance <= method['max_km']
+            zone_id = np.full(history.checkouts, -1, dtype=np.int64)
+            for origin_id, zones in by_origin.items():
+                selected = np.flatnonzero(available & (origin == origin_id))
+                zone_id[selected], price[selected] = zones.lookup(distance[selected])
+            # Sin zona del origen: zonas compartidas
+            selected = np.flatnonzero(available & (zone_id < 0))
+            zone_id[selected], price[selected] = shared.lookup(distance[selected])
+            available &= zone_id >= 0
+
+        prices[row] = np.where(available, price, -1)
+
+    return methods, prices
+
+
+def scenario_report(history, methods, prices):
+    """Ingreso ofrecido y cobertura ponderados por peso del checkout"""
+    weight = history.weight
+    offered = prices >= 0
+    covered = offered.any(axis=0)
+    cheapest = np.where(offered, prices, np.iinfo(np.int64).max).min(axis=0, initial=np.iinfo(np.int64).max)
+    total = int(weight.sum())
+    with_rate = int(weight[covered].sum())
+    cheapest_revenue = int((cheapest[covered] * weight[covered]).sum())
+
+    by_method = {}
+    for row, method in enumerate(methods):
+        rates = int(weight[offered[row]].sum())
+        revenue = int((prices[row][offered[row]] * weight[offered[row]]).sum())
+        by_method[method['code']] = {
+            'rates': rates,
+            'revenue_clp': revenue,
+            'avg_price_clp': round(revenue / rates) if rates else None,
+        }
+
+    return {
+        'checkouts': total,
+        'checkouts_with_rate': with_rate,
+        'checkouts_without_rate': total - with_rate,
+        'coverage_pct': round(100.0 * with_rate / total, 2) if total else None,
+        'rates_offered': int((offered * weight).sum()),
+        'offered_revenue_clp': int((np.where(offered, prices, 0) * weight).sum()),
+        'cheapest_revenue_clp': cheapest_revenue,
+        'avg_cheapest_price_clp': round(cheapest_revenue / with_rate) if with_rate else None,
+        'methods': by_method,
+    }
+
+
+def _delta(proposed, baseline):
+    delta = {}
+    for key, value in proposed.items():
+        if key == 'methods':
+            delta[key] = {code: _delta(values, baseline[key].get(code, {})) for code, values in value.items()}
+        elif isinstance(value, (int, float)) and isinstance(baseline.get(key), (int, float)):
+            delta[key] = round(value - baseline[key], 2)
+    return delta
+
+
+def simulate(history, baseline_table, proposed_table):
+    """Comparar la configuración actual con la propuesta sobre el mismo historial"""
+    start = time.perf_counter()
+    methods, baseline_prices = offered_prices(history, baseline_table)
+    proposed_methods, proposed_prices = offered_prices(history, proposed_table)
+
+    baseline = scenario_report(history, methods, baseline_prices)
+    proposed = scenario_report(history, proposed_methods, proposed_prices)
+    delta = _delta(proposed, baseline)
+
+    baseline_covered = (baseline_prices >= 0).any(axis=0)
+    proposed_covered = (proposed_prices >= 0).any(axis=0)
+    delta['lost_checkouts'] = int(history.weight[baseline_covered & ~proposed_covered].sum())
+    delta['gained_checkouts'] = int(history.weight[~baseline_covered & proposed_covered].sum())
+
+    # Fidelidad: cotizaciones registradas que la simulación de la tabla actual reproduce
+    # (baja si la configuración cambió dentro del rango de fechas)
+    method_ids = np.array([method['id'] for method in methods], dtype=np.int64)
+    order = np.argsort(method_ids)
+    position = np.minimum(np.searchsorted(method_ids[order], history.pair_method), max(len(methods) - 1, 0))
+    method_rows = order[position] if len(methods) else np.zeros(0, dtype=np.int64)
+    known = (method_ids[method_rows] == history.pair_method) if len(methods) else \
+        np.zeros(len(history.pair_method), dtype=bool)
+    simulated = baseline_prices[method_rows[known], history.pair_checkout[known]]
+    matches = int(history.pair_weight[known][simulated == history.pair_price[known]].sum())
+    recorded = int(history.pair_weight.sum())
+
+    return {
+        'baseline': baseline,
+        'proposed': proposed,
+        'delta': delta,
+        'baseline_match_pct': round(100.0 * matches / recorded, 2) if recorded else None,
+        'simulate_ms': round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def run_simulation(proposal, date_from=None, date_to=None, history=None):
+    """Cargar historial (con caché) y tablas, aplicar la propuesta y comparar"""
+    if history is None:
+        history = history_cache.get(date_from, date_to)
+    baseline_table = current_pricing_table()
+    proposed_table = apply_proposal(baseline_table, proposal)
+
+    report = simulate(history, baseline_table, proposed_table)
+    report['history'] = history.summary()
+    logging.info(
+        "Simulación de tarifas: %d checkouts, Δingreso %s CLP, Δcobertura %s pp (%.1f ms)",
+        history.checkouts, report['delta'].get('offered_revenue_clp'),
+        report['delta'].get('coverage_pct'), report['simulate_ms']
+    )
+    return report
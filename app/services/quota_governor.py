@@ -0,0 +1,255 @@
+# app/services/quota_governor.py
+"""
+Cuota compartida de llamadas a Google Maps entre workers (token bucket con prioridades)
+- Un bucket por API: geocode (requests/s) y distance_matrix (elementos/s), con el
+  estado en un archivo compartido (GOOGLE_QUOTA_FILE) protegido con flock: todos los
+  workers de gunicorn (y los scripts que usen RouterService) del mismo host descuentan
+  de los mismos tokens. Con varios hosts, repartir las tasas entre ellos
+- Prioridades según el endpoint de track_endpoint: checkout (callback, quote) antes que
+  interactive (test-address) y background (batch, prewarm, scripts)
+  * Un request que espera lo anuncia en el estado compartido y las prioridades más bajas
+    le ceden los tokens hasta que lo atienden
+  * Las prioridades bajas no consumen la reserva del bucket (GOOGLE_QUOTA_RESERVE)
+  * Cada prioridad espera como máximo GOOGLE_QUOTA_MAX_WAIT segundos; después la llamada
+    se rechaza (QuotaExceeded) sin llegar a Google
+- Un OVER_QUERY_LIMIT de Google vacía el bucket y pausa esa API GOOGLE_QUOTA_COOLDOWN
+  segundos en todos los workers
+- Métricas: tiempo de espera por API/prioridad y llamadas rechazadas
+- Sin fcntl (Windows) el estado es solo del proceso
+"""
+
+import os
+import time
+import struct
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from app.services.metrics import observe_quota_wait, record_quota_throttled
+from app.services.usage import current_endpoint
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+GOOGLE_QUOTA = os.environ.get('GOOGLE_QUOTA', 'true').lower() != 'false'
+GOOGLE_QUOTA_FILE = os.environ.get('GOOGLE_QUOTA_FILE') or os.path.join(tempfile.gettempdir(), 'shipping_google_quota')
+GOOGLE_QUOTA_COOLDOWN = float(os.environ.get('GOOGLE_QUOTA_COOLDOWN', 2))
+
+# Tasas por defecto = límites por proyecto de Google (geocode 50 QPS, Distance Matrix 1000 elementos/s)
+QUOTA_RATES = {
+    'geocode': float(os.environ.get('GOOGLE_QUOTA_GEOCODE_RATE', 50)),
+    'distance_matrix': float(os.environ.get('GOOGLE_QUOTA_DISTANCE_MATRIX_RATE', 1000)),
+}
+APIS = tuple(QUOTA_RATES)
+
+# Prioridades (0 = más alta) y endpoint de track_endpoint → prioridad
+PRIORITY_NAMES = ('checkout', 'interactive', 'background')
+ENDPOINT_PRIORITY = {'callback': 0, 'quote': 0, 'test-address': 1}
+BACKGROUND = len(PRIORITY_NAMES) - 1
+
+
+def _per_priority(name, default):
+    values = [float(v) for v in os.environ.get(name, default).split(',')]
+    if len(values) != len(PRIORITY_NAMES):
+        raise ValueError(f"{name} requiere {len(PRIORITY_NAMES)} valores ({', '.join(PRIORITY_NAMES)})")
+    return tuple(values)
+
+
+# Segundos máximos de espera y fracción del bucket que cada prioridad no puede consumir
+QUOTA_MAX_WAIT = _per_priority('GOOGLE_QUOTA_MAX_WAIT', '3,1,30')
+QUOTA_RESERVE = _per_priority('GOOGLE_QUOTA_RESERVE', '0,0.2,0.5')
+
+# Intervalo máximo entre reintentos mientras se espera, y vigencia del anuncio de espera
+POLL_INTERVAL = 0.05
+WAIT_ANNOUNCE_MARGIN = 0.1
+
+# Por API: tokens, actualizado (epoch), pausado hasta (epoch), esperando hasta (epoch) por prioridad
+BUCKET_FORMAT = struct.Struct(f'<{3 + len(PRIORITY_NAMES)}d')
+
+
+class QuotaExceeded(Exception):
+    """No hubo cuota para la llamada dentro del tiempo máximo de espera de su prioridad"""
+
+    def __init__(self, api: str, priority: str):
+        super().__init__(f"Cuota de Google Maps agotada para {api} (prioridad {priority})")
+        self.api = api
+        self.priority = priority
+
+
+def priority_for_endpoint(endpoint: str) -> int:
+    return ENDPOINT_PRIORITY.get(endpoint, BACKGROUND)
+
+
+class _SharedState:
+    """Estado de los buckets en un archivo con flock (memoria local si no hay fcntl)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = BUCKET_FORMAT.size * len(APIS)
+        self.lock = threading.Lock()  # flock no excluye hilos que comparten el descriptor
+        self.fd = None
+        self.pid = None
+        self.local = bytearray(self.size)
+
+    def _open(self):
+        # Un descriptor por proceso: con preload_app un descriptor heredado del master
+        # compartiría el flock entre workers
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.fd = None
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                if os.fstat(fd).st_size < self.size:
+                    os.ftruncate(fd, self.size)
+                self.fd = fd
+            except OSError as e:
+                logging.error(f"No se pudo abrir {self.path}, cuota de Google solo por worker: {e}")
+        return self.fd
+
+    @contextmanager
+    def locked(self):
+        """[(tokens, updated, paused_until, [esperando_hasta...])] por API, escritos al salir"""
+        with self.lock:
+            fd = self._open() if fcntl is not None else None
+            if fd is None:
+                yield _Buckets(self.local)
+                return
+
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                data = bytearray(os.pread(fd, self.size, 0).ljust(self.size, b'\0'))
+                yield _Buckets(data)
+                os.pwrite(fd, bytes(data), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class _Buckets:
+    """Vista de lectura/escritura sobre el bloque de estado"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, api):
+        values = BUCKET_FORMAT.unpack_from(self.data, APIS.index(api) * BUCKET_FORMAT.size)
+        return list(values[:3]), list(values[3:])
+
+    def put(self, api, bucket, waiting):
+        BUCKET_FORMAT.pack_into(self.data, APIS.index(api) * BUCKET_FORMAT.size, *bucket, *waiting)
+
+
+class QuotaGovernor:
+    """Token bucket por API compartido entre procesos"""
+
+    def __init__(self, rates, path=GOOGLE_QUOTA_FILE, enabled=GOOGLE_QUOTA,
+                 max_wait=QUOTA_MAX_WAIT, reserve=QUOTA_RESERVE, cooldown=GOOGLE_QUOTA_COOLDOWN):
+        # Tasa 0 = API sin límite
+        self.rates = {api: rate for api, rate in rates.items() if rate > 0}
+        self.enabled = enabled
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self.cooldown = cooldown
+        self.state = _SharedState(path)
+
+    def _refill(self, api, bucket, now):
+        """Sumar los tokens generados desde la última actualización (bucket lleno = 1 s de tasa)"""
+        tokens, updated, paused_until = bucket
+        rate = self.rates[api]
+        if updated <= 0 or updated > now:
+            # Estado nuevo o reloj que retrocedió
+            tokens, updated, paused_until = rate, now, 0.0
+        tokens = min(rate, tokens + (now - updated) * rate)
+        return [tokens, now, paused_until]
+
+    def _try_take(self, api, units, priority, deadline):
+        """
+        Intentar tomar units tokens
+
+        Returns:
+            (True, 0) si se tomaron, (False, segundos) a esperar antes de reintentar,
+            o (False, None) si no alcanza antes del deadline
+        """
+        rate = self.rates[api]
+        with self.state.locked() as buckets:
+            bucket, waiting = buckets.get(api)
+            now = time.time()
+            bucket = self._refill(api, bucket, now)
+            tokens, _, paused_until = bucket
+
+            higher_waiting = any(until > now for until in waiting[:priority])
+            needed = units + self.reserve[priority] * rate
+            if now >= paused_until and not higher_waiting and tokens >= needed:
+                bucket[0] = tokens - units
+                buckets.put(api, bucket, waiting)
+                return True, 0
+
+            delay = max(paused_until - now, (needed - tokens) / rate, 0)
+            if higher_waiting:
+                delay = max(delay, min(POLL_INTERVAL, units / rate))
+            if now + delay > deadline:
+                buckets.put(api, bucket, waiting)
+                return False, None
+
+            # Anunciar la espera: las prioridades más bajas ceden hasta que la atiendan
+            sleep = min(max(delay, 0.001), POLL_INTERVAL)
+            waiting[priority] = max(waiting[priority], now + sleep + WAIT_ANNOUNCE_MARGIN)
+            buckets.put(api, bucket, waiting)
+            return False, sleep
+
+    def acquire(self, api: str, units: int = 1, priority: int = None):
+        """
+        Esperar cuota para una llamada a Google (units = requests o elementos de Distance Matrix)
+
+        La prioridad se deduce del endpoint actual (track_endpoint) si no se indica.
+        Lanza QuotaExceeded si no hay cuota dentro del tiempo máximo de la prioridad.
+        """
+        if not self.enabled or api not in self.rates:
+            return
+
+        if priority is None:
+            priority = priority_for_endpoint(current_endpoint())
+        # Una llamada mayor que el bucket completo esperaría para siempre
+        units = min(units, self.rates[api] * (1 - self.reserve[priority]))
+
+        start = time.monotonic()
+        deadline = time.time() + self.max_wait[priority]
+        while True:
+            try:
+                taken, sleep = self._try_take(api, units, priority, deadline)
+            except OSError as e:
+                # Sin estado compartido no se bloquean las cotizaciones
+                logging.error(f"Error en la cuota compartida de Google Maps: {e}")
+                return
+            if taken:
+                observe_quota_wait(api, PRIORITY_NAMES[priority], time.monotonic() - start)
+                return
+            if sleep is None:
+                record_quota_throttled(api, PRIORITY_NAMES[priority])
+                logging.warning(f"Cuota de Google Maps agotada: {api} rechazado "
+                                f"(prioridad {PRIORITY_NAMES[priority]}, "
+                                f"esperó {time.monotonic() - start:.2f}s)",
+                                extra={'event': 'google_quota_throttled'})
+                raise QuotaExceeded(api, PRIORITY_NAMES[priority])
+            time.sleep(sleep)
+
+    def penalize(self, api: str):
+        """OVER_QUERY_LIMIT de Google: vaciar el bucket y pausar la API en todos los workers"""
+        if not self.enabled or api not in self.rates:
+            return
+        logging.warning(f"Google respondió OVER_QUERY_LIMIT para {api}: pausa de {self.cooldown:.1f}s")
+        try:
+            with self.state.locked() as buckets:
+                bucket, waiting = buckets.get(api)
+                now = time.time()
+                bucket = self._refill(api, bucket, now)
+                bucket[0] = 0.0
+                bucket[2] = max(bucket[2], now + self.cooldown)
+                buckets.put(api, bucket, waiting)
+        except OSError as e:
+            logging.error(f"Error en la cuota compartida de Google Maps: {e}")
+
+
+quota_governor = QuotaGovernor(QUOTA_RATES)
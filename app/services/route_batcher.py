@@ -0,0 +1,123 @@
+# app/services/route_batcher.py
+"""
+Micro-batching de Distance Matrix entre requests concurrentes del mismo worker (opt-in, ROUTE_BATCH)
+- Los requests que piden rutas desde los mismos orígenes (p. ej. default_origin) se juntan
+  hasta ROUTE_BATCH_WAIT_MS milisegundos o hasta ROUTE_BATCH_MAX_ELEMENTS elementos
+  (orígenes × destinos), y salen en UNA llamada a Distance Matrix
+- El primer request del lote es el líder: espera, hace la llamada en su propio hilo y
+  reparte las filas; los demás esperan el resultado como máximo ROUTE_BATCH_TIMEOUT
+  segundos (luego su ruta se da por fallida). Destinos repetidos comparten elemento
+- Si la llamada lanza una excepción (p. ej. QuotaExceeded) se relanza en cada request del
+  lote, para que cada uno responda su propio error
+- Solo tiene efecto con varios hilos por worker (GUNICORN_THREADS > 1 en
+  gunicorn_config.py): con workers sync cada proceso atiende un request a la vez
+- El uso de Google y la prioridad en la cuota del lote son los del request líder
+- Métricas: destinos por llamada, espera hasta el envío y requests que vencieron
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app.services.metrics import observe_route_batch, observe_route_batch_wait, record_route_batch_timeout
+
+ROUTE_BATCH = os.environ.get('ROUTE_BATCH', 'false').lower() == 'true'
+ROUTE_BATCH_WAIT_MS = float(os.environ.get('ROUTE_BATCH_WAIT_MS', 5))
+ROUTE_BATCH_MAX_ELEMENTS = int(os.environ.get('ROUTE_BATCH_MAX_ELEMENTS', 25))
+ROUTE_BATCH_TIMEOUT = float(os.environ.get('ROUTE_BATCH_TIMEOUT', 5))
+
+# Límites de Distance Matrix por request (RouterService._fetch_route_matrix parte en
+# varias llamadas las matrices más grandes)
+MAX_ORIGINS = 25
+MAX_DESTINATIONS = 25
+MAX_ELEMENTS = 100
+
+
+class _Batch:
+    """Destinos pendientes para un mismo conjunto de orígenes"""
+
+    def __init__(self, origins: List[Dict], limit: int):
+        self.origins = origins
+        self.limit = limit
+        self.destinations = []
+        self.positions = {}  # {(lat, lng): índice en destinations}
+        self.results = None
+        self.error = None
+        self.sent_at = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class RouteBatcher:
+    """Agrupa llamadas a Distance Matrix con los mismos orígenes"""
+
+    def __init__(self, fetch_matrix: Callable[[List[Dict], List[Dict]], List[List[Optional[Dict]]]],
+                 max_wait_ms: float = ROUTE_BATCH_WAIT_MS, max_elements: int = ROUTE_BATCH_MAX_ELEMENTS,
+                 timeout: float = ROUTE_BATCH_TIMEOUT):
+        """
+        Args:
+            fetch_matrix: (orígenes, destinos) -> por destino, una ruta por origen
+                (RouterService._fetch_route_matrix)
+        """
+        self.fetch_matrix = fetch_matrix
+        self.max_wait = max_wait_ms / 1000
+        self.max_elements = max_elements
+        self.timeout = timeout
+        self.open = {}  # {coordenadas de los orígenes: _Batch que aún acepta destinos}
+        self.lock = threading.Lock()
+
+    def calculate(self, origins: List[Dict], destination: Dict) -> List[Optional[Dict]]:
+        """Rutas desde cada origen a destination (mismo contrato que RouterService._fetch_routes)"""
+        limit = min(min(self.max_elements, MAX_ELEMENTS) // max(len(origins), 1), MAX_DESTINATIONS)
+        if limit < 2:
+            # Sin espacio para un segundo destino: llamada directa
+            return self.fetch_matrix(origins, [destination])[0]
+
+        key = tuple((origin['lat'], origin['lng']) for origin in origins)
+        point = (destination['lat'], destination['lng'])
+        arrived = time.monotonic()
+
+        with self.lock:
+            batch = self.open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self.open[key] = _Batch(origins, limit)
+            position = batch.positions.get(point)
+            if position is None:
+                position = batch.positions[point] = len(batch.destinations)
+                batch.destinations.append(destination)
+                if len(batch.destinations) >= batch.limit:
+                    # Lote cerrado: los siguientes requests abren otro
+                    del self.open[key]
+                    batch.full.set()
+
+        if leader:
+            self._send(key, batch)
+        elif not batch.done.wait(self.timeout):
+            record_route_batch_timeout()
+            logging.warning(f"Lote de Distance Matrix sin respuesta en {self.timeout:.1f}s; ruta fallida",
+                            extra={'event': 'route_batch_timeout'})
+            return [None] * len(origins)
+
+        observe_route_batch_wait(max(batch.sent_at - arrived, 0.0))
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[position]
+
+    def _send(self, key, batch: _Batch):
+        """Esperar a que el lote se llene o venza la espera, y hacer la llamada"""
+        batch.full.wait(self.max_wait)
+        with self.lock:
+            if self.open.get(key) is batch:
+                del self.open[key]
+
+        batch.sent_at = time.monotonic()
+        observe_route_batch(len(batch.destinations))
+        try:
+            batch.results = self.fetch_matrix(batch.origins, batch.destinations)
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
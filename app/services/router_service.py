@@ -5,51 +5,311 @@ Servicio para cálculo de rutas y validación de direcciones usando Google Maps
 - Distance Matrix API: Para calcular distancias y tiempos de viaje reales
 """
 
-import googlemaps
 import os
 import logging
 import json
+import math
+import bisect
+import random
+import sys
+import threading
 import time
-from typing import Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from app.services.metrics import observe_stage, record_google_call, record_cache
+from app.services.usage import record_usage, track_endpoint
+from app.services.address_index import find_indexed_address, address_recorder
+from app.services.quota_governor import quota_governor, QuotaExceeded
+from app.services.cache_admin import invalidation_sync
+from app.services.route_batcher import RouteBatcher, ROUTE_BATCH, MAX_ORIGINS, MAX_DESTINATIONS, MAX_ELEMENTS
+
+# Caché en memoria con stale-while-revalidate:
+# - Cada entrada vence entre max_age × (1 - CACHE_TTL_JITTER) y max_age (así las entradas
+#   creadas juntas no vencen juntas) y es fresca durante CACHE_SOFT_TTL_FRACTION de eso
+# - Pasada la parte fresca se sigue sirviendo; si la entrada es popular (CACHE_HOT_HITS
+#   hits desde que se guardó) se refresca en segundo plano, una vez por clave en el worker,
+#   y el request no espera a Google. Las poco usadas simplemente vencen
+CACHE_SOFT_TTL_FRACTION = float(os.environ.get('CACHE_SOFT_TTL_FRACTION', 0.8))
+CACHE_TTL_JITTER = float(os.environ.get('CACHE_TTL_JITTER', 0.1))
+CACHE_HOT_HITS = int(os.environ.get('CACHE_HOT_HITS', 3))
+CACHE_REFRESH_WORKERS = int(os.environ.get('CACHE_REFRESH_WORKERS', 2))
+ROUTE_CACHE_HOURS = float(os.environ.get('ROUTE_CACHE_HOURS', 24))
+
+# Máximo de entradas por caché (se descartan las más antiguas)
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 50000))
+
+# Endpoint (track_endpoint) de las llamadas de refresco: prioridad background en la cuota
+REFRESH_ENDPOINT = 'cache-refresh'
+
+# Resultado registrado (métricas y google_api_usage) para llamadas que rechazó la cuota compartida
+THROTTLED = 'THROTTLED'
+
+# Resumen del panel: contadores por caché, antigüedad en tramos de AGE_SLOT_SECONDS
+# agrupados según AGE_HISTOGRAM_HOURS, y memoria estimada (objetos + estructura por entrada)
+CACHE_STAT_NAMES = ('hit', 'stale', 'miss', 'expired', 'evicted', 'invalidated', 'refreshed', 'refresh_failed')
+AGE_SLOT_SECONDS = 600
+AGE_HISTOGRAM_HOURS = (1, 3, 6, 12, 18, 24)
+ENTRY_OVERHEAD_BYTES = 600
+
 
 class AddressCache:
-    """Sistema de caché simple en memoria para direcciones validadas"""
+    """Sistema de caché simple en memoria para direcciones validadas (y rutas)"""
 
-    def __init__(self, max_age_hours=24):
-        self.cache = {}  # {address: {data: {...}, timestamp: datetime}}
+    def __init__(self, max_age_hours=24, tier='geocode_memory', soft_fraction=CACHE_SOFT_TTL_FRACTION,
+                 jitter=CACHE_TTL_JITTER, hot_hits=CACHE_HOT_HITS, max_entries=CACHE_MAX_ENTRIES,
+                 locate=None, fields=()):
+        self.cache = {}  # {address: {data, timestamp, fresh_until, expires_at, hits, size, slot}}
         self.max_age = timedelta(hours=max_age_hours)
+        self.tier = tier  # Etiqueta para métricas
+        self.soft_fraction = soft_fraction
+        self.jitter = jitter
+        self.hot_hits = hot_hits
+        self.max_entries = max_entries
+        self.locate = locate    # (clave, data) -> (lat, lng) o None, para invalidar por bbox
+        self.fields = fields    # Campos de data que muestra la inspección del panel
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.executor = None
+
+        # Contadores para el resumen del panel (sin recorrer las entradas)
+        self.stats = dict.fromkeys(CACHE_STAT_NAMES, 0)
+        self.size_bytes = 0
+        self.slots = {}  # {tramo de AGE_SLOT_SECONDS en que se creó: entradas}
+
+    def _record(self, result: str):
+        self.stats[result] += 1
+        record_cache(self.tier, result)
+
+    def get(self, address: str, refresh: Optional[Callable[[], Optional[Dict]]] = None) -> Optional[Dict]:
+        """
+        Obtener dirección del caché si existe y no está expirada
 
-    def get(self, address: str) -> Optional[Dict]:
-        """Obtener dirección del caché si existe y no está expirada"""
-        if address in self.cache:
-            entry = self.cache[address]
-            age = datetime.now() - entry['timestamp']
-
-            if age < self.max_age:
-                logging.info(f"Cache HIT para: {address}")
+        Args:
+            refresh: función que obtiene el valor nuevo (None si falla); se llama en
+                segundo plano cuando una entrada popular pasa su TTL suave
+        """
+        entry = self.cache.get(address)
+        if entry is not None:
+            now = datetime.now()
+
+            if now < entry['expires_at']:
+                entry['hits'] += 1
+                if now < entry['fresh_until']:
+                    logging.info("Cache HIT para: %s", address, extra={'event': 'cache_hit'})
+                    self._record('hit')
+                else:
+                    logging.info("Cache STALE para: %s", address, extra={'event': 'cache_stale'})
+                    self._record('stale')
+                    if refresh is not None and entry['hits'] >= self.hot_hits:
+                        self._refresh_async(address, refresh)
                 return entry['data']
             else:
                 # Expirado, eliminarlo
-                del self.cache[address]
-                logging.info(f"Cache EXPIRED para: {address}")
+                with self.lock:
+                    self._remove(address)
+                logging.info("Cache EXPIRED para: %s", address, extra={'event': 'cache_expired'})
+                self._record('expired')
+                return None
 
+        self._record('miss')
         return None
 
     def set(self, address: str, data: Dict):
         """Guardar dirección en el caché"""
-        self.cache[address] = {
-            'data': data,
-            'timestamp': datetime.now()
+        now = datetime.now()
+        ttl = self.max_age * (1 - self.jitter * random.random())
+        size = (ENTRY_OVERHEAD_BYTES + sys.getsizeof(address) + sys.getsizeof(data) +
+                sum(sys.getsizeof(value) for value in data.values()))
+        slot = int(now.timestamp() // AGE_SLOT_SECONDS)
+
+        with self.lock:
+            self._remove(address)
+            self.cache[address] = {
+                'data': data,
+                'timestamp': now,
+                'fresh_until': now + ttl * self.soft_fraction,
+                'expires_at': now + ttl,
+                'hits': 0,
+                'size': size,
+                'slot': slot
+            }
+            self.size_bytes += size
+            self.slots[slot] = self.slots.get(slot, 0) + 1
+
+            # Descartar las más antiguas (orden de inserción)
+            while len(self.cache) > self.max_entries:
+                self._remove(next(iter(self.cache)))
+                self.stats['evicted'] += 1
+        logging.info("Cache SET para: %s", address, extra={'event': 'cache_set'})
+
+    def _remove(self, address: str) -> bool:
+        """Quitar una entrada actualizando tamaño y antigüedad (con self.lock tomado)"""
+        entry = self.cache.pop(address, None)
+        if entry is None:
+            return False
+        self.size_bytes -= entry['size']
+        remaining = self.slots.pop(entry['slot']) - 1
+        if remaining:
+            self.slots[entry['slot']] = remaining
+        return True
+
+    def _refresh_async(self, address: str, refresh: Callable[[], Optional[Dict]]):
+        """
+        Refrescar una entrada en segundo plano (una sola vez en curso por clave)
+
+        El hilo corre dentro del contexto de la app del request que lo dispara: el refresco
+        usa db.session (cuota, uso) e invalidation_sync, que sin contexto fallan u omiten.
+        """
+        from flask import has_app_context, current_app
+
+        app = current_app._get_current_object() if has_app_context() else None
+        with self.lock:
+            if address in self.refreshing:
+                return
+            self.refreshing.add(address)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=CACHE_REFRESH_WORKERS,
+                                                   thread_name_prefix=f'{self.tier}-refresh')
+        self.executor.submit(self._refresh, address, refresh, app)
+
+    def _refresh(self, address: str, refresh: Callable[[], Optional[Dict]], app=None):
+        try:
+            if app is not None:
+                with app.app_context():
+                    data = refresh()
+            else:
+                data = refresh()
+            if data is not None:
+                self.set(address, data)
+                self._record('refreshed')
+            else:
+                # Se sigue sirviendo la entrada vieja hasta que venza
+                self._record('refresh_failed')
+        except Exception as e:
+            logging.error(f"Error refrescando caché {self.tier} para {address}: {e}")
+            self._record('refresh_failed')
+        finally:
+            with self.lock:
+                self.refreshing.discard(address)
+
+    def invalidate(self, kind: str, value=None) -> int:
+        """
+        Quitar entradas: 'key' (clave exacta), 'prefix' (sin distinguir mayúsculas),
+        'place_id', 'bbox' ((sur, oeste, norte, este) con locate) o 'all'
+
+        Returns:
+            int: entradas quitadas
+        """
+        if kind == 'all':
+            with self.lock:
+                removed = len(self.cache)
+                self.cache = {}
+                self.size_bytes = 0
+                self.slots = {}
+                self.stats['invalidated'] += removed
+            return removed
+
+        if kind == 'key':
+            keys = [value]
+        elif kind == 'prefix':
+            prefix = value.casefold()
+            keys = [key for key in list(self.cache) if key.casefold().startswith(prefix)]
+        elif kind == 'place_id':
+            keys = [key for key, entry in list(self.cache.items()) if entry['data'].get('place_id') == value]
+        elif kind == 'bbox':
+            if self.locate is None:
+                return 0
+            south, west, north, east = value
+            keys = []
+            for key, entry in list(self.cache.items()):
+                location = self.locate(key, entry['data'])
+                if location and south <= location[0] <= north and west <= location[1] <= east:
+                    keys.append(key)
+        else:
+            raise ValueError(f"Tipo de invalidación desconocido: {kind}")
+
+        with self.lock:
+            removed = sum(1 for key in keys if self._remove(key))
+            self.stats['invalidated'] += removed
+        if removed:
+            logging.info(f"Caché {self.tier}: {removed} entradas invalidadas ({kind})")
+        return removed
+
+    def summary(self) -> Dict:
+        """Resumen para el panel en O(1): contadores, memoria estimada y antigüedad por tramos"""
+        stats = dict(self.stats)
+        lookups = stats['hit'] + stats['stale'] + stats['miss'] + stats['expired']
+        served = stats['hit'] + stats['stale']
+
+        current_slot = int(datetime.now().timestamp() // AGE_SLOT_SECONDS)
+        histogram = [0] * (len(AGE_HISTOGRAM_HOURS) + 1)
+        for slot, count in list(self.slots.items()):
+            age_hours = (current_slot - slot) * AGE_SLOT_SECONDS / 3600
+            histogram[bisect.bisect_right(AGE_HISTOGRAM_HOURS, age_hours)] += count
+        edges = (0,) + AGE_HISTOGRAM_HOURS
+
+        return {
+            'tier': self.tier,
+            'entries': len(self.cache),
+            'max_entries': self.max_entries,
+            'memory_bytes_estimate': self.size_bytes,
+            'hits': stats['hit'],
+            'stale_hits': stats['stale'],
+            'misses': stats['miss'],
+            'expired': stats['expired'],
+            'evictions': stats['evicted'],
+            'invalidations': stats['invalidated'],
+            'refreshes': stats['refreshed'],
+            'refresh_failures': stats['refresh_failed'],
+            'refreshing': len(self.refreshing),
+            'hit_ratio': round(served / lookups, 4) if lookups else None,
+            'ttl_hours': self.max_age.total_seconds() / 3600,
+            'age_histogram': [
+                {'age_hours': f"{edges[i]:g}-{edges[i + 1]:g}" if i < len(AGE_HISTOGRAM_HOURS)
+                    else f">={edges[i]:g}", 'entries': count}
+                for i, count in enumerate(histogram)
+            ]
         }
-        logging.info(f"Cache SET para: {address}")
+
+    def entries(self, offset: int = 0, limit: int = 50, prefix: Optional[str] = None) -> Tuple[List[Dict], bool]:
+        """Página de entradas (orden de inserción) para inspección: (entradas, hay_más)"""
+        items = list(self.cache.items())
+        if prefix:
+            folded = prefix.casefold()
+            items = [(key, entry) for key, entry in items if key.casefold().startswith(folded)]
+        page = items[offset:offset + limit + 1]
+
+        now = datetime.now()
+        return [
+            dict({
+                'key': key,
+                'age_seconds': int((now - entry['timestamp']).total_seconds()),
+                'expires_in_seconds': int((entry['expires_at'] - now).total_seconds()),
+                'stale': now >= entry['fresh_until'],
+                'hits': entry['hits']
+            }, **{field: entry['data'].get(field) for field in self.fields})
+            for key, entry in page[:limit]
+        ], len(page) > limit
 
     def clear(self):
         """Limpiar todo el caché"""
-        self.cache = {}
+        self.invalidate('all')
         logging.info("Cache cleared")
 
 
+def _geocode_location(address: str, data: Dict) -> Optional[Tuple[float, float]]:
+    if data.get('lat') is None or data.get('lng') is None:
+        return None
+    return data['lat'], data['lng']
+
+
+def _route_destination(key: str, data: Dict) -> Tuple[float, float]:
+    """Destino de una clave de ruta 'lat,lng|lat,lng'"""
+    lat, lng = key.split('|')[1].split(',')
+    return float(lat), float(lng)
+
+
 class RouterService:
     """
     Servicio para interactuar con Google Maps APIs para cálculo de rutas en Chile
@@ -74,18 +334,49 @@ class RouterService:
         'OTHER',                # Otro/desconocido
     ]
 
+    # API key de relleno cuando se usa un servidor local (googlemaps exige prefijo 'AIza')
+    LOCAL_API_KEY = 'AIzaLocalFakeGoogleMapsServer000000000'
+
     def __init__(self):
         self.api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
 
+        # GOOGLE_MAPS_BASE_URL apunta el cliente a un servidor local (fake_google_maps.py)
+        self.base_url = os.environ.get('GOOGLE_MAPS_BASE_URL')
+
         if not self.api_key:
-            logging.error("GOOGLE_MAPS_API_KEY no configurada en variables de entorno")
-            raise ValueError("GOOGLE_MAPS_API_KEY es requerida")
+            if not self.base_url:
+                logging.error("GOOGLE_MAPS_API_KEY no configurada en variables de entorno")
+                raise ValueError("GOOGLE_MAPS_API_KEY es requerida")
+            self.api_key = self.LOCAL_API_KEY
 
-        # Inicializar cliente de Google Maps
-        self.client = googlemaps.Client(key=self.api_key)
+        # Import diferido: googlemaps (y requests) solo se cargan al usar el servicio
+        import googlemaps
+        self.api_error = googlemaps.exceptions.ApiError
 
-        # Inicializar caché
-        self.address_cache = AddressCache(max_age_hours=24)
+        # Con la cuota compartida, OVER_QUERY_LIMIT no se reintenta dentro del cliente
+        # (hasta 60 s bloqueando el worker): pausa a todos los workers (ver _call_google)
+        client_options = {'retry_over_query_limit': not quota_governor.enabled}
+
+        # Inicializar cliente de Google Maps
+        if self.base_url:
+            logging.warning(f"Google Maps apuntando a {self.base_url}")
+            self.client = googlemaps.Client(key=self.api_key, base_url=self.base_url.rstrip('/'),
+                                            **client_options)
+        else:
+            self.client = googlemaps.Client(key=self.api_key, **client_options)
+
+        # Inicializar caché (geocodificación por dirección y rutas por origen/destino)
+        self.address_cache = AddressCache(
+            max_age_hours=24, locate=_geocode_location,
+            fields=('formatted_address', 'lat', 'lng', 'place_id', 'validation_level')
+        )
+        self.route_cache = AddressCache(
+            max_age_hours=ROUTE_CACHE_HOURS, tier='route_memory', locate=_route_destination,
+            fields=('distance_km', 'duration_minutes')
+        )
+
+        # Micro-batching opcional de Distance Matrix entre requests concurrentes del worker
+        self.route_batcher = RouteBatcher(self._fetch_route_matrix) if ROUTE_BATCH else None
 
         # Leer origen desde .env
         default_origin_address = os.environ.get('DEFAULT_ORIGIN_ADDRESS', '-33.4372,-70.6167')
@@ -137,24 +428,59 @@ class RouterService:
                 'error': str              # Mensaje de error si falla
             }
         """
+        # Invalidaciones publicadas desde el panel por otros workers
+        invalidation_sync.sync(self.caches)
+
+        # Verificar caché primero (pasado el TTL suave se sirve y se refresca en segundo plano)
+        cached = self.address_cache.get(address, refresh=lambda: self._refresh_geocode(address))
+        if cached:
+            record_usage('geocode', 'avoided', self.address_cache.tier)
+            return cached
+
+        result_data = self._geocode_uncached(address)
+        if result_data['success']:
+            # Guardar en caché
+            self.address_cache.set(address, result_data)
+        return result_data
+
+    def _refresh_geocode(self, address: str) -> Optional[Dict]:
+        """Valor nuevo para una entrada del caché de direcciones (None si falla)"""
+        # Revalidar con Google: el índice de direcciones es otra copia local que puede estar igual de vieja
+        with track_endpoint(REFRESH_ENDPOINT):
+            result_data = self._geocode_uncached(address, use_index=False)
+        return result_data if result_data['success'] else None
+
+    def _geocode_uncached(self, address: str, use_index: bool = True) -> Dict:
+        """
+        Geocodificar sin el caché en memoria: índice de direcciones validadas y luego Google
+
+        use_index=False consulta directo a Google (refresco de entradas vencidas)
+        """
         try:
-            # Verificar caché primero
-            cached = self.address_cache.get(address)
-            if cached:
-                return cached
+            # Dirección ya validada (p. ej. elegida en /api/address/suggest): sin llamar a Google
+            if use_index:
+                indexed = find_indexed_address(address)
+                record_cache('address_index', 'hit' if indexed else 'miss')
+                if indexed:
+                    result_data = self._result_from_index(indexed)
+                    record_usage('geocode', 'avoided', 'address_index')
+                    return result_data
 
             # Llamar a Address Validation API
             # Nota: googlemaps library no tiene método directo para Address Validation API v1
             # Usaremos el método de geocoding con components para Chile y luego validaremos
 
-            logging.info(f"Validando dirección con Google Maps: {address}")
+            logging.info("Validando dirección con Google Maps: %s", address, extra={'event': 'geocode_call'})
 
             # Geocoding con restricción a Chile
-            result = self.client.geocode(
+            result = self._call_google('geocode', 1, lambda: self.client.geocode(
                 address=address,
                 components={'country': 'CL'},  # Restringir a Chile
                 language='es'
-            )
+            ))
+
+            record_google_call('geocode', 'OK' if result else 'ZERO_RESULTS')
+            record_usage('geocode', 'OK' if result else 'ZERO_RESULTS')
 
             if not result or len(result) == 0:
                 return {
@@ -184,21 +510,7 @@ class RouterService:
             granularity = self._determine_granularity(types)
 
             # Determinar nivel de validación
-            if granularity in self.ACCEPTABLE_GRANULARITIES:
-                validation_level = 'accept'
-                warning_message = None
-            elif granularity in self.WARNING_GRANULARITIES:
-                validation_level = 'warning'
-                warning_message = (
-                    f"La dirección no es muy precisa (nivel: {granularity}). "
-                    "Considera agregar número de casa o especificar mejor la ubicación."
-                )
-            else:
-                validation_level = 'reject'
-                warning_message = (
-                    f"La dirección es demasiado imprecisa (nivel: {granularity}). "
-                    "Por favor proporciona una dirección más específica con número de casa."
-                )
+            validation_level, warning_message = self._validation_level(granularity)
 
             # Calcular score de confianza basado en location_type
             location_type = geometry.get('location_type', 'APPROXIMATE')
@@ -218,13 +530,22 @@ class RouterService:
                 'place_id': location_data.get('place_id')
             }
 
-            # Guardar en caché
-            self.address_cache.set(address, result_data)
-
             return result_data
 
-        except googlemaps.exceptions.ApiError as e:
+        except QuotaExceeded:
+            # Rechazada antes de llegar a Google (no facturada)
+            record_google_call('geocode', THROTTLED)
+            record_usage('geocode', THROTTLED)
+            return {
+                'success': False,
+                'error': 'Demasiadas consultas de direcciones en este momento, intenta nuevamente',
+                'validation_level': 'reject',
+                'throttled': True
+            }
+        except self.api_error as e:
             logging.error(f"Google Maps API error: {str(e)}")
+            record_google_call('geocode', e.status or 'API_ERROR')
+            record_usage('geocode', e.status or 'API_ERROR')
             return {
                 'success': False,
                 'error': f'Error de API: {str(e)}',
@@ -232,12 +553,47 @@ class RouterService:
             }
         except Exception as e:
             logging.error(f"Error validando dirección: {str(e)}")
+            record_google_call('geocode', type(e).__name__)
+            record_usage('geocode', type(e).__name__)
             return {
                 'success': False,
                 'error': f'Error interno: {str(e)}',
                 'validation_level': 'reject'
             }
 
+    def _validation_level(self, granularity: str) -> Tuple[str, Optional[str]]:
+        """Nivel de validación ('accept', 'warning', 'reject') y mensaje según granularidad"""
+        if granularity in self.ACCEPTABLE_GRANULARITIES:
+            return 'accept', None
+        if granularity in self.WARNING_GRANULARITIES:
+            return 'warning', (
+                f"La dirección no es muy precisa (nivel: {granularity}). "
+                "Considera agregar número de casa o especificar mejor la ubicación."
+            )
+        return 'reject', (
+            f"La dirección es demasiado imprecisa (nivel: {granularity}). "
+            "Por favor proporciona una dirección más específica con número de casa."
+        )
+
+    def _result_from_index(self, entry: Dict) -> Dict:
+        """Resultado de validate_and_geocode_address desde una entrada del índice de direcciones"""
+        # Nivel guardado al validar (el índice solo tiene accept/warning)
+        validation_level = entry['validation_level'] or 'accept'
+        warning_message = self._validation_level(entry['granularity'])[1] if validation_level == 'warning' else None
+        return {
+            'success': True,
+            'lat': entry['lat'],
+            'lng': entry['lng'],
+            'formatted_address': entry['formatted_address'],
+            'granularity': entry['granularity'],
+            'validation_level': validation_level,
+            'confidence': entry['confidence'],
+            'warning_message': warning_message,
+            'location_type': entry['location_type'],
+            'types': [],
+            'place_id': entry['place_id']
+        }
+
     def _determine_granularity(self, types: list) -> str:
         """
         Determinar granularidad basándose en los tipos de Google Maps
@@ -323,82 +679,230 @@ class RouterService:
         Returns:
             Dict: Información de distancia y tiempo o None si falla
         """
+        return self.calculate_routes([origin], destination)[0]
+
+    def calculate_routes(self, origins: List[Dict], destination: Dict) -> List[Optional[Dict]]:
+        """
+        Calcular rutas desde varios orígenes a un destino en una llamada a Distance Matrix
+
+        Args:
+            origins (List[Dict]): [{'lat': float, 'lng': float}, ...] (más de MAX_ORIGINS: varias llamadas)
+            destination (Dict): {'lat': float, 'lng': float}
+
+        Returns:
+            List[Optional[Dict]]: Una ruta por origen (mismo orden), None si ese origen falla
+
+        Raises:
+            QuotaExceeded: Si la cuota compartida de Google no alcanzó a tiempo
+        """
+        invalidation_sync.sync(self.caches)
+
+        # Rutas en caché (origen y destino por coordenadas); solo los demás orígenes van a Google
+        keys = [self._route_key(origin, destination) for origin in origins]
+        routes = [
+            self.route_cache.get(key, refresh=lambda origin=origin: self._refresh_route(origin, destination))
+            for key, origin in zip(keys, origins)
+        ]
+        missing = [i for i, route in enumerate(routes) if route is None]
+
+        if len(missing) < len(origins):
+            record_usage('distance_matrix', 'avoided', self.route_cache.tier, units=len(origins) - len(missing))
+        if missing:
+            fetched = self._fetch_routes([origins[i] for i in missing], destination)
+            for i, route in zip(missing, fetched):
+                routes[i] = route
+                if route:
+                    self.route_cache.set(keys[i], route)
+
+        return routes
+
+    @staticmethod
+    def _route_key(origin: Dict, destination: Dict) -> str:
+        return f"{origin['lat']},{origin['lng']}|{destination['lat']},{destination['lng']}"
+
+    def _refresh_route(self, origin: Dict, destination: Dict) -> Optional[Dict]:
+        """Valor nuevo para una entrada del caché de rutas (None si falla)"""
+        with track_endpoint(REFRESH_ENDPOINT):
+            return self._fetch_routes([origin], destination)[0]
+
+    def _fetch_routes(self, origins: List[Dict], destination: Dict) -> List[Optional[Dict]]:
+        """Rutas sin caché (con ROUTE_BATCH, agrupando destinos de requests concurrentes)"""
+        if self.route_batcher is not None:
+            return self.route_batcher.calculate(origins, destination)
+        return self._fetch_route_matrix(origins, [destination])[0]
+
+    def _fetch_route_matrix(self, origins: List[Dict], destinations: List[Dict]) -> List[List[Optional[Dict]]]:
+        """
+        Llamar a Distance Matrix (todos los orígenes × todos los destinos) sin caché,
+        en tantas llamadas como exijan los límites de la API (MAX_ORIGINS orígenes,
+        MAX_DESTINATIONS destinos y MAX_ELEMENTS elementos por request)
+
+        Returns:
+            List[List[Optional[Dict]]]: por destino, una ruta por origen (None si ese par falla)
+
+        Raises:
+            QuotaExceeded: Si la cuota compartida de Google no alcanzó a tiempo
+        """
+        routes = [[None] * len(origins) for _ in destinations]
+        for origin_start in range(0, len(origins), MAX_ORIGINS):
+            origin_chunk = origins[origin_start:origin_start + MAX_ORIGINS]
+            destination_step = min(MAX_DESTINATIONS, MAX_ELEMENTS // len(origin_chunk))
+            for destination_start in range(0, len(destinations), destination_step):
+                chunk = self._fetch_route_matrix_chunk(
+                    origin_chunk, destinations[destination_start:destination_start + destination_step])
+                for j, chunk_routes in enumerate(chunk, start=destination_start):
+                    routes[j][origin_start:origin_start + len(origin_chunk)] = chunk_routes
+        return routes
+
+    def _fetch_route_matrix_chunk(self, origins: List[Dict], destinations: List[Dict]) -> List[List[Optional[Dict]]]:
+        """
+        Una llamada a Distance Matrix dentro de los límites de la API
+
+        Returns:
+            List[List[Optional[Dict]]]: por destino, una ruta por origen (None si ese par falla)
+
+        Raises:
+            QuotaExceeded: Si la cuota compartida de Google no alcanzó a tiempo
+        """
+        routes = [[None] * len(origins) for _ in destinations]
+        units = len(origins) * len(destinations)
+
         try:
-            origin_coords = f"{origin['lat']},{origin['lng']}"
-            destination_coords = f"{destination['lat']},{destination['lng']}"
+            origin_coords = [f"{origin['lat']},{origin['lng']}" for origin in origins]
+            destination_coords = [f"{destination['lat']},{destination['lng']}" for destination in destinations]
 
-            logging.info(f"Calculando ruta de {origin_coords} a {destination_coords}")
+            logging.info("Calculando ruta de %s a %s", ' | '.join(origin_coords), ' | '.join(destination_coords),
+                         extra={'event': 'distance_matrix_call'})
 
-            # Llamar a Distance Matrix API
-            result = self.client.distance_matrix(
-                origins=[origin_coords],
-                destinations=[destination_coords],
+            # Llamar a Distance Matrix API (todos los orígenes × destinos)
+            result = self._call_google('distance_matrix', units, lambda: self.client.distance_matrix(
+                origins=origin_coords,
+                destinations=destination_coords,
                 mode='driving',
                 language='es',
                 units='metric'
-            )
+            ))
+
+            record_google_call('distance_matrix', result['status'])
+            record_usage('distance_matrix', result['status'], units=units)
 
             if result['status'] != 'OK':
                 logging.error(f"Distance Matrix error: {result['status']}")
-                return None
+                return routes
 
-            # Extraer información del primer resultado
             rows = result.get('rows', [])
             if not rows or len(rows) == 0:
                 logging.error("No se encontraron rutas")
-                return None
-
-            elements = rows[0].get('elements', [])
-            if not elements or len(elements) == 0:
-                logging.error("No se encontraron elementos en la ruta")
-                return None
+                return routes
+
+            # Una fila por origen, un elemento por destino
+            for i, row in enumerate(rows[:len(origins)]):
+                elements = row.get('elements', [])
+                if not elements or len(elements) == 0:
+                    logging.error("No se encontraron elementos en la ruta")
+                    continue
+
+                for j, element in enumerate(elements[:len(destinations)]):
+                    if element['status'] != 'OK':
+                        logging.error(f"Elemento de ruta con error: {element['status']}")
+                        continue
+
+                    routes[j][i] = self._parse_route_element(element, origin_coords[i], destination_coords[j])
+
+            return routes
+
+        except QuotaExceeded:
+            # Rechazada antes de llegar a Google: el request responde RATE_LIMITED
+            record_google_call('distance_matrix', THROTTLED)
+            record_usage('distance_matrix', THROTTLED, units=units)
+            raise
+        except self.api_error as e:
+            logging.error(f"Distance Matrix API error: {str(e)}")
+            record_google_call('distance_matrix', e.status or 'API_ERROR')
+            record_usage('distance_matrix', e.status or 'API_ERROR', units=units)
+            return routes
+        except Exception as e:
+            logging.error(f"Error calculando ruta: {str(e)}")
+            record_google_call('distance_matrix', type(e).__name__)
+            record_usage('distance_matrix', type(e).__name__, units=units)
+            return routes
 
-            element = elements[0]
+    def _call_google(self, api: str, units: int, call):
+        """
+        Llamar a Google dentro de la cuota compartida entre workers
 
-            if element['status'] != 'OK':
-                logging.error(f"Elemento de ruta con error: {element['status']}")
-                return None
+        Un OVER_QUERY_LIMIT pausa la API en todos los workers y se reintenta una vez,
+        esperando la cuota según la prioridad del request. Lanza QuotaExceeded si no
+        hay cuota a tiempo.
+        """
+        for attempt in range(2):
+            quota_governor.acquire(api, units)
+            try:
+                with observe_stage(api):
+                    return call()
+            except self.api_error as e:
+                if e.status != 'OVER_QUERY_LIMIT':
+                    raise
+                quota_governor.penalize(api)
+                if attempt or not quota_governor.enabled:
+                    raise
+                record_google_call(api, e.status)
+                record_usage(api, e.status, units=units)
+
+    def _parse_route_element(self, element: Dict, origin_coords: str, destination_coords: str) -> Dict:
+        """Convertir un elemento de Distance Matrix al formato de ruta del servicio"""
+        distance = element.get('distance', {})
+        duration = element.get('duration', {})
+
+        distance_m = distance.get('value', 0)  # Metros
+        duration_s = duration.get('value', 0)  # Segundos
 
-            distance = element.get('distance', {})
-            duration = element.get('duration', {})
+        return {
+            'distance_km': round(distance_m / 1000, 2),
+            'distance_m': distance_m,
+            'distance_text': distance.get('text', f"{distance_m/1000:.2f} km"),
+            'duration_minutes': round(duration_s / 60),
+            'duration_seconds': duration_s,
+            'duration_text': duration.get('text', f"{duration_s//60} min"),
+            'start_address': origin_coords,
+            'end_address': destination_coords,
+            'status': 'OK'
+        }
 
-            distance_m = distance.get('value', 0)  # Metros
-            duration_s = duration.get('value', 0)  # Segundos
+    @staticmethod
+    def straight_line_km(origin: Dict, destination: Dict) -> float:
+        """Distancia en línea recta (haversine) en km, sin llamadas a API"""
+        lat1, lng1 = math.radians(origin['lat']), math.radians(origin['lng'])
+        lat2, lng2 = math.radians(destination['lat']), math.radians(destination['lng'])
 
-            return {
-                'distance_km': round(distance_m / 1000, 2),
-                'distance_m': distance_m,
-                'distance_text': distance.get('text', f"{distance_m/1000:.2f} km"),
-                'duration_minutes': round(duration_s / 60),
-                'duration_seconds': duration_s,
-                'duration_text': duration.get('text', f"{duration_s//60} min"),
-                'start_address': origin_coords,
-                'end_address': destination_coords,
-                'status': 'OK'
-            }
+        a = (math.sin((lat2 - lat1) / 2) ** 2 +
+             math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
 
-        except googlemaps.exceptions.ApiError as e:
-            logging.error(f"Distance Matrix API error: {str(e)}")
-            return None
-        except Exception as e:
-            logging.error(f"Error calculando ruta: {str(e)}")
-            return None
+        return round(6371.0 * 2 * math.asin(math.sqrt(a)), 2)
 
-    def get_distance_and_time(self, origin_address: str, destination_address: str) -> Dict:
+    def get_distance_and_time(self, origin_address: str, destination_address: str,
+                              with_route: bool = True, origins: Optional[List[Dict]] = None) -> Dict:
         """
         Método principal: obtener distancia y tiempo entre dos direcciones
 
         Flujo:
-        1. Usar coordenadas fijas para origen (no requiere API)
+        1. Usar coordenadas fijas para origen(es) (no requiere API)
         2. Validar y geocodificar destino con Address Validation
-        3. Calcular ruta con Distance Matrix API
+        3. Calcular rutas con Distance Matrix API, todos los orígenes en una sola llamada
+           (solo si with_route=True)
 
         Args:
-            origin_address (str): Dirección de origen (vacío usa default)
+            origin_address (str): Dirección de origen (vacío usa origins o el default)
             destination_address (str): Dirección de destino
+            with_route (bool): Si es False se omite Distance Matrix y se informa
+                la distancia en línea recta (para métodos con tarifa por polígono)
+            origins (List[Dict]): Bodegas/puntos de despacho configurados
+                [{'id': int, 'name': str, 'lat': float, 'lng': float, 'formatted_address': str}]
 
         Returns:
-            Dict: Resultado completo con distancia, tiempo, coordenadas y validación
+            Dict: Resultado completo con distancia, tiempo, coordenadas y validación.
+                'origin' y 'route' corresponden al origen más cercano; 'origins'
+                trae la ruta de cada origen ('route' None si ese origen falló)
         """
         try:
             # 1. ORIGEN: Usar coordenadas fijas (sin API call)
@@ -413,14 +917,18 @@ class RouterService:
                         'status': 'ORIGIN_VALIDATION_FAILED'
                     }
 
-                origin_geo = {
+                origin_geos = [{
+                    'id': None,
                     'lat': origin_validation['lat'],
                     'lng': origin_validation['lng'],
                     'formatted_address': origin_validation['formatted_address']
-                }
+                }]
+            elif origins:
+                # Orígenes configurados (multi-bodega)
+                origin_geos = origins
             else:
                 # Usar origen por defecto (coordenadas fijas, sin API call)
-                origin_geo = self.default_origin
+                origin_geos = [dict(self.default_origin, id=None)]
 
             # 2. DESTINO: Validar y geocodificar
             dest_validation = self.validate_and_geocode_address(destination_address)
@@ -429,7 +937,7 @@ class RouterService:
                 return {
                     'success': False,
                     'error': dest_validation.get('error', 'Error validando destino'),
-                    'status': 'DESTINATION_VALIDATION_FAILED'
+                    'status': 'RATE_LIMITED' if dest_validation.get('throttled') else 'DESTINATION_VALIDATION_FAILED'
                 }
 
             # Verificar nivel de validación (rechazar si es muy impreciso)
@@ -447,24 +955,69 @@ class RouterService:
                 'formatted_address': dest_validation['formatted_address']
             }
 
-            # 3. RUTA: Calcular distancia
-            route = self.calculate_route(origin_geo, destination_geo)
-
-            if not route:
+            # 3. RUTA: Calcular distancia desde todos los orígenes
+            if with_route:
+                try:
+                    routes = self.calculate_routes(origin_geos, destination_geo)
+                except QuotaExceeded:
+                    return {
+                        'success': False,
+                        'error': 'Demasiadas consultas de rutas en este momento, intenta nuevamente',
+                        'status': 'RATE_LIMITED'
+                    }
+            else:
+                # Sin Distance Matrix: distancia en línea recta como referencia
+                record_usage('distance_matrix', 'avoided', 'polygon_pricing', units=len(origin_geos))
+                routes = []
+                for origin_geo in origin_geos:
+                    straight_km = self.straight_line_km(origin_geo, destination_geo)
+                    routes.append({
+                        'distance_km': straight_km,
+                        'distance_text': f"{straight_km:.2f} km (línea recta)",
+                        'duration_minutes': None,
+                        'duration_text': None
+                    })
+
+            origin_results = []
+            for origin_geo, route in zip(origin_geos, routes):
+                origin_results.append({
+                    'id': origin_geo.get('id'),
+                    'name': origin_geo.get('name'),
+                    'formatted_address': origin_geo['formatted_address'],
+                    'lat': origin_geo['lat'],
+                    'lng': origin_geo['lng'],
+                    'route': {
+                        'distance_km': route['distance_km'],
+                        'distance_text': route['distance_text'],
+                        'duration_minutes': route['duration_minutes'],
+                        'duration_text': route['duration_text'],
+                        'is_estimate': not with_route
+                    } if route else None
+                })
+
+            reachable = [o for o in origin_results if o['route']]
+            if not reachable:
                 return {
                     'success': False,
                     'error': 'No se pudo calcular la ruta',
                     'status': 'ROUTING_FAILED'
                 }
 
+            nearest = min(reachable, key=lambda o: o['route']['distance_km'])
+
+            # Fuente del autocompletado (solo accept/warning): una vez por cotización con
+            # ruta, no en cada consulta al caché de direcciones
+            address_recorder.record(dest_validation)
+
             # 4. Resultado completo
             result = {
                 'success': True,
                 'origin': {
-                    'address': origin_address or origin_geo['formatted_address'],
-                    'formatted_address': origin_geo['formatted_address'],
-                    'lat': origin_geo['lat'],
-                    'lng': origin_geo['lng']
+                    'id': nearest['id'],
+                    'address': origin_address or nearest['formatted_address'],
+                    'formatted_address': nearest['formatted_address'],
+                    'lat': nearest['lat'],
+                    'lng': nearest['lng']
                 },
                 'destination': {
                     'address': destination_address,
@@ -478,12 +1031,8 @@ class RouterService:
                         'warning': dest_validation.get('warning_message')
                     }
                 },
-                'route': {
-                    'distance_km': route['distance_km'],
-                    'distance_text': route['distance_text'],
-                    'duration_minutes': route['duration_minutes'],
-                    'duration_text': route['duration_text']
-                },
+                'route': nearest['route'],
+                'origins': origin_results,
                 'status': 'OK'
             }
 
@@ -501,23 +1050,54 @@ class RouterService:
                 'status': 'ERROR'
             }
 
+    def caches(self) -> Dict[str, AddressCache]:
+        """Cachés en memoria por tier (panel de cachés e invalidaciones)"""
+        return {cache.tier: cache for cache in (self.address_cache, self.route_cache)}
+
     def clear_cache(self):
-        """Limpiar el caché de direcciones"""
+        """Limpiar el caché de direcciones y de rutas"""
         self.address_cache.clear()
+        self.route_cache.clear()
 
     def get_cache_stats(self) -> Dict:
-        """Obtener estadísticas del caché"""
-        return {
-            'total_entries': len(self.address_cache.cache),
-            'entries': [
-                {
-                    'address': addr,
-                    'age_minutes': int((datetime.now() - entry['timestamp']).total_seconds() / 60)
-                }
-                for addr, entry in self.address_cache.cache.items()
-            ]
-        }
+        """Resumen de las cachés (O(1); las entradas se inspeccionan con AddressCache.entries)"""
+        return {tier: cache.summary() for tier, cache in self.caches().items()}
+
+
+class LazyRouterService:
+    """
+    Proxy que construye RouterService en el primer uso y no al importar el módulo
+
+    Así create_app() y los scripts de administración no pagan la creación del cliente
+    de Google ni fallan sin GOOGLE_MAPS_API_KEY, y con preload_app cada worker crea su
+    propio cliente (y sesión HTTP) después del fork.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def get(self) -> RouterService:
+        """Instancia real (se crea una sola vez por proceso)"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = RouterService()
+                    object.__setattr__(self, '_instance', instance)
+        return instance
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
 
 
-# Instancia global del servicio
-router_service = RouterService()
+# Instancia global del servicio (perezosa)
+router_service = LazyRouterService()
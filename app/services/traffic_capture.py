@@ -0,0 +1,209 @@
+# app/services/traffic_capture.py
+"""
+Captura de tráfico real de cotización para reproducirlo offline (replay_traffic.py)
+- Middleware WSGI opt-in (TRAFFIC_CAPTURE_FILE) que muestrea requests a
+  /api/jumpseller/callback y /api/quote y los escribe como NDJSON (una línea por request)
+- Archivo rotativo por worker: <archivo>.<pid> con TRAFFIC_CAPTURE_MAX_MB y TRAFFIC_CAPTURE_BACKUPS
+- Redacción de PII (TRAFFIC_CAPTURE_REDACT):
+    'none'    sin cambios
+    'contact' (default) elimina nombres, emails, teléfonos y datos de cliente; cart_id/order_id
+              se reemplazan por un hash estable (se conserva la tasa de repetición)
+    'address' además reemplaza calle y número por un hash estable, conservando comuna/región
+              (la repetición de direcciones, que decide el hit ratio de caché, se mantiene);
+              en direcciones de texto libre (destination, origin, ...) solo la primera parte
+"""
+
+import os
+import io
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+# Rutas capturadas (sufijo, para no depender del prefijo del blueprint)
+CAPTURED_PATHS = ('/api/jumpseller/callback', '/api/quote')
+
+# Claves con datos de contacto (comparación sin mayúsculas, por contenido)
+CONTACT_KEY_PARTS = ('name', 'surname', 'email', 'phone', 'customer', 'taxid', 'rut')
+
+# Claves de dirección exacta (modo 'address')
+ADDRESS_KEYS = ('address', 'street_number', 'address_line_2', 'complement', 'latitude', 'longitude')
+
+# Direcciones de texto libre 'Calle 123, Comuna, Región' (modo 'address')
+FREE_TEXT_ADDRESS_KEYS = ('destination', 'origin', 'destination_address', 'origin_address',
+                          'formatted_address', 'full_address')
+
+# Identificadores que se conservan como hash estable
+ID_KEYS = ('cart_id', 'order_id', 'session_id')
+
+# Claves geográficas que nunca se redactan (contienen 'name' pero no son PII)
+GEO_KEYS = ('region_name', 'municipality_name', 'country_name', 'city', 'region', 'country',
+            'postal', 'zip')
+
+REDACT_MODES = ('none', 'contact', 'address')
+
+
+class Redactor:
+    """Redacción recursiva de payloads JSON según el modo configurado"""
+
+    def __init__(self, mode='contact', salt=''):
+        if mode not in REDACT_MODES:
+            raise ValueError(f"TRAFFIC_CAPTURE_REDACT inválido: {mode}")
+        self.mode = mode
+        self.salt = salt
+
+    def stable_hash(self, value, prefix):
+        digest = hashlib.sha256(f"{self.salt}{value}".encode('utf-8')).hexdigest()[:12]
+        return f"{prefix}-{digest}"
+
+    def redact(self, payload):
+        if self.mode == 'none':
+            return payload
+        if isinstance(payload, dict):
+            return self._redact_dict(payload)
+        if isinstance(payload, list):
+            return [self.redact(item) for item in payload]
+        return payload
+
+    def _redact_dict(self, data):
+        result = {}
+        for key, value in data.items():
+            lowered = key.lower()
+
+            if lowered in GEO_KEYS:
+                result[key] = value
+            elif lowered in ID_KEYS:
+                result[key] = self.stable_hash(value, lowered) if value else value
+            elif any(part in lowered for part in CONTACT_KEY_PARTS):
+                continue
+            elif self.mode == 'address' and lowered in ADDRESS_KEYS:
+                result[key] = self.stable_hash(' '.join(str(value).lower().split()), 'addr') if value else value
+            elif self.mode == 'address' and lowered in FREE_TEXT_ADDRESS_KEYS and isinstance(value, str):
+                result[key] = self._redact_free_text_address(value)
+            else:
+                result[key] = self.redact(value)
+        return result
+
+    def _redact_free_text_address(self, address):
+        """'Calle 123, Comuna, Chile' → 'addr-xxxx, Comuna, Chile'"""
+        street, _, rest = address.partition(',')
+        hashed = self.stable_hash(' '.join(street.lower().split()), 'addr')
+        return f"{hashed},{rest}" if rest else hashed
+
+
+class TrafficCaptureMiddleware:
+    """
+    Middleware WSGI que muestrea requests de cotización a un archivo NDJSON
+
+    Cada línea: {ts, method, path, query, body, status, duration_ms, pid}
+    El body se bufferiza y se repone en wsgi.input para la app.
+    """
+
+    def __init__(self, wsgi_app, file_path, sample_rate=1.0, redact='contact', salt='',
+                 max_bytes=50 * 1024 * 1024, backup_count=5):
+        self.wsgi_app = wsgi_app
+        self.file_path = file_path
+        self.sample_rate = sample_rate
+        self.redactor = Redactor(redact, salt)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.handler = None
+        self.handler_pid = None
+        self.lock = threading.Lock()
+        self.rng = random.Random()
+
+    def _get_handler(self):
+        # Un archivo por proceso: con preload_app el master crea el middleware antes del fork
+        pid = os.getpid()
+        if self.handler_pid != pid:
+            with self.lock:
+                if self.handler_pid != pid:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+                    self.handler = RotatingFileHandler(
+                        f"{self.file_path}.{pid}",
+                        maxBytes=self.max_bytes,
+                        backupCount=self.backup_count,
+                        encoding='utf-8',
+                        delay=True
+                    )
+                    self.handler.setFormatter(logging.Formatter('%(message)s'))
+                    self.handler_pid = pid
+        return self.handler
+
+    def should_capture(self, environ):
+        if environ.get('REQUEST_METHOD') != 'POST':
+            return False
+        if not environ.get('PATH_INFO', '').endswith(CAPTURED_PATHS):
+            return False
+        return self.sample_rate >= 1.0 or self.rng.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self.should_capture(environ):
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        raw_body = environ['wsgi.input'].read(length) if length > 0 else b''
+        environ['wsgi.input'] = io.BytesIO(raw_body)
+
+        captured = {}
+
+        def capturing_start_response(status, headers, exc_info=None):
+            captured['status'] = int(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        response = self.wsgi_app(environ, capturing_start_response)
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            self._write(environ, raw_body, started_at, captured.get('status'), duration_ms)
+        except Exception as e:
+            # La captura nunca debe afectar la respuesta
+            logging.warning(f"Error capturando tráfico: {e}")
+
+        return response
+
+    def _write(self, environ, raw_body, started_at, status, duration_ms):
+        try:
+            body = json.loads(raw_body) if raw_body else None
+        except ValueError:
+            body = None
+
+        record = {
+            'ts': round(started_at, 3),
+            'method': environ.get('REQUEST_METHOD'),
+            'path': environ.get('PATH_INFO'),
+            'query': environ.get('QUERY_STRING', ''),
+            'body': self.redactor.redact(body),
+            'status': status,
+            'duration_ms': round(duration_ms, 2),
+            'pid': os.getpid()
+        }
+
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        self._get_handler().handle(logging.makeLogRecord({'msg': line, 'levelno': logging.INFO}))
+
+
+def init_traffic_capture(app):
+    """Envolver app.wsgi_app si TRAFFIC_CAPTURE_FILE está definido"""
+    file_path = os.environ.get('TRAFFIC_CAPTURE_FILE')
+    if not file_path:
+        return
+
+    app.wsgi_app = TrafficCaptureMiddleware(
+        app.wsgi_app,
+        file_path=file_path,
+        sample_rate=float(os.environ.get('TRAFFIC_CAPTURE_SAMPLE', 1.0)),
+        redact=os.environ.get('TRAFFIC_CAPTURE_REDACT', 'contact'),
+        salt=os.environ.get('TRAFFIC_CAPTURE_SALT', ''),
+        max_bytes=int(float(os.environ.get('TRAFFIC_CAPTURE_MAX_MB', 50)) * 1024 * 1024),
+        backup_count=int(os.environ.get('TRAFFIC_CAPTURE_BACKUPS', 5))
+    )
+    logging.warning(f"Captura de tráfico activa en {file_path}.<pid>")
@@ -0,0 +1,139 @@
+# app/services/usage.py
+"""
+Contabilidad de uso y costo de Google Maps APIs
+- Cuenta cada geocodificación y cada elemento de Distance Matrix por endpoint
+  que lo originó (callback, quote, test-address, batch), resultado y nivel de caché
+- Agrega en memoria por worker y un hilo de fondo vuelca totales a la tabla google_api_usage
+  cada USAGE_FLUSH_INTERVAL segundos (una fila por día/endpoint/api/resultado/caché, no por llamada)
+"""
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from typing import Dict
+
+from app.services.buffered_aggregator import BufferedAggregator
+
+# Endpoint que origina las llamadas del request/job actual
+_current_endpoint = ContextVar('google_usage_endpoint', default='other')
+
+# cache_tier para llamadas que llegan a Google
+BILLABLE_TIER = 'none'
+
+# Resultados que Google factura (los errores de cuota/permiso/red no se cobran)
+BILLED_OUTCOMES = ('OK', 'ZERO_RESULTS', 'NOT_FOUND')
+
+# Precio de lista en USD por 1000 unidades (requests de geocode / elementos de Distance Matrix)
+PRICES_PER_1000 = {
+    'geocode': float(os.environ.get('GOOGLE_GEOCODE_PRICE_PER_1000', 5.0)),
+    'distance_matrix': float(os.environ.get('GOOGLE_DISTANCE_MATRIX_PRICE_PER_1000', 5.0)),
+}
+
+
+@contextmanager
+def track_endpoint(endpoint: str):
+    """Asociar las llamadas a Google dentro del bloque a un endpoint"""
+    token = _current_endpoint.set(endpoint)
+    try:
+        yield
+    finally:
+        _current_endpoint.reset(token)
+
+
+def current_endpoint() -> str:
+    """Endpoint asociado al request/job actual ('other' fuera de track_endpoint)"""
+    return _current_endpoint.get()
+
+
+class GoogleUsageTracker(BufferedAggregator):
+    """Contadores agregados en memoria con volcado periódico a la BD"""
+
+    label = 'uso de Google Maps'
+
+    def record(self, api: str, outcome: str, cache_tier: str = BILLABLE_TIER, units: int = 1):
+        """
+        Registrar uso de una API
+
+        Args:
+            api (str): 'geocode' o 'distance_matrix'
+            outcome (str): status de Google ('OK', 'ZERO_RESULTS', ...) o 'avoided'
+            cache_tier (str): 'none' si se llamó a Google, o el nivel que lo evitó
+            units (int): requests (geocode) o elementos origen×destino (Distance Matrix)
+        """
+        key = (date.today(), _current_endpoint.get(), api, outcome, cache_tier)
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + units
+        self._ensure_flusher()
+
+    def _write(self, conn, counts: Dict):
+        """Volcar contadores a google_api_usage"""
+        from app.models import GoogleApiUsage
+
+        for (day, endpoint, api, outcome, cache_tier), units in counts.items():
+            GoogleApiUsage.upsert(conn, day, endpoint, api, outcome, cache_tier, units)
+
+    def _restore(self, counts: Dict):
+        for key, units in counts.items():
+            self.pending[key] = self.pending.get(key, 0) + units
+
+
+usage_tracker = GoogleUsageTracker(flush_interval=int(os.environ.get('USAGE_FLUSH_INTERVAL', 60)))
+
+
+def record_usage(api: str, outcome: str, cache_tier: str = BILLABLE_TIER, units: int = 1):
+    """Atajo para usage_tracker.record"""
+    usage_tracker.record(api, outcome, cache_tier, units)
+
+
+def summarize_usage(rows) -> Dict:
+    """
+    Resumir filas de google_api_usage en llamadas facturadas, evitadas y costo estimado
+
+    Args:
+        rows: iterable de GoogleApiUsage
+    """
+    by_day = {}
+    by_tier = {}
+    totals = {'billable_units': 0, 'avoided_units': 0, 'estimated_cost_usd': 0.0,
+              'estimated_savings_usd': 0.0}
+
+    for row in rows:
+        price = PRICES_PER_1000.get(row.api, 0.0) / 1000
+        day_key = row.day.isoformat()
+        day = by_day.setdefault(day_key, {'day': day_key, 'endpoints': {}})
+        endpoint = day['endpoints'].setdefault(row.endpoint, {})
+        api = endpoint.setdefault(row.api, {'billable': 0, 'avoided': 0, 'errors': 0,
+                                            'estimated_cost_usd': 0.0})
+
+        if row.cache_tier == BILLABLE_TIER:
+            if row.outcome in BILLED_OUTCOMES:
+                api['billable'] += row.count
+                api['estimated_cost_usd'] += row.count * price
+                totals['billable_units'] += row.count
+                totals['estimated_cost_usd'] += row.count * price
+            else:
+                api['errors'] += row.count
+        else:
+            api['avoided'] += row.count
+            totals['avoided_units'] += row.count
+            totals['estimated_savings_usd'] += row.count * price
+            tier = by_tier.setdefault(row.cache_tier, {'avoided_units': 0, 'estimated_savings_usd': 0.0})
+            tier['avoided_units'] += row.count
+            tier['estimated_savings_usd'] += row.count * price
+
+    totals['estimated_cost_usd'] = round(totals['estimated_cost_usd'], 4)
+    totals['estimated_savings_usd'] = round(totals['estimated_savings_usd'], 4)
+    for tier in by_tier.values():
+        tier['estimated_savings_usd'] = round(tier['estimated_savings_usd'], 4)
+    for day in by_day.values():
+        for endpoint in day['endpoints'].values():
+            for api in endpoint.values():
+                api['estimated_cost_usd'] = round(api['estimated_cost_usd'], 4)
+
+    return {
+        'totals': totals,
+        'savings_by_tier': by_tier,
+        'days': sorted(by_day.values(), key=lambda d: d['day'], reverse=True),
+        'prices_per_1000_usd': PRICES_PER_1000
+    }
@@ -0,0 +1,158 @@
+# app/services/user_cache.py
+"""
+Caché del usuario administrador de la sesión (user_loader de Flask-Login)
+- Flask-Login carga el usuario en cada request del panel y en cada llamada AJAX;
+  con esta caché solo se consulta la BD una vez cada ADMIN_USER_CACHE_TTL segundos
+  por usuario y worker
+- Se guardan solo los campos esenciales (id, username, is_active y una huella del
+  password) en un objeto liviano, no una instancia ORM ligada a una sesión de SQLAlchemy
+- El id de sesión lleva la huella del password (session_token): cambiar el password
+  cierra las sesiones abiertas con el anterior
+- Al desactivar, borrar o cambiar el password o el username de un usuario (eventos ORM)
+  se invalida en el proceso que hizo el cambio y se publica en cache_invalidations; los
+  demás workers lo aplican en a lo sumo CACHE_INVALIDATION_POLL segundos (ver cache_admin)
+- Si la BD falla al refrescar una entrada vencida, el error se propaga: nunca se sirve
+  un usuario vencido (podría estar desactivado)
+"""
+
+import os
+import time
+import hashlib
+import threading
+from datetime import datetime
+from typing import Optional
+
+ADMIN_USER_CACHE_TTL = float(os.environ.get('ADMIN_USER_CACHE_TTL', 60))
+
+# tier de las invalidaciones de usuarios en cache_invalidations
+ADMIN_USER_TIER = 'admin_users'
+
+# Cambios que invalidan la sesión cacheada (last_login se actualiza en cada login)
+SESSION_FIELDS = ('username', 'is_active', 'password_hash')
+
+
+def password_fingerprint(password_hash: str) -> str:
+    """Huella corta del hash del password (cambia con cada cambio de password)"""
+    return hashlib.sha256((password_hash or '').encode('utf-8')).hexdigest()[:16]
+
+
+def session_token(user_id: int, password_hash: str) -> str:
+    """Id de sesión de Flask-Login: '<id>.<huella del password>'"""
+    return f"{user_id}.{password_fingerprint(password_hash)}"
+
+
+class SessionUser:
+    """Usuario autenticado para Flask-Login sin depender de la sesión de SQLAlchemy"""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id: int, username: str, is_active: bool, fingerprint: str):
+        self.id = user_id
+        self.username = username
+        self.is_active = bool(is_active)
+        self.fingerprint = fingerprint
+
+    def get_id(self):
+        return f"{self.id}.{self.fingerprint}"
+
+    def __repr__(self):
+        return f'<SessionUser {self.username}>'
+
+
+class AdminUserCache:
+    """{user_id: (cargado_en monotonic, SessionUser)} por worker"""
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def invalidate(self, user_id=None):
+        """Olvidar un usuario (o todos)"""
+        with self.lock:
+            if user_id is None:
+                self.entries = {}
+            else:
+                self.entries.pop(int(user_id), None)
+
+    def load(self, token) -> Optional[SessionUser]:
+        """
+        Usuario de un id de sesión (session_token), o None si no existe o el password
+        cambió. Ids sin huella (sesiones anteriores) se rechazan: hay que volver a entrar.
+        """
+        try:
+            user_id, fingerprint = str(token).split('.', 1)
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        # Cambios publicados por otros workers (desactivaciones, passwords)
+        from app.services.cache_admin import invalidation_sync
+        invalidation_sync.sync()
+
+        entry = self.entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            user = entry[1]
+        else:
+            user = self._fetch(user_id)
+            with self.lock:
+                if user is None:
+                    self.entries.pop(user_id, None)
+                else:
+                    self.entries[user_id] = (time.monotonic(), user)
+
+        if user is None or user.fingerprint != fingerprint:
+            return None
+        return user
+
+    @staticmethod
+    def _fetch(user_id) -> Optional[SessionUser]:
+        from app import db
+        from app.models import AdminUser
+
+        row = db.session.query(AdminUser.id, AdminUser.username, AdminUser.is_active,
+                               AdminUser.password_hash) \
+            .filter(AdminUser.id == user_id).first()
+        if row is None:
+            return None
+        return SessionUser(row.id, row.username, row.is_active, password_fingerprint(row.password_hash))
+
+
+admin_user_cache = AdminUserCache(ttl=ADMIN_USER_CACHE_TTL)
+
+
+def _publish(connection, user_id):
+    """Invalidar en este worker y publicar para los demás (en la transacción del cambio)"""
+    from app.models import CacheInvalidation
+
+    admin_user_cache.invalidate(user_id)
+    connection.execute(CacheInvalidation.__table__.insert().values(
+        tier=ADMIN_USER_TIER, kind='key', value=str(user_id), created_at=datetime.utcnow()
+    ))
+
+
+def _on_admin_user_update(mapper, connection, target):
+    from sqlalchemy import inspect
+
+    # Solo cambios que afectan la sesión (no last_login, que cambia en cada login)
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in SESSION_FIELDS):
+        _publish(connection, target.id)
+
+
+def _on_admin_user_delete(mapper, connection, target):
+    _publish(connection, target.id)
+
+
+def init_user_cache(login_manager):
+    """Registrar el user_loader cacheado y la invalidación por eventos ORM"""
+    from sqlalchemy import event
+    from app.models import AdminUser
+
+    login_manager.user_loader(admin_user_cache.load)
+
+    for event_name, handler in (('after_update', _on_admin_user_update),
+                                ('after_delete', _on_admin_user_delete)):
+        if not event.contains(AdminUser, event_name, handler):
+            event.listen(AdminUser, event_name, handler)
@@ -0,0 +1,218 @@
+# app/services/zone_index.py
+"""
+Índice espacial en memoria para zonas de envío poligonales
+- Zonas definidas por polígonos (comunas, formas personalizadas) en vez de rangos de km
+- Búsqueda punto-en-polígono sobre una grilla de bounding boxes (microsegundos por consulta)
+- Regla par-impar sobre todos los anillos de la zona: un punto dentro de un agujero
+  (anillo interior de GeoJSON) queda fuera, y una isla dentro del agujero vuelve a estar dentro
+"""
+
+import json
+import math
+import logging
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+# Resultado liviano de una búsqueda (no depende de la sesión de SQLAlchemy)
+PolygonZoneMatch = namedtuple('PolygonZoneMatch', ['id', 'name', 'price_clp', 'origin_id'])
+
+
+def parse_polygon(raw) -> List[List[tuple]]:
+    """
+    Normalizar un polígono a lista de anillos [(lat, lng), ...]
+
+    Acepta:
+    - JSON string o lista
+    - Polígono simple: [[lat, lng], [lat, lng], ...]
+    - Lista de anillos: [[[lat, lng], ...], [[lat, lng], ...]] (comunas con islas, o
+      exterior + agujeros como en GeoJSON)
+    - Multipolígono GeoJSON: [[[[lat, lng], ...], ...], ...] (se aplana a anillos)
+
+    Los anillos se evalúan con la regla par-impar (ver point_in_rings).
+
+    Raises:
+        ValueError: Si el formato no es válido o algún anillo tiene menos de 3 puntos
+    """
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("El polígono debe ser una lista de puntos [lat, lng]")
+
+    # Detectar lista de anillos (el primer elemento es una lista de puntos) y multipolígono
+    if isinstance(raw[0], list) and raw[0] and isinstance(raw[0][0], list):
+        if raw[0][0] and isinstance(raw[0][0][0], list):
+            parts = [ring for polygon in raw for ring in polygon]
+        else:
+            parts = raw
+    else:
+        parts = [raw]
+
+    rings = []
+    for part in parts:
+        ring = []
+        for point in part:
+            if not isinstance(point, (list, tuple)) or len(point) != 2:
+                raise ValueError("Cada punto del polígono debe ser [lat, lng]")
+            lat, lng = float(point[0]), float(point[1])
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValueError(f"Coordenadas fuera de rango: {lat}, {lng}")
+            ring.append((lat, lng))
+
+        # Quitar punto de cierre duplicado (GeoJSON repite el primero al final)
+        if len(ring) > 1 and ring[0] == ring[-1]:
+            ring.pop()
+
+        if len(ring) < 3:
+            raise ValueError("Cada polígono debe tener al menos 3 puntos")
+
+        rings.append(ring)
+
+    return rings
+
+
+def point_in_ring(lat: float, lng: float, ring: List[tuple]) -> bool:
+    """Test punto-en-polígono por ray casting (regla par-impar)"""
+    inside = False
+    j = len(ring) - 1
+
+    for i in range(len(ring)):
+        lat_i, lng_i = ring[i]
+        lat_j, lng_j = ring[j]
+
+        if (lng_i > lng) != (lng_j > lng):
+            cross_lat = (lat_j - lat_i) * (lng - lng_i) / (lng_j - lng_i) + lat_i
+            if lat < cross_lat:
+                inside = not inside
+        j = i
+
+    return inside
+
+
+def point_in_rings(lat: float, lng: float, rings: List[tuple]) -> bool:
+    """
+    Regla par-impar sobre varios anillos [(bbox, ring)]: dentro si el punto está en
+    un número impar de ellos (exterior sí, agujero no, isla dentro del agujero sí)
+    """
+    inside = False
+    for bbox, ring in rings:
+        if bbox[0] <= lat <= bbox[2] and bbox[1] <= lng <= bbox[3] and point_in_ring(lat, lng, ring):
+            inside = not inside
+    return inside
+
+
+def ring_bbox(ring: List[tuple]) -> tuple:
+    lats = [p[0] for p in ring]
+    lngs = [p[1] for p in ring]
+    return (min(lats), min(lngs), max(lats), max(lngs))
+
+
+def rings_area(rings: List[List[tuple]]) -> float:
+    """Área cubierta por la regla par-impar: los anillos dentro de un número impar de otros restan"""
+    area = 0.0
+    for i, ring in enumerate(rings):
+        lat, lng = ring[0]
+        depth = sum(1 for j, other in enumerate(rings) if j != i and point_in_ring(lat, lng, other))
+        area += -ring_area(ring) if depth % 2 else ring_area(ring)
+    return abs(area)
+
+
+def ring_area(ring: List[tuple]) -> float:
+    """Área aproximada del anillo en grados² (fórmula del shoelace)"""
+    area = 0.0
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        area += (ring[j][1] + ring[i][1]) * (ring[j][0] - ring[i][0])
+        j = i
+    return abs(area) / 2.0
+
+
+class PolygonZoneIndex:
+    """
+    Grilla uniforme de bounding boxes para zonas poligonales
+
+    Cada zona se registra en las celdas que cubren los bounding boxes de sus anillos.
+    Una consulta revisa solo los candidatos de su celda: primero bbox, luego ray
+    casting par-impar sobre los anillos de la zona.
+    Si un punto cae en varias zonas, gana la más específica (menor área).
+    """
+
+    # Zonas que cubren más celdas que esto se revisan linealmente (evita grillas enormes)
+    MAX_CELLS_PER_ZONE = 10000
+
+    def __init__(self, cell_size_deg: float = 0.01):
+        self.cell_size = cell_size_deg  # ~1.1 km en latitud
+        self.cells = {}        # {(row, col): [entry, ...]}
+        self.large_entries = []
+        self.zone_count = 0
+
+    def _cell(self, lat: float, lng: float) -> tuple:
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def build(self, zones: List[Dict]):
+        """
+        Construir el índice
+
+        Args:
+            zones (List[Dict]): [{'id': int, 'name': str, 'price_clp': int, 'polygon': ...,
+                                  'origin_id': int|None}]
+        """
+        self.cells = {}
+        self.large_entries = []
+        self.zone_count = 0
+
+        for zone in zones:
+            try:
+                rings = parse_polygon(zone['polygon'])
+            except (ValueError, TypeError) as e:
+                logging.error(f"Zona poligonal {zone.get('id')} inválida, se omite: {e}")
+                continue
+
+            match = PolygonZoneMatch(zone['id'], zone.get('name'), zone['price_clp'], zone.get('origin_id'))
+            self.zone_count += 1
+
+            boxed = [(ring_bbox(ring), ring) for ring in rings]
+            bbox = (min(b[0] for b, _ in boxed), min(b[1] for b, _ in boxed),
+                    max(b[2] for b, _ in boxed), max(b[3] for b, _ in boxed))
+            entry = (bbox, boxed, rings_area(rings), match)
+
+            cells = set()
+            for (south, west, north, east), _ in boxed:
+                row_min, col_min = self._cell(south, west)
+                row_max, col_max = self._cell(north, east)
+                if len(cells) + (row_max - row_min + 1) * (col_max - col_min + 1) > self.MAX_CELLS_PER_ZONE:
+                    cells = None
+                    break
+                cells.update((row, col) for row in range(row_min, row_max + 1)
+                             for col in range(col_min, col_max + 1))
+
+            if cells is None:
+                self.large_entries.append(entry)
+                continue
+            for cell in cells:
+                self.cells.setdefault(cell, []).append(entry)
+
+    def find(self, lat: float, lng: float, origin_id: Optional[int] = None) -> Optional[PolygonZoneMatch]:
+        """
+        Buscar la zona poligonal que contiene el punto (None si ninguna)
+
+        Con origin_id solo se consideran zonas de ese origen o compartidas (origin_id NULL)
+        """
+        candidates = self.cells.get(self._cell(lat, lng), [])
+        if self.large_entries:
+            candidates = candidates + self.large_entries
+
+        best = None
+        best_area = None
+
+        for bbox, rings, area, match in candidates:
+            if not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lng <= bbox[3]):
+                continue
+            if match.origin_id is not None and match.origin_id != origin_id:
+                continue
+            if best_area is not None and area >= best_area:
+                continue
+            if point_in_rings(lat, lng, rings):
+                best, best_area = match, area
+
+        return best
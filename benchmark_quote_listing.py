@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización de listados de cotizaciones
+
+Compara, para 50, 1.000 y 10.000 filas (SQLite temporal con datos sintéticos):
+- lazy_to_dict:  ShippingQuote.query + to_dict(include_router_response=True)
+                 (relaciones lazy, is_available_now() y json.loads por fila: el
+                 comportamiento anterior de los listados)
+- joinedload:    relaciones con joinedload + to_dict() sin router_response
+- projection:    columnas proyectadas + serialize_quote_rows (lo que usa /admin/api/quotes)
+
+Mide tiempo (consulta + serialización + JSON de la respuesta), consultas SQL y bytes.
+
+Uso:
+    python benchmark_quote_listing.py
+    python benchmark_quote_listing.py --sizes 50 1000 10000 --runs 5 --json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_SIZES = (50, 1000, 10000)
+
+
+def fake_router_response(rng, lat, lng, distance_km):
+    """Respuesta de RouterService de tamaño realista (~1,5 KB)"""
+    return json.dumps({
+        'success': True,
+        'origin': {'formatted_address': 'Bodega Central, Santiago, Chile', 'lat': -33.4372, 'lng': -70.6506},
+        'destination': {'formatted_address': f'Calle {rng.randint(1, 9999)}, Santiago, Chile',
+                        'lat': lat, 'lng': lng, 'location_type': 'ROOFTOP',
+                        'types': ['street_address'], 'place_id': f'ChIJ{rng.getrandbits(64):016x}'},
+        'route': {'distance_km': distance_km, 'distance_text': f'{distance_km:.1f} km',
+                  'duration_minutes': int(distance_km * 4), 'duration_text': f'{int(distance_km * 4)} min'},
+        'origins': [
+            {'id': i, 'name': f'Bodega {i}', 'lat': -33.4 - i / 100, 'lng': -70.6 - i / 100,
+             'route': {'distance_km': distance_km + i, 'duration_minutes': int(distance_km * 4) + i}}
+            for i in range(1, 4)
+        ],
+        'cache': {'geocode': 'miss', 'route': 'miss'},
+    })
+
+
+def seed(db, count):
+    from app.models import ShippingMethod, ShippingZone, ShippingQuote
+    from datetime import time as dt_time
+
+    methods = [
+        ShippingMethod(name=name, code=code, description=name, start_time=dt_time(0, 0),
+                       end_time=dt_time(23, 59), max_km=7.0)
+        for name, code in (('Envío Hoy', 'envio_hoy'), ('Envío Programado', 'programado'))
+    ]
+    zones = [ShippingZone(min_km=float(km), max_km=float(km + 1), price_clp=3500 + km * 1000) for km in range(7)]
+    db.session.add_all(methods + zones)
+    db.session.commit()
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        distance_km = rng.uniform(0.5, 6.9)
+        lat, lng = -33.45 + rng.uniform(-0.1, 0.1), -70.65 + rng.uniform(-0.1, 0.1)
+        zone = zones[int(distance_km)]
+        rows.append({
+            'session_id': f'cart-{rng.randint(1, count // 3 + 1)}',
+            'origin_address': 'Bodega Central, Santiago, Chile',
+            'destination_address': f'Calle {rng.randint(1, 9999)}, Santiago, Chile',
+            'destination_lat': lat, 'destination_lng': lng,
+            'distance_km': distance_km, 'duration_minutes': int(distance_km * 4),
+            'shipping_method_id': methods[i % 2].id, 'zone_id': zone.id,
+            'price_clp': zone.price_clp, 'is_available': True,
+            'router_response': fake_router_response(rng, lat, lng, distance_km),
+            'created_at': now - timedelta(seconds=i * 7),
+        })
+    db.session.execute(ShippingQuote.__table__.insert(), rows)
+    db.session.commit()
+
+
+def list_lazy_to_dict(db, size):
+    from app.models import ShippingQuote
+    quotes = (ShippingQuote.query
+              .order_by(ShippingQuote.created_at.desc(), ShippingQuote.id.desc())
+              .limit(size).all())
+    return [quote.to_dict(include_router_response=True) for quote in quotes]
+
+
+def list_joinedload(db, size):
+    from sqlalchemy.orm import joinedload
+    from app.models import ShippingQuote
+    quotes = (ShippingQuote.query
+              .options(joinedload(ShippingQuote.shipping_method), joinedload(ShippingQuote.zone))
+              .order_by(ShippingQuote.created_at.desc(), ShippingQuote.id.desc())
+              .limit(size).all())
+    return [quote.to_dict() for quote in quotes]
+
+
+def list_projection(db, size):
+    from app.models import ShippingQuote
+    from app.routes.shipping import QUOTE_LIST_COLUMNS, serialize_quote_rows
+    rows = (db.session.query(*QUOTE_LIST_COLUMNS)
+            .order_by(ShippingQuote.created_at.desc(), ShippingQuote.id.desc())
+            .limit(size).all())
+    return serialize_quote_rows(rows)
+
+
+STRATEGIES = {
+    'lazy_to_dict': list_lazy_to_dict,
+    'joinedload': list_joinedload,
+    'projection': list_projection,
+}
+
+
+def measure(app, db, strategy, size, runs):
+    from sqlalchemy import event
+
+    queries = {'count': 0}
+
+    def count_query(*args, **kwargs):
+        queries['count'] += 1
+
+    timings = []
+    body_bytes = 0
+    query_count = 0
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        for _ in range(runs):
+            # Sesión nueva por corrida: sin identity map de la anterior
+            db.session.remove()
+            queries['count'] = 0
+            start = time.perf_counter()
+            items = STRATEGIES[strategy](db, size)
+            body = app.json.response({'success': True, 'quotes': items}).get_data()
+            timings.append((time.perf_counter() - start) * 1000)
+            body_bytes = len(body)
+            query_count = queries['count']
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+
+    return {
+        'median_ms': round(statistics.median(timings), 2),
+        'min_ms': round(min(timings), 2),
+        'queries': query_count,
+        'bytes': body_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de serialización de listados de cotizaciones')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Filas por listado')
+    parser.add_argument('--runs', type=int, default=5, help='Repeticiones por medición')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultado en JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_listing_') as tmp:
+        os.environ.update({
+            'ENVIRONMENT': 'testing',
+            'DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'LOG_LEVEL': 'warning',
+        })
+        os.environ.pop('TRAFFIC_CAPTURE_FILE', None)
+
+        from app import create_app, db
+        app = create_app('testing')
+
+        results = {}
+        with app.app_context():
+            db.create_all()
+            seed(db, max(args.sizes))
+
+            for size in args.sizes:
+                results[size] = {
+                    strategy: measure(app, db, strategy, size, args.runs)
+                    for strategy in STRATEGIES
+                }
+            db.session.remove()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n" + "=" * 76)
+    print(f"  LISTADO DE COTIZACIONES ({args.runs} repeticiones, mediana)")
+    print("=" * 76)
+    print(f"{'filas':>7}  {'estrategia':14}{'tiempo':>12}{'consultas':>12}{'KB':>10}{'vs lazy':>12}")
+    for size, by_strategy in results.items():
+        baseline = by_strategy['lazy_to_dict']['median_ms']
+        for strategy, values in by_strategy.items():
+            speedup = baseline / values['median_ms'] if values['median_ms'] else 0
+            print(f"{size:>7}  {strategy:14}{values['median_ms']:>10.2f}ms{values['queries']:>12}"
+                  f"{values['bytes'] / 1024:>10.1f}{speedup:>11.1f}×")
+        print("-" * 76)
+    print()
+
+
+if __name__ == '__main__':
+    main()
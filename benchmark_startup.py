@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark de tiempo de arranque
+Mide en procesos nuevos (sin caché de imports) cuánto tarda:
+- import_app:        `import app`
+- create_app:        create_app() completo (servicio web)
+- create_app_cli:    create_app(with_routes=False) (scripts de administración)
+- first_request:     primer callback de Jumpseller (incluye crear RouterService), contra
+                     fake_google_maps en proceso
+- gunicorn_boot:     desde lanzar gunicorn hasta el primer 200 (opcional, --gunicorn)
+
+Uso:
+    python benchmark_startup.py --runs 5
+    python benchmark_startup.py --runs 5 --gunicorn --json > startup.json
+    python benchmark_startup.py --importtime      # módulos más lentos de importar
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Código que corre en el proceso hijo; imprime {metric: ms} como última línea
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - start) * 1000
+metrics = {"import_app": import_ms}
+mode = sys.argv[1]
+
+if mode == "cli":
+    t = time.perf_counter()
+    app.create_app("testing", with_routes=False)
+    metrics["create_app_cli"] = (time.perf_counter() - t) * 1000
+else:
+    t = time.perf_counter()
+    flask_app = app.create_app("testing")
+    metrics["create_app"] = (time.perf_counter() - t) * 1000
+
+    if mode == "first_request":
+        import fake_google_maps
+        from init_db import seed_default_data
+        server, url = fake_google_maps.start_server(fake_google_maps.FakeGoogleMaps())
+        import os
+        os.environ["GOOGLE_MAPS_BASE_URL"] = url
+        with flask_app.app_context():
+            app.db.create_all()
+            seed_default_data()
+        client = flask_app.test_client()
+        payload = {"request": {"cart_id": "bench", "to": {"address": "Av. Providencia", "street_number": "1234",
+                   "city": "Providencia", "region_name": "Región Metropolitana"}}}
+        t = time.perf_counter()
+        client.post("/shipping/api/jumpseller/callback", json=payload)
+        metrics["first_request"] = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        client.post("/shipping/api/jumpseller/callback", json=payload)
+        metrics["second_request"] = (time.perf_counter() - t) * 1000
+
+print(json.dumps(metrics))
+'''
+
+# Métricas que se toman de cada modo del probe
+PROBE_METRICS = {
+    'web': ('import_app', 'create_app'),
+    'cli': ('create_app_cli',),
+    'first_request': ('first_request', 'second_request'),
+}
+
+
+def child_env(database_url):
+    env = dict(os.environ)
+    env.update({
+        'ENVIRONMENT': 'testing',
+        'DATABASE_URL': database_url,
+        'LOG_LEVEL': 'warning',
+    })
+    # Sin API key: el arranque no debe necesitarla
+    env.pop('GOOGLE_MAPS_API_KEY', None)
+    env.pop('GOOGLE_MAPS_BASE_URL', None)
+    env.pop('TRAFFIC_CAPTURE_FILE', None)
+    return env
+
+
+def run_probe(mode, database_url):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, mode],
+        cwd=ROOT, env=child_env(database_url), capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Probe '{mode}' falló:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def gunicorn_boot(database_url, workers=2):
+    """Milisegundos desde lanzar gunicorn hasta que un worker responde 200"""
+    import urllib.request
+    import urllib.error
+
+    port = free_port()
+    env = child_env(database_url)
+    env['GUNICORN_WORKERS'] = str(workers)
+    env['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='bench_prom_')
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', '-b', f'127.0.0.1:{port}', 'run:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = start + 60
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/shipping/api/methods', timeout=2) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.02)
+        raise RuntimeError('gunicorn no respondió en 60 s')
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def print_importtime(database_url, top=20):
+    """Módulos con mayor tiempo acumulado de import al crear la app"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app("testing")'],
+        cwd=ROOT, env=child_env(database_url), capture_output=True, text=True, timeout=120
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    print(f"{'acumulado ms':>14}{'propio ms':>12}  módulo")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>12.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque de la app')
+    parser.add_argument('--runs', type=int, default=5, help='Repeticiones por medición')
+    parser.add_argument('--gunicorn', action='store_true', help='Medir también el arranque de gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='Workers de gunicorn')
+    parser.add_argument('--importtime', action='store_true', help='Mostrar los imports más lentos y salir')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultado en JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        if args.importtime:
+            print_importtime(database_url)
+            return
+
+        samples = {}
+        for _ in range(args.runs):
+            for mode, wanted in PROBE_METRICS.items():
+                for metric, value in run_probe(mode, database_url).items():
+                    if metric in wanted:
+                        samples.setdefault(metric, []).append(value)
+            if args.gunicorn:
+                samples.setdefault('gunicorn_boot', []).append(gunicorn_boot(database_url, args.workers))
+
+    summary = {
+        metric: {
+            'median_ms': round(statistics.median(values), 1),
+            'min_ms': round(min(values), 1),
+            'max_ms': round(max(values), 1),
+        }
+        for metric, values in samples.items()
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print("\n" + "=" * 60)
+    print(f"  ARRANQUE ({args.runs} repeticiones, procesos nuevos)")
+    print("=" * 60)
+    print(f"{'medición':22}{'mediana':>12}{'mín':>12}{'máx':>12}")
+    for metric, values in summary.items():
+        print(f"{metric:22}{values['median_ms']:>10.1f}ms{values['min_ms']:>10.1f}ms{values['max_ms']:>10.1f}ms")
+    print("=" * 60 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,17 @@ from urllib.parse import quote_plus
 # Cargar variables de entorno
 load_dotenv()
 
+
+def replica_binds(default_url=None):
+    """
+    Bind 'replica' de SQLAlchemy (solo lectura: panel admin y analítica)
+
+    DATABASE_REPLICA_URL tiene prioridad; sin réplica configurada retorna {}
+    """
+    url = os.environ.get('DATABASE_REPLICA_URL') or default_url
+    return {'replica': url} if url else {}
+
+
 class Config:
     """Configuración base"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-change-this-in-production'
@@ -15,6 +26,13 @@ class Config:
     SESSION_COOKIE_SECURE = False
     SESSION_COOKIE_HTTPONLY = True
     PERMANENT_SESSION_LIFETIME = 3600
+
+    # Réplica de lectura: sobre este atraso (segundos) se vuelve a leer del primario
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 10))
+
+    # Aplicar migraciones pendientes al arrancar (false: solo con python migrate.py upgrade)
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'true').lower() != 'false'
     
     # Pool de conexiones optimizado
     SQLALCHEMY_ENGINE_OPTIONS = {
@@ -47,6 +65,12 @@ class DevelopmentConfig(Config):
     else:
         SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{db_user}@{db_host}/{db_name}"
 
+    # Réplica de lectura opcional (mismo usuario y base, otro host)
+    db_replica_host = os.environ.get('DB_REPLICA_HOST')
+    SQLALCHEMY_BINDS = replica_binds(
+        SQLALCHEMY_DATABASE_URI.replace(f"@{db_host}/", f"@{db_replica_host}/", 1) if db_replica_host else None
+    )
+
 class ProductionConfig(Config):
     """Configuración para producción"""
     DEBUG = False
@@ -65,9 +89,29 @@ class ProductionConfig(Config):
     else:
         SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{db_user}@{db_host}/{db_name}"
 
+    # Réplica de lectura opcional (mismo usuario y base, otro host)
+    db_replica_host = os.environ.get('DB_REPLICA_HOST')
+    SQLALCHEMY_BINDS = replica_binds(
+        SQLALCHEMY_DATABASE_URI.replace(f"@{db_host}/", f"@{db_replica_host}/", 1) if db_replica_host else None
+    )
+
+class TestingConfig(Config):
+    """Configuración para pruebas y benchmarks offline (SQLite por defecto)"""
+    DEBUG = False
+    TESTING = True
+    ENVIRONMENT = 'testing'
+
+    # DATABASE_URL permite apuntar a un MySQL local (mysql+pymysql://...)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///shipping_test.db'
+    SQLALCHEMY_BINDS = replica_binds()
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True
+    }
+
 # Diccionario de configuraciones
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
@@ -9,7 +9,7 @@ load_dotenv()  # Cargar variables de entorno
 from app import create_app, db
 from app.models import AdminUser
 
-app = create_app()
+app = create_app(with_routes=False)
 
 with app.app_context():
     print("Creando tabla admin_users...")
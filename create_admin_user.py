@@ -12,7 +12,7 @@ from app.models import AdminUser
 import getpass
 import sys
 
-app = create_app()
+app = create_app(with_routes=False)
 
 def create_admin():
     """Crear un usuario administrador"""
@@ -11,7 +11,7 @@ load_dotenv()
 from app import create_app, db
 from app.models import AdminUser
 
-app = create_app()
+app = create_app(with_routes=False)
 
 with app.app_context():
     # Verificar si ya existe
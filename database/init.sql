@@ -1,5 +1,9 @@
 -- Script de inicialización de base de datos
 -- Che Shipping Service
+-- Esquema base, previo a las migraciones versionadas (app/migrations.py): al arrancar,
+-- la app (o python migrate.py upgrade) agrega las columnas y tablas posteriores.
+-- Si la app arrancó antes sobre la base vacía, las tablas ya existen y este script
+-- solo inserta los datos por defecto.
 
 -- Crear base de datos
 CREATE DATABASE IF NOT EXISTS shipping_chile CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Convertir el historial de shipping_quotes al formato deduplicado (QUOTE_DEDUP=true)
+
+Agrupa las filas con la misma sesión + destino + método en una sola, con hit_count = suma
+del grupo, created_at = la primera y last_seen_at = la más reciente, y elimina el resto.
+Filas sin sesión no se tocan. Es idempotente.
+
+Puede correr con el servicio en modo dedup: cada bloque toma con SELECT ... FOR UPDATE las
+filas que ya tienen la dedup_key del grupo (en MySQL el lock de la clave única también
+bloquea un INSERT nuevo de esa clave), y ShippingQuote.upsert espera a que el bloque
+termine. Si existe la fila con la clave, el grupo se suma a ella con un incremento relativo
+(no se pierden los hits que agregue el servicio); si no, la fila más antigua del grupo
+recibe la clave. Si aun así un INSERT concurrente gana la clave (motores sin ese lock),
+el bloque se revierte y se reintenta.
+
+Uso:
+    python dedup_quotes.py --dry-run    # solo contar
+    python dedup_quotes.py              # aplicar (en bloques de CHUNK_SIZE filas)
+
+Recomendado fuera de horario punta; en MySQL el espacio se recupera con
+OPTIMIZE TABLE shipping_quotes.
+"""
+
+import argparse
+import sys
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from app.models import ShippingQuote
+
+CHUNK_SIZE = 5000
+
+# Reintentos de un bloque si un INSERT concurrente gana una clave
+MAX_RETRIES = 3
+
+
+def group_rows(rows):
+    """Filas sin dedup_key de un bloque -> {dedup_key: {ids, hits, created_at, last_seen_at}}"""
+    groups = {}
+    for row in rows:
+        key = ShippingQuote.make_dedup_key(row.session_id, row.destination_address, row.shipping_method_id)
+        seen_at = row.last_seen_at or row.created_at
+        group = groups.get(key)
+        if group is None:
+            groups[key] = {'ids': [row.id], 'hits': row.hit_count or 1,
+                           'created_at': row.created_at, 'last_seen_at': seen_at}
+            continue
+        group['ids'].append(row.id)
+        group['hits'] += row.hit_count or 1
+        group['created_at'] = min(filter(None, (group['created_at'], row.created_at)), default=None)
+        group['last_seen_at'] = max(filter(None, (group['last_seen_at'], seen_at)), default=None)
+    return groups
+
+
+def merge_groups(conn, groups):
+    """
+    Fusionar los grupos de un bloque con las filas que ya tienen su dedup_key
+
+    Returns:
+        int: filas eliminadas
+    """
+    table = ShippingQuote.__table__
+    # Bloquea los upserts del servicio sobre estas claves hasta el commit
+    keyed = {row.dedup_key: row for row in conn.execute(
+        db.select(table.c.id, table.c.dedup_key, table.c.created_at, table.c.last_seen_at)
+        .where(table.c.dedup_key.in_(list(groups))).with_for_update()
+    )}
+
+    deleted = 0
+    for key, group in groups.items():
+        current = keyed.get(key)
+        if current is None:
+            # La fila más antigua del grupo recibe la clave y los hits de las demás
+            holder, duplicates = group['ids'][0], group['ids'][1:]
+            values = {'dedup_key': key, 'hit_count': group['hits'],
+                      'created_at': group['created_at'], 'last_seen_at': group['last_seen_at']}
+        else:
+            holder, duplicates = current.id, group['ids']
+            values = {
+                'hit_count': table.c.hit_count + group['hits'],
+                'created_at': min(filter(None, (current.created_at, group['created_at'])), default=None),
+                'last_seen_at': max(filter(None, (current.last_seen_at, group['last_seen_at'])), default=None),
+            }
+
+        deleted += len(duplicates)
+        if duplicates:
+            conn.execute(table.delete().where(table.c.id.in_(duplicates)))
+        conn.execute(table.update().where(table.c.id == holder).values(**values))
+    return deleted
+
+
+def dedup(dry_run=False):
+    """Retorna (filas leídas, filas eliminadas, grupos)"""
+    from sqlalchemy.exc import IntegrityError
+
+    scanned = deleted = 0
+    keys = set()
+    last_id = 0
+
+    while True:
+        rows = db.session.query(
+            ShippingQuote.id,
+            ShippingQuote.session_id,
+            ShippingQuote.destination_address,
+            ShippingQuote.shipping_method_id,
+            ShippingQuote.hit_count,
+            ShippingQuote.created_at,
+            ShippingQuote.last_seen_at,
+        ).filter(
+            ShippingQuote.id > last_id,
+            ShippingQuote.dedup_key.is_(None),
+            ShippingQuote.session_id.isnot(None),
+            ShippingQuote.session_id != '',
+        ).order_by(ShippingQuote.id).limit(CHUNK_SIZE).all()
+        db.session.rollback()
+
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+        groups = group_rows(rows)
+
+        if dry_run:
+            # Sin escribir: las claves de bloques anteriores cuentan como ya asignadas
+            keyed = {key for key, in db.session.query(ShippingQuote.dedup_key)
+                     .filter(ShippingQuote.dedup_key.in_(list(groups)))} | keys
+            db.session.rollback()
+            deleted += sum(len(group['ids']) - (key not in keyed) for key, group in groups.items())
+            keys.update(groups)
+            continue
+        keys.update(groups)
+
+        for attempt in range(MAX_RETRIES):
+            try:
+                with db.engine.begin() as conn:
+                    deleted += merge_groups(conn, groups)
+                break
+            except IntegrityError:
+                # Un INSERT del servicio ganó una clave del bloque: ahora existe, se suma a ella
+                if attempt == MAX_RETRIES - 1:
+                    raise
+
+        print(f"  {scanned} filas leídas, {deleted} duplicadas eliminadas...")
+
+    return scanned, deleted, len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deduplicar historial de cotizaciones')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin modificar')
+    args = parser.parse_args()
+
+    app = create_app(with_routes=False)
+
+    with app.app_context():
+        scanned, deleted, groups = dedup(dry_run=args.dry_run)
+
+    action = 'se eliminarían' if args.dry_run else 'eliminadas'
+    print(f"✓ {scanned} filas con sesión, {groups} grupos, {deleted} duplicadas {action}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita Google Maps (Geocoding y Distance Matrix) para pruebas offline
+- Respuestas sintéticas deterministas: coordenadas por comuna + desplazamiento por hash,
+  distancia en calle ≈ haversine × 1.3 y velocidad promedio de 25 km/h
+- Inyección de latencia (fixed, uniform, normal, lognormal) y de errores por API
+- Grabación de sesiones reales (--record, hace de proxy a Google) y reproducción (--replay)
+
+La app se apunta al servidor con GOOGLE_MAPS_BASE_URL (ver RouterService):
+    python fake_google_maps.py --port 8099 --geocode-latency lognormal:80,0.4 --error-rate 0.01
+    GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8099 python run.py
+
+Grabar y reproducir (al grabar, la app usa su API key real y el servidor hace de proxy):
+    python fake_google_maps.py --record sesiones/ --upstream https://maps.googleapis.com
+    GOOGLE_MAPS_API_KEY=AIza... GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8099 python run.py
+    python fake_google_maps.py --replay sesiones/ --replay-fallback synthetic
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+GEOCODE_PATH = '/maps/api/geocode/json'
+DISTANCE_MATRIX_PATH = '/maps/api/distancematrix/json'
+API_BY_PATH = {GEOCODE_PATH: 'geocode', DISTANCE_MATRIX_PATH: 'distance_matrix'}
+
+# Parámetros que no forman parte de la identidad de un request grabado
+AUTH_PARAMS = ('key', 'client', 'signature', 'channel')
+
+# Comunas de cobertura (centroides aproximados)
+COMUNAS_RM = {
+    'Providencia': (-33.4314, -70.6093),
+    'Ñuñoa': (-33.4569, -70.5976),
+    'Las Condes': (-33.4089, -70.5672),
+    'Santiago': (-33.4489, -70.6693),
+    'Vitacura': (-33.3906, -70.5728),
+    'La Reina': (-33.4452, -70.5410),
+    'Macul': (-33.4859, -70.5993),
+    'San Miguel': (-33.4968, -70.6513),
+}
+
+# Ciudades fuera de cobertura (distancias >> max_km)
+OUT_OF_AREA = {
+    'Viña del Mar': ('Región de Valparaíso', (-33.0245, -71.5518)),
+    'Concepción': ('Región del Biobío', (-36.8270, -73.0503)),
+    'Rancagua': ("Región del Libertador Gral. Bernardo O'Higgins", (-34.1708, -70.7444)),
+    'Puerto Montt': ('Región de Los Lagos', (-41.4693, -72.9424)),
+}
+
+# Velocidad promedio en ciudad para la duración sintética
+SYNTHETIC_SPEED_KMH = 25.0
+
+
+# ========================================
+# RESPUESTAS SINTÉTICAS
+# ========================================
+
+def synthetic_location(address):
+    """Coordenadas deterministas para una dirección: centroide de la comuna + desplazamiento por hash"""
+    normalized = ' '.join(address.lower().split())
+    digest = hashlib.sha1(normalized.encode('utf-8')).digest()
+    jitter_lat = (digest[0] / 255 - 0.5) * 0.02
+    jitter_lng = (digest[1] / 255 - 0.5) * 0.02
+
+    for city, (lat, lng) in COMUNAS_RM.items():
+        if city.lower() in normalized:
+            return lat + jitter_lat, lng + jitter_lng
+    for city, (_, (lat, lng)) in OUT_OF_AREA.items():
+        if city.lower() in normalized:
+            return lat + jitter_lat, lng + jitter_lng
+    return -33.45 + jitter_lat, -70.65 + jitter_lng
+
+
+def road_km(lat1, lng1, lat2, lng2):
+    """Distancia haversine × 1.3 como aproximación de distancia en calle"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2 +
+         math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 6371.0 * 2 * math.asin(math.sqrt(a)) * 1.3
+
+
+def synthetic_geocode(address):
+    """Lista de resultados con la forma de la Geocoding API"""
+    address = (address or '').strip()
+    if not address:
+        return []
+    lat, lng = synthetic_location(address)
+    return [{
+        'geometry': {'location': {'lat': lat, 'lng': lng}, 'location_type': 'ROOFTOP'},
+        'formatted_address': f"{address}, Chile",
+        'types': ['street_address'],
+        'place_id': hashlib.sha1(address.lower().encode('utf-8')).hexdigest()[:27]
+    }]
+
+
+def _parse_point(value):
+    """'lat,lng' → (lat, lng); una dirección de texto se geocodifica sintéticamente"""
+    try:
+        lat, lng = value.split(',')
+        return float(lat), float(lng)
+    except ValueError:
+        return synthetic_location(value)
+
+
+def synthetic_distance_matrix(origins, destinations):
+    """Respuesta con la forma de la Distance Matrix API (origins/destinations: listas de 'lat,lng')"""
+    rows = []
+    for origin in origins:
+        o_lat, o_lng = _parse_point(origin)
+        elements = []
+        for destination in destinations:
+            d_lat, d_lng = _parse_point(destination)
+            km = road_km(o_lat, o_lng, d_lat, d_lng)
+            seconds = int(km / SYNTHETIC_SPEED_KMH * 3600)
+            elements.append({
+                'status': 'OK',
+                'distance': {'value': int(km * 1000), 'text': f"{km:.1f} km"},
+                'duration': {'value': seconds, 'text': f"{seconds // 60} min"}
+            })
+        rows.append({'elements': elements})
+    return {
+        'status': 'OK',
+        'origin_addresses': list(origins),
+        'destination_addresses': list(destinations),
+        'rows': rows
+    }
+
+
+# ========================================
+# LATENCIA Y ERRORES
+# ========================================
+
+class LatencyModel:
+    """
+    Distribución de latencia en milisegundos a partir de una especificación de texto
+
+    - 'none' o '0'
+    - 'fixed:80'
+    - 'uniform:50,150'
+    - 'normal:80,20'          (media, desviación; truncada en 0)
+    - 'lognormal:80,0.5'      (mediana, sigma; cola larga como la de Google)
+    """
+
+    def __init__(self, spec='none', rng=None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, args = spec.partition(':')
+        values = [float(v) for v in args.split(',')] if args else []
+
+        if kind in ('none', '0', ''):
+            self.sample_ms = lambda: 0.0
+        elif kind == 'fixed':
+            self.sample_ms = lambda: values[0]
+        elif kind == 'uniform':
+            self.sample_ms = lambda: self.rng.uniform(values[0], values[1])
+        elif kind == 'normal':
+            self.sample_ms = lambda: max(0.0, self.rng.gauss(values[0], values[1]))
+        elif kind == 'lognormal':
+            self.sample_ms = lambda: values[0] * math.exp(self.rng.gauss(0, values[1]))
+        else:
+            raise ValueError(f"Distribución de latencia desconocida: {spec}")
+
+    def sleep(self):
+        delay = self.sample_ms()
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return delay
+
+
+def error_response(error_status):
+    """
+    Respuesta de error inyectado: (http_status, body)
+
+    HTTP_500/HTTP_503 simulan fallas de red/servidor (googlemaps reintenta); el resto
+    son status de la API (OVER_QUERY_LIMIT también se reintenta en el cliente).
+    """
+    if error_status.startswith('HTTP_'):
+        return int(error_status[5:]), {'error_message': 'Error inyectado por fake_google_maps'}
+    return 200, {'status': error_status, 'error_message': 'Error inyectado por fake_google_maps'}
+
+
+# ========================================
+# GRABACIÓN / REPRODUCCIÓN
+# ========================================
+
+def request_key(path, params):
+    """Identidad de un request: ruta + parámetros ordenados sin credenciales"""
+    filtered = sorted((k, v) for k, v in params if k not in AUTH_PARAMS)
+    return f"{path}?{urlencode(filtered)}"
+
+
+class SessionStore:
+    """Sesiones grabadas: un archivo JSON por request en un directorio"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        for file_path in glob.glob(os.path.join(self.directory, '*.json')):
+            with open(file_path, encoding='utf-8') as f:
+                entry = json.load(f)
+            self.entries[entry['key']] = entry
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def save(self, key, api, http_status, body, latency_ms):
+        entry = {
+            'key': key,
+            'api': api,
+            'http_status': http_status,
+            'latency_ms': round(latency_ms, 2),
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'body': body
+        }
+        file_name = f"{api}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json"
+        with self.lock:
+            self.entries[key] = entry
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, file_name), 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+
+
+# ========================================
+# SERVIDOR
+# ========================================
+
+class FakeGoogleMaps:
+    """
+    Estado y lógica del servidor (independiente de HTTP para poder usarlo en proceso)
+
+    Args:
+        mode (str): 'synthetic', 'record' o 'replay'
+        latency (dict): {'geocode': LatencyModel, 'distance_matrix': LatencyModel}
+        error_rate (float): probabilidad de responder un error inyectado
+        error_status (str): 'OVER_QUERY_LIMIT', 'REQUEST_DENIED', 'HTTP_500', ...
+        store (SessionStore): sesiones para record/replay
+        upstream (str): URL base real para --record
+        replay_fallback (str): 'synthetic' o 'error' cuando un request no está grabado
+        replay_latency (bool): usar la latencia grabada al reproducir
+    """
+
+    def __init__(self, mode='synthetic', latency=None, error_rate=0.0, error_status='OVER_QUERY_LIMIT',
+                 store=None, upstream=None, replay_fallback='error', replay_latency=True, seed=None):
+        self.mode = mode
+        self.latency = latency or {}
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.store = store
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.replay_fallback = replay_fallback
+        self.replay_latency = replay_latency
+        self.rng = random.Random(seed)
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def count(self, api, outcome):
+        with self.stats_lock:
+            key = f"{api}:{outcome}"
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def handle(self, path, raw_query):
+        """Procesar un request. Retorna (http_status, body_dict)"""
+        api = API_BY_PATH.get(path)
+        if api is None:
+            return 404, {'status': 'NOT_FOUND', 'error_message': f"Ruta no soportada: {path}"}
+
+        params = parse_qsl(raw_query, keep_blank_values=True)
+
+        if self.mode == 'record':
+            return self._record(api, path, raw_query, params)
+
+        if self.mode == 'replay':
+            entry = self.store.get(request_key(path, params))
+            if entry is not None:
+                if self.replay_latency and api not in self.latency:
+                    time.sleep(entry['latency_ms'] / 1000)
+                else:
+                    self._sleep(api)
+                self.count(api, 'replayed')
+                return entry['http_status'], entry['body']
+            if self.replay_fallback != 'synthetic':
+                self.count(api, 'replay_miss')
+                return 200, {'status': 'INVALID_REQUEST',
+                             'error_message': 'Request no grabado en la sesión'}
+
+        self._sleep(api)
+        with self.stats_lock:
+            inject_error = self.rng.random() < self.error_rate
+        if inject_error:
+            self.count(api, self.error_status)
+            return error_response(self.error_status)
+
+        self.count(api, 'OK')
+        return 200, self._synthetic(api, dict(params))
+
+    def _sleep(self, api):
+        model = self.latency.get(api)
+        if model is not None:
+            model.sleep()
+
+    def _synthetic(self, api, params):
+        if api == 'geocode':
+            results = synthetic_geocode(params.get('address', ''))
+            return {'status': 'OK' if results else 'ZERO_RESULTS', 'results': results}
+        return synthetic_distance_matrix(
+            [p for p in params.get('origins', '').split('|') if p],
+            [p for p in params.get('destinations', '').split('|') if p]
+        )
+
+    def _record(self, api, path, raw_query, params):
+        url = f"{self.upstream}{path}?{raw_query}"
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                http_status, raw_body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            http_status, raw_body = e.code, e.read()
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            body = json.loads(raw_body)
+        except ValueError:
+            body = {'error_message': raw_body.decode('utf-8', 'replace')}
+
+        self.store.save(request_key(path, params), api, http_status, body, latency_ms)
+        self.count(api, 'recorded')
+        return http_status, body
+
+
+def make_handler(fake):
+    """Handler HTTP que delega en una instancia de FakeGoogleMaps"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == '/_stats':
+                http_status, body = 200, fake.stats
+            else:
+                http_status, body = fake.handle(parts.path, parts.query)
+
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(http_status)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # Sin log por request: distorsiona los benchmarks
+            pass
+
+    return Handler
+
+
+def start_server(fake, host='127.0.0.1', port=0):
+    """Levantar el servidor en un hilo daemon. Retorna (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local que imita Google Maps')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--geocode-latency', default='none', help="Ej: fixed:80, lognormal:80,0.4")
+    parser.add_argument('--matrix-latency', default='none', help="Ej: uniform:80,200")
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probabilidad de error inyectado')
+    parser.add_argument('--error-status', default='OVER_QUERY_LIMIT',
+                        help='OVER_QUERY_LIMIT, REQUEST_DENIED, UNKNOWN_ERROR, HTTP_500, HTTP_503')
+    parser.add_argument('--record', metavar='DIR', help='Grabar respuestas reales en DIR (proxy a --upstream)')
+    parser.add_argument('--upstream', default='https://maps.googleapis.com', help='URL real para --record')
+    parser.add_argument('--replay', metavar='DIR', help='Reproducir respuestas grabadas en DIR')
+    parser.add_argument('--replay-fallback', choices=('error', 'synthetic'), default='error',
+                        help='Qué responder si un request no está grabado')
+    parser.add_argument('--seed', type=int, help='Semilla para latencias y errores reproducibles')
+    args = parser.parse_args()
+
+    if args.record and args.replay:
+        parser.error('--record y --replay son excluyentes')
+
+    rng = random.Random(args.seed)
+    latency = {}
+    # En replay, sin latencia explícita se usa la grabada
+    if not args.replay or args.geocode_latency != 'none':
+        latency['geocode'] = LatencyModel(args.geocode_latency, rng)
+    if not args.replay or args.matrix_latency != 'none':
+        latency['distance_matrix'] = LatencyModel(args.matrix_latency, rng)
+
+    store = None
+    mode = 'synthetic'
+    if args.record:
+        mode, store = 'record', SessionStore(args.record)
+    elif args.replay:
+        mode, store = 'replay', SessionStore(args.replay)
+        print(f"✓ {store.load()} respuestas grabadas cargadas de {args.replay}")
+
+    fake = FakeGoogleMaps(
+        mode=mode,
+        latency=latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        store=store,
+        upstream=args.upstream,
+        replay_fallback=args.replay_fallback,
+        seed=args.seed
+    )
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    server.daemon_threads = True
+    print(f"Fake Google Maps ({mode}) escuchando en http://{args.host}:{args.port}")
+    print(f"   Usa: GOOGLE_MAPS_BASE_URL=http://{args.host}:{args.port}")
+    print(f"   Estadísticas: http://{args.host}:{args.port}/_stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nEstadísticas: {json.dumps(fake.stats)}")
+
+
+if __name__ == '__main__':
+    main()
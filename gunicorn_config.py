@@ -1,6 +1,7 @@
 # Configuración de Gunicorn para producción
 import multiprocessing
 import os
+import shutil
 
 # Dirección y puerto
 # En Docker, bind a 0.0.0.0 para que sea accesible desde fuera del contenedor
@@ -11,7 +12,10 @@ bind = "0.0.0.0:8000"
 workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
 
 # Tipo de worker
-worker_class = "sync"
+# GUNICORN_THREADS > 1: workers gthread (varios requests por proceso); necesario para que
+# ROUTE_BATCH junte llamadas a Distance Matrix de checkouts concurrentes
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = "gthread" if threads > 1 else "sync"
 
 # Timeout (segundos)
 timeout = 120
@@ -30,3 +34,18 @@ daemon = False
 
 # Pre-load app para mejor performance
 preload_app = True
+
+# Métricas Prometheus multiproceso: cada worker escribe en este directorio y
+# /metrics agrega todos. Debe existir (y limpiarse) antes de importar la app,
+# porque con preload_app el master carga la app antes de los hooks.
+prometheus_multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    """Marcar worker terminado para que sus gauges no se sigan agregando"""
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+    except ImportError:
+        pass
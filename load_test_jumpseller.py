@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga sintética para el callback de Jumpseller
+Genera payloads realistas (carritos repetidos, variantes de dirección, regiones
+fuera de cobertura) y los envía a /shipping/api/jumpseller/callback a una tasa
+o concurrencia objetivo. Reporta throughput, latencia p50/p95/p99 y errores.
+
+Uso:
+    # Todo offline: levanta la app en proceso con SQLite y Google simulado
+    python load_test_jumpseller.py --serve --rps 50 --duration 30
+
+    # Contra una instancia ya corriendo (local, con MySQL o Google simulado)
+    python load_test_jumpseller.py --url http://localhost:5000 --concurrency 20 --requests 2000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from fake_google_maps import (
+    COMUNAS_RM, OUT_OF_AREA, synthetic_geocode, synthetic_distance_matrix
+)
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+CALLBACK_PATH = '/shipping/api/jumpseller/callback'
+
+STREETS = [
+    'Av. Providencia', 'Av. Ricardo Lyon', 'Amapolas', 'Av. Irarrázaval', 'Los Leones',
+    'Av. Apoquindo', 'Av. Pedro de Valdivia', 'Manuel Montt', 'Av. Grecia', 'Suecia',
+    'Av. Vicuña Mackenna', 'Antonio Varas', 'Av. Tobalaba', 'Holanda', 'Eliodoro Yáñez',
+]
+
+
+def address_variant(street, number, rng):
+    """Variantes de escritura de la misma dirección (como las que llegan desde checkout)"""
+    variant = rng.random()
+    if variant < 0.15:
+        street = street.replace('Av. ', 'Avenida ')
+    elif variant < 0.25:
+        street = street.upper()
+    elif variant < 0.32:
+        street = f"  {street.lower()} "
+    elif variant < 0.38:
+        number = f"{number} depto {rng.randint(11, 1504)}"
+    return street, str(number)
+
+
+class PayloadGenerator:
+    """
+    Genera payloads de callback de Jumpseller
+
+    - repeat_ratio: fracción de requests que repiten un carrito anterior (re-render del checkout)
+    - out_of_area_ratio: fracción de destinos fuera de la Región Metropolitana
+    - address_pool: cantidad de direcciones distintas (controla el hit ratio de caché)
+    """
+
+    def __init__(self, seed=42, repeat_ratio=0.4, out_of_area_ratio=0.1, address_pool=500):
+        self.rng = random.Random(seed)
+        self.repeat_ratio = repeat_ratio
+        self.out_of_area_ratio = out_of_area_ratio
+        self.addresses = [self._random_address() for _ in range(address_pool)]
+        self.recent_carts = []
+        self.cart_counter = 0
+        self.lock = threading.Lock()
+
+    def _random_address(self):
+        if self.rng.random() < self.out_of_area_ratio:
+            city, (region, _) = self.rng.choice(list(OUT_OF_AREA.items()))
+        else:
+            city, region = self.rng.choice(list(COMUNAS_RM)), 'Región Metropolitana'
+        return {
+            'street': self.rng.choice(STREETS),
+            'number': self.rng.randint(100, 9999),
+            'city': city,
+            'region': region,
+        }
+
+    def next_payload(self):
+        with self.lock:
+            if self.recent_carts and self.rng.random() < self.repeat_ratio:
+                cart_id, address = self.rng.choice(self.recent_carts)
+            else:
+                self.cart_counter += 1
+                cart_id = f"load-{self.cart_counter}"
+                address = self.rng.choice(self.addresses)
+                self.recent_carts.append((cart_id, address))
+                if len(self.recent_carts) > 200:
+                    self.recent_carts.pop(0)
+
+            street, number = address_variant(address['street'], address['number'], self.rng)
+            include_region = self.rng.random() > 0.1
+
+        return {
+            'request': {
+                'cart_id': cart_id,
+                'order_id': '',
+                'to': {
+                    'address': street,
+                    'street_number': number,
+                    'city': address['city'],
+                    'region_name': address['region'] if include_region else '',
+                    'municipality_name': address['city'],
+                    'country': 'Chile'
+                },
+                'from': {
+                    'address': 'Amapolas 3959',
+                    'city': 'Providencia',
+                    'region_name': 'Región Metropolitana'
+                }
+            }
+        }
+
+
+# ========================================
+# GOOGLE SIMULADO (EN PROCESO)
+# ========================================
+# Para pasar por HTTP y el cliente googlemaps real (reintentos, errores,
+# sesiones grabadas) usar fake_google_maps.py con --google-url
+
+class StubGoogleClient:
+    """Reemplazo de googlemaps.Client con respuestas deterministas y latencia configurable"""
+
+    def __init__(self, geocode_latency_ms=80, matrix_latency_ms=120):
+        self.geocode_latency = geocode_latency_ms / 1000
+        self.matrix_latency = matrix_latency_ms / 1000
+        self.calls = Counter()
+
+    def geocode(self, address=None, components=None, language=None, **kwargs):
+        self.calls['geocode'] += 1
+        time.sleep(self.geocode_latency)
+        return synthetic_geocode(address)
+
+    def distance_matrix(self, origins, destinations, **kwargs):
+        self.calls['distance_matrix'] += len(origins) * len(destinations)
+        time.sleep(self.matrix_latency)
+        return synthetic_distance_matrix(origins, destinations)
+
+
+def serve_in_process(database_url, geocode_latency_ms, matrix_latency_ms, google_url=None):
+    """
+    Levantar la app con SQLite/MySQL local en un hilo. Retorna (url, client)
+
+    Con google_url el cliente googlemaps real apunta a ese servidor (client es None);
+    sin él se reemplaza por StubGoogleClient.
+    """
+    os.environ['ENVIRONMENT'] = 'testing'
+    os.environ['DATABASE_URL'] = database_url
+    if google_url:
+        os.environ['GOOGLE_MAPS_BASE_URL'] = google_url
+    os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'AIzaOfflineLoadTestKeyNotUsed0000000')
+    os.environ.setdefault('LOG_LEVEL', 'warning')
+
+    import logging
+    from werkzeug.serving import make_server
+    from app import create_app, db
+    from app.services.router_service import router_service
+    from init_db import seed_default_data
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed_default_data()
+
+    client = None
+    if not google_url:
+        client = StubGoogleClient(geocode_latency_ms, matrix_latency_ms)
+        router_service.client = client
+
+    # El access log de werkzeug por request distorsiona la medición
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", client
+
+
+# ========================================
+# GENERADOR DE CARGA
+# ========================================
+
+class LoadResult:
+    """Acumula latencias y resultados de forma thread-safe"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.no_rates = 0
+        self.lock = threading.Lock()
+
+    def add(self, latency, status, has_rates):
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+            if status == 200 and not has_rates:
+                self.no_rates += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def send_one(session, url, generator, result, timeout):
+    payload = generator.next_payload()
+    start = time.perf_counter()
+    try:
+        response = session.post(url, json=payload, timeout=timeout)
+        latency = time.perf_counter() - start
+        has_rates = False
+        if response.status_code == 200:
+            has_rates = bool(response.json().get('rates'))
+        result.add(latency, response.status_code, has_rates)
+    except Exception as e:
+        result.add(time.perf_counter() - start, type(e).__name__, False)
+
+
+def run_load(base_url, generator, rps=None, concurrency=10, duration=None, total_requests=None, timeout=30):
+    """
+    Ejecutar la carga
+
+    - Con rps: modo lazo abierto (se despacha a tasa fija, independiente de la latencia)
+    - Sin rps: modo lazo cerrado con `concurrency` clientes enviando en serie
+    """
+    import requests
+
+    url = base_url.rstrip('/') + CALLBACK_PATH
+    result = LoadResult()
+    deadline = time.monotonic() + duration if duration else None
+    sent = Counter()
+    sent_lock = threading.Lock()
+
+    def should_send():
+        with sent_lock:
+            if total_requests is not None and sent['n'] >= total_requests:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            sent['n'] += 1
+            return True
+
+    start = time.perf_counter()
+
+    if rps:
+        # Lazo abierto: un despachador reparte turnos a un pool de hilos
+        from concurrent.futures import ThreadPoolExecutor
+        local = threading.local()
+
+        def task():
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            send_one(local.session, url, generator, result, timeout)
+
+        interval = 1.0 / rps
+        next_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(concurrency, int(rps))) as pool:
+            while should_send():
+                pool.submit(task)
+                next_at += interval
+                sleep_for = next_at - time.perf_counter()
+                if sleep_for > 0:
+                    time.sleep(sleep_for)
+    else:
+        def worker():
+            session = requests.Session()
+            while should_send():
+                send_one(session, url, generator, result, timeout)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    elapsed = time.perf_counter() - start
+    return summarize(result, elapsed)
+
+
+def summarize(result, elapsed):
+    latencies = sorted(result.latencies)
+    total = len(latencies)
+    errors = sum(count for status, count in result.statuses.items() if status != 200)
+    return {
+        'requests': total,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'no_rates_rate': round(result.no_rates / total, 4) if total else 0.0,
+        'statuses': {str(status): count for status, count in result.statuses.items()},
+    }
+
+
+def print_report(summary, google_calls=None):
+    print("\n" + "=" * 60)
+    print("  RESULTADO PRUEBA DE CARGA - CALLBACK JUMPSELLER")
+    print("=" * 60)
+    print(f"Requests:        {summary['requests']}")
+    print(f"Duración:        {summary['elapsed_s']} s")
+    print(f"Throughput:      {summary['throughput_rps']} req/s")
+    print(f"Latencia p50:    {summary['latency_ms']['p50']} ms")
+    print(f"Latencia p95:    {summary['latency_ms']['p95']} ms")
+    print(f"Latencia p99:    {summary['latency_ms']['p99']} ms")
+    print(f"Latencia máx:    {summary['latency_ms']['max']} ms")
+    print(f"Tasa de error:   {summary['error_rate'] * 100:.2f}%")
+    print(f"Sin tarifas:     {summary['no_rates_rate'] * 100:.2f}%")
+    print(f"Status:          {summary['statuses']}")
+    if google_calls is not None:
+        print(f"Llamadas Google: {dict(google_calls)}")
+    print("=" * 60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del callback de Jumpseller')
+    parser.add_argument('--url', help='URL base de una instancia corriendo (ej: http://localhost:5000)')
+    parser.add_argument('--serve', action='store_true', help='Levantar la app en proceso (offline)')
+    parser.add_argument('--database-url', default='sqlite:///load_test.db',
+                        help='BD para --serve (SQLite o MySQL local)')
+    parser.add_argument('--rps', type=float, help='Tasa objetivo (lazo abierto)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Clientes concurrentes')
+    parser.add_argument('--duration', type=float, help='Duración en segundos')
+    parser.add_argument('--requests', type=int, help='Total de requests')
+    parser.add_argument('--repeat-ratio', type=float, default=0.4, help='Fracción de carritos repetidos')
+    parser.add_argument('--out-of-area', type=float, default=0.1, help='Fracción de destinos fuera de cobertura')
+    parser.add_argument('--address-pool', type=int, default=500, help='Direcciones distintas')
+    parser.add_argument('--google-url', help='Con --serve: usar un fake_google_maps.py corriendo en esta URL')
+    parser.add_argument('--geocode-latency-ms', type=float, default=80, help='Latencia simulada de geocode')
+    parser.add_argument('--matrix-latency-ms', type=float, default=120, help='Latencia simulada de Distance Matrix')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='Imprimir resultado en JSON')
+    args = parser.parse_args()
+
+    if not args.url and not args.serve:
+        parser.error('Indica --url o --serve')
+    if args.duration is None and args.requests is None:
+        args.requests = 500
+
+    google_client = None
+    base_url = args.url
+    if args.serve:
+        base_url, google_client = serve_in_process(
+            args.database_url, args.geocode_latency_ms, args.matrix_latency_ms, args.google_url
+        )
+
+    generator = PayloadGenerator(
+        seed=args.seed,
+        repeat_ratio=args.repeat_ratio,
+        out_of_area_ratio=args.out_of_area,
+        address_pool=args.address_pool
+    )
+
+    summary = run_load(
+        base_url, generator,
+        rps=args.rps,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        total_requests=args.requests
+    )
+
+    if args.json:
+        if google_client:
+            summary['google_calls'] = dict(google_client.calls)
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary, google_client.calls if google_client else None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+CLI de migraciones versionadas del esquema (ver app/migrations.py)
+
+Uso:
+    python migrate.py status          # versión actual y migraciones pendientes
+    python migrate.py upgrade         # aplicar pendientes (bajo lock)
+    python migrate.py upgrade --to 3  # aplicar hasta la versión 3
+    python migrate.py stamp 5         # marcar como aplicadas sin ejecutarlas
+"""
+
+import argparse
+import os
+import sys
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# La CLI decide cuándo migrar: no hacerlo al crear la app
+os.environ['AUTO_MIGRATE'] = 'false'
+
+from app import create_app, db
+from app import migrations
+
+
+def print_status(engine):
+    version = migrations.current_version(engine)
+    pending = migrations.pending_migrations(migrations.applied_versions(engine))
+    print(f"Versión actual: {version} (última: {migrations.LATEST_VERSION})")
+    if pending:
+        print("Pendientes:")
+        for migration in pending:
+            print(f"  {migration.version:03d}_{migration.name} - {migration.upgrade.__doc__}")
+    else:
+        print("✓ Esquema al día")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migraciones del esquema')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('status', help='Mostrar versión y pendientes')
+    upgrade_parser = subparsers.add_parser('upgrade', help='Aplicar migraciones pendientes')
+    upgrade_parser.add_argument('--to', type=int, help='Versión objetivo')
+    stamp_parser = subparsers.add_parser('stamp', help='Marcar versiones como aplicadas')
+    stamp_parser.add_argument('version', type=int)
+    args = parser.parse_args()
+
+    app = create_app(with_routes=False)
+
+    with app.app_context():
+        engine = db.engine
+
+        if args.command == 'upgrade':
+            applied = migrations.upgrade(engine, target=args.to)
+            if applied:
+                print(f"✓ Migraciones aplicadas: {', '.join(str(v) for v in applied)}")
+            else:
+                print("✓ No hay migraciones pendientes")
+        elif args.command == 'stamp':
+            migrations.stamp(engine, args.version)
+            print(f"✓ Esquema marcado en la versión {args.version}")
+
+        print_status(engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Poblar address_suggestions (autocompletado de direcciones) desde shipping_quotes
+
+El servicio web agrega las direcciones validadas de forma incremental; este script sirve
+para poblar la tabla por primera vez con el historial. Recalcula hit_count de las
+direcciones cotizadas (sin duplicar al volver a ejecutarlo) y conserva las que solo
+existen en la tabla. La validación (nivel, granularidad, confianza) se toma de
+router_response de la primera cotización de cada dirección; las filas antiguas sin
+esa información se omiten.
+
+Uso:
+    python rebuild_address_index.py
+"""
+
+import json
+import sys
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from app.models import ShippingQuote, AddressSuggestion
+from app.services.address_index import fold_address, VALID_LEVELS
+
+CHUNK_SIZE = 5000
+BATCH_SIZE = 1000
+
+
+def collect_addresses():
+    """{address_key: {fila}} con hit_count sumado y el id de la primera cotización (keyset por id)"""
+    addresses = {}
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            ShippingQuote.id,
+            ShippingQuote.destination_address,
+            ShippingQuote.destination_lat,
+            ShippingQuote.destination_lng,
+            ShippingQuote.hit_count,
+        ).filter(
+            ShippingQuote.id > last_id,
+            ShippingQuote.destination_address.isnot(None),
+            ShippingQuote.destination_lat.isnot(None),
+            ShippingQuote.destination_lng.isnot(None),
+        ).order_by(ShippingQuote.id).limit(CHUNK_SIZE).all()
+        db.session.rollback()
+        if not rows:
+            return addresses
+
+        for row in rows:
+            folded = fold_address(row.destination_address)
+            if not folded:
+                continue
+            key = AddressSuggestion.make_address_key(folded)
+            entry = addresses.get(key)
+            if entry is None:
+                addresses[key] = {
+                    'quote_id': row.id,
+                    'address_key': key,
+                    'formatted_address': row.destination_address[:500],
+                    'lat': row.destination_lat,
+                    'lng': row.destination_lng,
+                    'location_type': None,
+                    'place_id': None,
+                    'hit_count': row.hit_count or 1,
+                }
+            else:
+                entry['hit_count'] += row.hit_count or 1
+        last_id = rows[-1].id
+
+
+def attach_validation(addresses):
+    """Agregar nivel/granularidad/confianza desde router_response (una cotización por dirección)"""
+    by_quote = {entry['quote_id']: entry for entry in addresses.values()}
+    quote_ids = sorted(by_quote)
+
+    for start in range(0, len(quote_ids), BATCH_SIZE):
+        rows = db.session.query(ShippingQuote.id, ShippingQuote.router_response).filter(
+            ShippingQuote.id.in_(quote_ids[start:start + BATCH_SIZE])
+        ).all()
+        db.session.rollback()
+        for quote_id, router_response in rows:
+            try:
+                validation = json.loads(router_response or '{}').get('destination', {}).get('validation') or {}
+            except (ValueError, AttributeError):
+                validation = {}
+            entry = by_quote[quote_id]
+            entry['validation_level'] = validation.get('level')
+            entry['granularity'] = validation.get('granularity')
+            entry['confidence'] = validation.get('confidence')
+
+    return [
+        {key: value for key, value in entry.items() if key != 'quote_id'}
+        for entry in addresses.values()
+        if entry.get('validation_level') in VALID_LEVELS
+    ]
+
+
+def main():
+    app = create_app(with_routes=False)
+
+    with app.app_context():
+        addresses = collect_addresses()
+        rows = attach_validation(addresses)
+
+        with db.engine.begin() as conn:
+            for start in range(0, len(rows), BATCH_SIZE):
+                AddressSuggestion.upsert_many(conn, rows[start:start + BATCH_SIZE], replace_hits=True)
+
+        print(f"✓ {len(rows)} direcciones indexadas "
+              f"({len(addresses) - len(rows)} omitidas sin validación en router_response)")
+
+
+if __name__ == '__main__':
+    main()
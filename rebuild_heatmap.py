@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Recalcular el mapa de calor de demanda (quote_demand_cells) desde shipping_quotes
+
+El servicio web mantiene la tabla de forma incremental; este script sirve para poblarla
+por primera vez o reconstruir un rango de días (p. ej. tras cambiar HEATMAP_LEVELS).
+
+Igual que el servicio, cuenta checkouts y no filas: las filas de una misma request (misma
+sesión, destino y segundo) se agrupan con la tarifa más barata. El agrupamiento es por
+bloque de CHUNK_SIZE filas; un checkout partido entre dos bloques cuenta dos veces.
+
+Uso:
+    python rebuild_heatmap.py                      # todo el historial
+    python rebuild_heatmap.py --since 2026-01-01   # solo desde esa fecha (inclusive)
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from app.models import ShippingQuote, QuoteDemandCell
+from app.services.demand_heatmap import demand_aggregator, write_cells
+
+CHUNK_SIZE = 5000
+
+
+def iter_quote_chunks(since=None):
+    """Bloques de (id, session_id, created_at, lat, lng, km, precio, hits), keyset por id"""
+    last_id = 0
+    while True:
+        query = db.session.query(
+            ShippingQuote.id,
+            ShippingQuote.session_id,
+            ShippingQuote.created_at,
+            ShippingQuote.destination_lat,
+            ShippingQuote.destination_lng,
+            ShippingQuote.distance_km,
+            ShippingQuote.price_clp,
+            ShippingQuote.hit_count,
+        ).filter(
+            ShippingQuote.id > last_id,
+            ShippingQuote.destination_lat.isnot(None),
+            ShippingQuote.destination_lng.isnot(None),
+        )
+        if since:
+            query = query.filter(ShippingQuote.created_at >= since)
+        rows = query.order_by(ShippingQuote.id).limit(CHUNK_SIZE).all()
+        db.session.rollback()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def group_checkouts(rows):
+    """
+    Filas de un bloque -> [(created_at, lat, lng, km, precio, hits)], una por checkout
+
+    Sin sesión cada fila es su propio checkout. En modo dedup cada fila de método lleva los
+    hits del checkout: se toma el máximo, no la suma.
+    """
+    checkouts = {}
+    for quote_id, session_id, created_at, lat, lng, distance_km, price_clp, hits in rows:
+        second = created_at.replace(microsecond=0) if created_at else None
+        key = (session_id, lat, lng, second) if session_id else quote_id
+        checkout = checkouts.get(key)
+        if checkout is None:
+            checkouts[key] = [created_at, lat, lng, distance_km, price_clp, hits or 1]
+            continue
+        if price_clp is not None and (checkout[4] is None or price_clp < checkout[4]):
+            checkout[3], checkout[4] = distance_km, price_clp
+        checkout[5] = max(checkout[5], hits or 1)
+    return checkouts.values()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recalcular mapa de calor de demanda')
+    parser.add_argument('--since', help='Fecha YYYY-MM-DD desde la que reconstruir')
+    args = parser.parse_args()
+
+    since = datetime.fromisoformat(args.since) if args.since else None
+
+    app = create_app(with_routes=False)
+
+    with app.app_context():
+        cells = {}
+        quotes = 0
+        for rows in iter_quote_chunks(since):
+            for created_at, lat, lng, distance_km, price_clp, hits in group_checkouts(rows):
+                day = (created_at or datetime.utcnow()).date()
+                # En modo dedup una fila representa `hits` checkouts
+                demand_aggregator.add(cells, lat, lng, distance_km, price_clp, day, count=hits)
+                quotes += hits
+
+        with db.engine.begin() as conn:
+            delete = QuoteDemandCell.__table__.delete()
+            if since:
+                delete = delete.where(QuoteDemandCell.__table__.c.day >= since.date())
+            conn.execute(delete)
+            write_cells(conn, cells)
+
+        print(f"✓ {quotes} checkouts agregados en {len(cells)} celdas "
+              f"(niveles {', '.join(str(level) for level in demand_aggregator.levels)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Reproducir tráfico capturado (TRAFFIC_CAPTURE_FILE) contra una instancia de prueba
+y comparar dos builds en latencia, llamadas a Google y tarifas devueltas.
+
+Uso:
+    # Reproducir al ritmo original (--speed 1), 10× más rápido o sin pausas (--speed 0)
+    python replay_traffic.py run capturas/traffic.ndjson.* --url http://localhost:5000 --speed 10 --out build_a.json
+
+    # Comparar dos ejecuciones
+    python replay_traffic.py compare build_a.json build_b.json
+
+Las llamadas a Google se obtienen de /metrics (shipping_google_api_calls_total) antes
+y después de la ejecución, contando solo los status facturados (BILLED_STATUSES): las
+rechazadas por la cuota compartida (THROTTLED) y los errores no cuentan. Para builds sin métricas usar --google-stats con la URL
+de un fake_google_maps.py (/_stats).
+"""
+
+import argparse
+import glob
+import json
+import math
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+GOOGLE_CALLS_METRIC = 'shipping_google_api_calls_total'
+
+# Status facturados por Google (mismo criterio que BILLED_OUTCOMES en app/services/usage.py)
+BILLED_STATUSES = ('OK', 'ZERO_RESULTS', 'NOT_FOUND')
+
+_STATUS_LABEL = re.compile(r'status="([^"]*)"')
+
+
+def load_capture(patterns):
+    """Leer uno o más archivos NDJSON (acepta globs, incluidos los rotados) ordenados por ts"""
+    records = []
+    for pattern in patterns:
+        for file_path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(file_path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        records.append(json.loads(line))
+    records.sort(key=lambda r: r['ts'])
+    return records
+
+
+def google_calls_from_metrics(session, base_url):
+    """Llamadas facturadas a Google según /metrics (None si no hay métricas)"""
+    try:
+        response = session.get(base_url.rstrip('/') + '/metrics', timeout=10)
+    except Exception:
+        return None
+    if response.status_code != 200:
+        return None
+
+    total = None
+    for line in response.text.splitlines():
+        if line.startswith(f"# TYPE {GOOGLE_CALLS_METRIC}"):
+            total = total or 0.0
+        elif line.startswith(GOOGLE_CALLS_METRIC + '{'):
+            status = _STATUS_LABEL.search(line)
+            if status and status.group(1) in BILLED_STATUSES:
+                total = (total or 0) + float(line.rsplit(' ', 1)[1])
+    return total
+
+
+def google_calls_from_fake(session, stats_url):
+    """Total de respuestas servidas por fake_google_maps.py (/_stats)"""
+    try:
+        stats = session.get(stats_url.rstrip('/') + '/_stats', timeout=10).json()
+    except Exception:
+        return None
+    return float(sum(stats.values()))
+
+
+def rates_signature(path, body):
+    """Resumen comparable de la respuesta: tarifas del callback o precio de /api/quote"""
+    if not isinstance(body, dict):
+        return None
+    if path.endswith('/api/jumpseller/callback'):
+        return sorted((r.get('service_code'), r.get('total_price')) for r in body.get('rates', []))
+    if 'shipping_options' in body:
+        return sorted((o.get('method_code'), o.get('price_clp')) for o in body['shipping_options'])
+    return [body.get('success'), body.get('error')]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_replay(records, base_url, speed=1.0, concurrency=20, google_stats=None, timeout=30):
+    """
+    Re-emitir los requests capturados
+
+    Con speed > 0 se respetan los intervalos originales divididos por speed (lazo abierto);
+    con speed = 0 se envían lo más rápido posible con `concurrency` hilos.
+    """
+    import requests
+
+    session = requests.Session()
+    measure_google = (
+        (lambda: google_calls_from_fake(session, google_stats)) if google_stats
+        else (lambda: google_calls_from_metrics(session, base_url))
+    )
+    google_before = measure_google()
+
+    results = [None] * len(records)
+    local = threading.local()
+
+    def send(index, record):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        url = base_url.rstrip('/') + record['path']
+        if record.get('query'):
+            url += '?' + record['query']
+        start = time.perf_counter()
+        try:
+            response = local.session.request(record.get('method', 'POST'), url, json=record.get('body'),
+                                             timeout=timeout)
+            latency = time.perf_counter() - start
+            try:
+                signature = rates_signature(record['path'], response.json())
+            except ValueError:
+                signature = None
+            results[index] = {'status': response.status_code, 'latency_ms': round(latency * 1000, 2),
+                              'signature': signature}
+        except Exception as e:
+            results[index] = {'status': type(e).__name__,
+                              'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+                              'signature': None}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if speed > 0 and records:
+            first_ts = records[0]['ts']
+            for index, record in enumerate(records):
+                due = (record['ts'] - first_ts) / speed
+                wait = due - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+                pool.submit(send, index, record)
+        else:
+            for index, record in enumerate(records):
+                pool.submit(send, index, record)
+    elapsed = time.perf_counter() - start
+
+    google_after = measure_google()
+    google_calls = (google_after - google_before
+                    if google_before is not None and google_after is not None else None)
+
+    latencies = sorted(r['latency_ms'] for r in results)
+    errors = sum(1 for r in results if r['status'] != 200)
+    return {
+        'url': base_url,
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 2),
+        'speed': speed,
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+        'error_rate': round(errors / len(results), 4) if results else 0.0,
+        'google_calls': google_calls,
+        'google_calls_per_request': round(google_calls / len(results), 4)
+        if google_calls is not None and results else None,
+        'captured_latency_ms': {
+            'p50': percentile(sorted(r.get('duration_ms', 0) for r in records), 50),
+            'p95': percentile(sorted(r.get('duration_ms', 0) for r in records), 95),
+        },
+        'results': results
+    }
+
+
+def compare_runs(a, b):
+    """Diferencias entre dos ejecuciones del mismo archivo de captura"""
+    if a['requests'] != b['requests']:
+        print(f"⚠️  Las ejecuciones tienen distinta cantidad de requests ({a['requests']} vs {b['requests']})")
+
+    mismatches = sum(
+        1 for ra, rb in zip(a['results'], b['results'])
+        if ra['status'] == 200 and rb['status'] == 200 and ra['signature'] != rb['signature']
+    )
+
+    def delta(x, y):
+        if x is None or y is None:
+            return 'n/d'
+        if not x:
+            return f"{y - x:+.2f}"
+        return f"{y - x:+.2f} ({(y - x) / x * 100:+.1f}%)"
+
+    print("\n" + "=" * 70)
+    print("  COMPARACIÓN DE BUILDS")
+    print("=" * 70)
+    print(f"{'':24}{'A':>14}{'B':>14}   Δ")
+    for key in ('p50', 'p95', 'p99', 'max'):
+        x, y = a['latency_ms'][key], b['latency_ms'][key]
+        print(f"{'Latencia ' + key + ' (ms)':24}{x:>14.2f}{y:>14.2f}   {delta(x, y)}")
+    print(f"{'Tasa de error':24}{a['error_rate']:>14.4f}{b['error_rate']:>14.4f}   "
+          f"{delta(a['error_rate'], b['error_rate'])}")
+    ga, gb = a['google_calls'], b['google_calls']
+    print(f"{'Llamadas Google':24}{str(ga):>14}{str(gb):>14}   {delta(ga, gb)}")
+    print(f"{'Google / request':24}{str(a['google_calls_per_request']):>14}"
+          f"{str(b['google_calls_per_request']):>14}")
+    print(f"{'Respuestas distintas':24}{mismatches:>28}")
+    print("=" * 70 + "\n")
+
+    return {'mismatches': mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay de tráfico capturado')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Reproducir una captura contra una instancia')
+    run_parser.add_argument('files', nargs='+', help='Archivos NDJSON capturados (acepta globs)')
+    run_parser.add_argument('--url', required=True, help='URL base de la instancia de prueba')
+    run_parser.add_argument('--speed', type=float, default=1.0, help='1 = ritmo original, N = N× más rápido, 0 = sin pausas')
+    run_parser.add_argument('--concurrency', type=int, default=20, help='Hilos máximos')
+    run_parser.add_argument('--limit', type=int, help='Reproducir solo los primeros N requests')
+    run_parser.add_argument('--google-stats', help='URL de fake_google_maps.py para contar llamadas')
+    run_parser.add_argument('--out', help='Guardar resultado en JSON (para compare)')
+
+    compare_parser = subparsers.add_parser('compare', help='Comparar dos ejecuciones guardadas')
+    compare_parser.add_argument('a', help='Resultado del build A (--out)')
+    compare_parser.add_argument('b', help='Resultado del build B (--out)')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.a, encoding='utf-8') as f:
+            a = json.load(f)
+        with open(args.b, encoding='utf-8') as f:
+            b = json.load(f)
+        compare_runs(a, b)
+        return
+
+    records = load_capture(args.files)
+    if args.limit:
+        records = records[:args.limit]
+    print(f"Reproduciendo {len(records)} requests contra {args.url} (speed={args.speed})...")
+
+    summary = run_replay(records, args.url, speed=args.speed, concurrency=args.concurrency,
+                         google_stats=args.google_stats)
+
+    print(f"Duración:         {summary['elapsed_s']} s")
+    print(f"Latencia p50/p95: {summary['latency_ms']['p50']} / {summary['latency_ms']['p95']} ms "
+          f"(captura: {summary['captured_latency_ms']['p50']} / {summary['captured_latency_ms']['p95']} ms)")
+    print(f"Tasa de error:    {summary['error_rate'] * 100:.2f}%")
+    print(f"Llamadas Google:  {summary['google_calls']}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"✓ Resultado guardado en {args.out}")
+
+
+if __name__ == '__main__':
+    main()
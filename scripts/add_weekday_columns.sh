@@ -1,5 +0,0 @@
-#!/bin/bash
-# Script para agregar columnas de días de la semana a la BD
-# Ejecutar desde Easypanel Terminal
-
-python add_weekday_columns.py
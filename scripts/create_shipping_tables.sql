@@ -1,3 +1,8 @@
+-- Esquema base, previo a las migraciones versionadas (app/migrations.py): al arrancar,
+-- la app (o python migrate.py upgrade) agrega las columnas y tablas posteriores.
+-- Si la app arrancó antes sobre la base vacía, las tablas ya existen y este script
+-- solo inserta los datos por defecto.
+
 -- Tabla de zonas de envío por kilometraje
 CREATE TABLE IF NOT EXISTS `shipping_zones` (
   `id` int(11) NOT NULL AUTO_INCREMENT,
@@ -0,0 +1,5 @@
+#!/bin/bash
+# Script para aplicar migraciones pendientes de la BD (ver app/migrations.py)
+# Ejecutar desde Easypanel Terminal
+
+python migrate.py upgrade
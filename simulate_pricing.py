@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Simular cambios de tarifas (precios de zonas, max_km y horarios de métodos) sobre el
+historial de cotizaciones, sin modificar la configuración
+
+La propuesta es un JSON con el mismo formato que POST /admin/api/pricing/simulate:
+    {
+        "zones": [{"id": 3, "price_clp": 4000}, {"min_km": 7, "max_km": 9, "price_clp": 8000}],
+        "replace_zones": false,
+        "methods": [{"code": "envio_hoy", "max_km": 9}]
+    }
+
+Uso:
+    python simulate_pricing.py propuesta.json
+    python simulate_pricing.py propuesta.json --from 2026-01-01 --to 2026-03-31 --json
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app
+from app.services.pricing_simulator import load_quote_history, run_simulation, SIMULATOR_MAX_QUOTES
+
+
+def format_row(label, baseline, proposed, delta):
+    def fmt(value):
+        if value is None:
+            return '-'
+        return f'{value:,.2f}' if isinstance(value, float) else f'{value:,}'
+    return f"  {label:28}{fmt(baseline):>16}{fmt(proposed):>16}{fmt(delta):>14}"
+
+
+def print_report(report):
+    history = report['history']
+    baseline, proposed, delta = report['baseline'], report['proposed'], report['delta']
+
+    print("\n" + "=" * 76)
+    print("  SIMULACIÓN DE TARIFAS")
+    print("=" * 76)
+    print(f"  {history['quote_rows']:,} cotizaciones, {history['checkouts']:,} checkouts"
+          f" ({history['date_from'] or 'inicio'} → {history['date_to'] or 'hoy'})"
+          f"{' [truncado]' if history['truncated'] else ''}")
+    print(f"  Config actual reproduce {report['baseline_match_pct']}% de las tarifas registradas")
+    print("-" * 76)
+    print(f"  {'':28}{'actual':>16}{'propuesta':>16}{'delta':>14}")
+    for key, label in (
+        ('checkouts_with_rate', 'Checkouts con tarifa'),
+        ('checkouts_without_rate', 'Checkouts sin tarifa'),
+        ('coverage_pct', 'Cobertura %'),
+        ('rates_offered', 'Tarifas ofrecidas'),
+        ('offered_revenue_clp', 'Ingreso ofrecido CLP'),
+        ('cheapest_revenue_clp', 'Ingreso (más barata) CLP'),
+        ('avg_cheapest_price_clp', 'Precio medio (más barata)'),
+    ):
+        print(format_row(label, baseline[key], proposed[key], delta.get(key)))
+
+    print("-" * 76)
+    for code, values in proposed['methods'].items():
+        before = baseline['methods'].get(code, {})
+        print(format_row(f'{code} tarifas', before.get('rates'), values['rates'],
+                         delta['methods'][code].get('rates')))
+        print(format_row(f'{code} ingreso CLP', before.get('revenue_clp'), values['revenue_clp'],
+                         delta['methods'][code].get('revenue_clp')))
+    print("-" * 76)
+    print(f"  Checkouts que pierden toda tarifa: {delta['lost_checkouts']:,}"
+          f" | que ganan tarifa: {delta['gained_checkouts']:,}")
+    print(f"  Simulación: {report['simulate_ms']} ms")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simular cambios de tarifas sobre el historial')
+    parser.add_argument('proposal', help='Archivo JSON con la propuesta (- para stdin)')
+    parser.add_argument('--from', dest='date_from', help='Fecha YYYY-MM-DD inicial (por defecto: 90 días)')
+    parser.add_argument('--to', dest='date_to', help='Fecha YYYY-MM-DD final (inclusive)')
+    parser.add_argument('--max-rows', type=int, default=SIMULATOR_MAX_QUOTES,
+                        help='Máximo de cotizaciones (las más recientes)')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultado en JSON')
+    args = parser.parse_args()
+
+    if args.proposal == '-':
+        proposal = json.load(sys.stdin)
+    else:
+        with open(args.proposal, encoding='utf-8') as f:
+            proposal = json.load(f)
+
+    date_from = datetime.fromisoformat(args.date_from) if args.date_from else \
+        datetime.combine(datetime.utcnow().date() - timedelta(days=89), datetime.min.time())
+    date_to = datetime.fromisoformat(args.date_to) + timedelta(days=1) if args.date_to else None
+
+    app = create_app(with_routes=False)
+
+    with app.app_context():
+        start = time.perf_counter()
+        history = load_quote_history(date_from, date_to, max_rows=args.max_rows)
+        load_seconds = time.perf_counter() - start
+        try:
+            report = run_simulation(proposal, history=history)
+        except ValueError as e:
+            print(f"❌ Propuesta inválida: {e}")
+            sys.exit(1)
+
+    report['load_seconds'] = round(load_seconds, 2)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    print_report(report)
+    print(f"  Carga del historial: {report['load_seconds']} s")
+
+
+if __name__ == '__main__':
+    main()
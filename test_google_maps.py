@@ -92,9 +92,9 @@ def test_cache():
 
     print("\n[3] Estadísticas del caché:")
     stats = router_service.get_cache_stats()
-    print(f"  Total de entradas: {stats['total_entries']}")
-    for entry in stats['entries']:
-        print(f"    - {entry['address']}: {entry['age_minutes']} minutos de antigüedad")
+    for tier, summary in stats.items():
+        print(f"  {tier}: {summary['entries']} entradas, {summary['hits']} hits, "
+              f"{summary['misses']} misses (hit ratio {summary['hit_ratio']})")
 
     if result1['success'] and result2['success']:
         print("\n[OK] Caché funcionando correctamente")
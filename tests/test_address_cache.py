@@ -0,0 +1,172 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.router_service import AddressCache
+
+
+def make_cache(hot_hits=2):
+    return AddressCache(max_age_hours=1, jitter=0, hot_hits=hot_hits)
+
+
+def age(cache, key, stale=True, expired=False):
+    """Mover los vencimientos de una entrada al pasado"""
+    past = datetime.now() - timedelta(seconds=1)
+    if stale:
+        cache.cache[key]['fresh_until'] = past
+    if expired:
+        cache.cache[key]['expires_at'] = past
+
+
+def drain(cache):
+    """Esperar los refrescos en curso"""
+    if cache.executor is not None:
+        cache.executor.shutdown(wait=True)
+        cache.executor = None
+
+
+class Refresher:
+    def __init__(self, value=None, gate=None):
+        self.value = value
+        self.gate = gate
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return self.value
+
+
+def test_fresh_hit_and_miss():
+    cache = make_cache()
+    cache.set('Lyon 1', {'lat': 1})
+    refresh = Refresher({'lat': 2})
+
+    assert cache.get('Lyon 1', refresh) == {'lat': 1}
+    assert cache.get('Otra') is None
+    assert refresh.calls == 0
+    assert (cache.stats['hit'], cache.stats['miss']) == (1, 1)
+
+
+def test_stale_served_and_refreshed_in_background():
+    cache = make_cache()
+    cache.set('Lyon 1', {'lat': 1})
+    age(cache, 'Lyon 1')
+    refresh = Refresher({'lat': 2})
+
+    # Primer hit vencido: aún no es popular (hot_hits=2), se sirve sin refrescar
+    assert cache.get('Lyon 1', refresh) == {'lat': 1}
+    drain(cache)
+    assert refresh.calls == 0
+
+    # Segundo: se sirve el valor viejo y se refresca en segundo plano
+    assert cache.get('Lyon 1', refresh) == {'lat': 1}
+    drain(cache)
+    assert refresh.calls == 1
+    assert cache.get('Lyon 1', refresh) == {'lat': 2}
+    assert cache.stats['stale'] == 2
+    assert cache.stats['refreshed'] == 1
+    assert cache.cache['Lyon 1']['hits'] == 1
+
+
+def test_refresh_is_single_flight():
+    cache = make_cache(hot_hits=0)
+    cache.set('Lyon 1', {'lat': 1})
+    age(cache, 'Lyon 1')
+    gate = threading.Event()
+    refresh = Refresher({'lat': 2}, gate=gate)
+
+    for _ in range(5):
+        assert cache.get('Lyon 1', refresh) == {'lat': 1}
+    assert cache.summary()['refreshing'] == 1
+    gate.set()
+    drain(cache)
+
+    assert refresh.calls == 1
+    assert cache.refreshing == set()
+
+
+def test_failed_refresh_keeps_old_value():
+    cache = make_cache(hot_hits=0)
+    cache.set('Lyon 1', {'lat': 1})
+    age(cache, 'Lyon 1')
+
+    def broken():
+        raise RuntimeError('Google caído')
+
+    cache.get('Lyon 1', Refresher(None))
+    drain(cache)
+    cache.get('Lyon 1', broken)
+    drain(cache)
+
+    assert cache.get('Lyon 1') == {'lat': 1}
+    assert cache.stats['refresh_failed'] == 2
+    assert cache.refreshing == set()
+
+
+def test_expired_entry_is_removed():
+    cache = make_cache(hot_hits=0)
+    cache.set('Lyon 1', {'lat': 1})
+    age(cache, 'Lyon 1', expired=True)
+    refresh = Refresher({'lat': 2})
+
+    assert cache.get('Lyon 1', refresh) is None
+    drain(cache)
+    assert refresh.calls == 0
+    assert 'Lyon 1' not in cache.cache
+    assert cache.summary()['entries'] == 0
+    assert cache.size_bytes == 0
+
+
+def test_refresh_bypasses_address_index(db, google_client, monkeypatch):
+    from app.services import router_service
+
+    indexed = {'formatted_address': 'Lyon 1, Providencia', 'lat': -33.42, 'lng': -70.61,
+               'granularity': 'PREMISE', 'validation_level': 'accept', 'confidence': 0.9,
+               'location_type': 'ROOFTOP', 'place_id': 'indexed'}
+    monkeypatch.setattr(router_service, 'find_indexed_address', lambda address: indexed)
+    service = router_service.RouterService()
+    service.client = google_client
+
+    assert service._geocode_uncached('Lyon 1')['place_id'] == 'indexed'
+    assert google_client.calls['geocode'] == 0
+
+    refreshed = service._refresh_geocode('Lyon 1')
+    assert refreshed['place_id'] == 'place-Lyon 1'
+    assert google_client.calls['geocode'] == 1
+
+
+@pytest.mark.parametrize('kind, value, removed', [
+    ('key', 'Lyon 1', 1), ('prefix', 'lyon', 2), ('place_id', 'p3', 1), ('all', None, 3),
+])
+def test_invalidate(kind, value, removed):
+    cache = make_cache()
+    cache.set('Lyon 1', {'place_id': 'p1'})
+    cache.set('Lyon 2', {'place_id': 'p2'})
+    cache.set('Suecia 3', {'place_id': 'p3'})
+
+    assert cache.invalidate(kind, value) == removed
+    assert len(cache.cache) == 3 - removed
+    assert cache.stats['invalidated'] == removed
+
+
+def test_background_refresh_runs_in_app_context(db):
+    from flask import has_app_context
+    from sqlalchemy import text
+
+    def refresh():
+        # Como _refresh_geocode/_refresh_route: BD y sync de invalidaciones
+        assert has_app_context()
+        return {'lat': db.session.execute(text('SELECT 2')).scalar()}
+
+    cache = make_cache(hot_hits=1)
+    cache.set('Lyon 1', {'lat': 1})
+    age(cache, 'Lyon 1')
+
+    assert cache.get('Lyon 1', refresh) == {'lat': 1}
+    drain(cache)
+
+    assert cache.stats['refreshed'] == 1
+    assert cache.get('Lyon 1') == {'lat': 2}
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.address_index import address_recorder
+
+
+@pytest.fixture
+def service(db, google_client, monkeypatch):
+    from app.services import router_service
+
+    monkeypatch.setattr(router_service, 'find_indexed_address', lambda address: None)
+    service = router_service.RouterService()
+    service.client = google_client
+    with address_recorder.lock:
+        address_recorder.pending = {}
+    yield service
+    with address_recorder.lock:
+        address_recorder.pending = {}
+
+
+def recorded_hits():
+    return [row['hit_count'] for row in address_recorder.pending.values()]
+
+
+def test_records_once_per_quote_not_per_cache_hit(service, google_client):
+    service.validate_and_geocode_address('Lyon 1, Providencia')
+    service.validate_and_geocode_address('Lyon 1, Providencia')
+    assert recorded_hits() == []
+
+    for _ in range(2):
+        assert service.get_distance_and_time('', 'Lyon 1, Providencia')['success']
+
+    assert recorded_hits() == [2]
+    assert google_client.calls['geocode'] == 1
+
+
+def test_index_refresh_loads_off_request(app, db):
+    import time
+
+    from app.models import AddressSuggestion
+    from app.services.address_index import AddressPrefixIndex, fold_address
+
+    db.session.add(AddressSuggestion(
+        address_key=AddressSuggestion.make_address_key(fold_address('Av. Providencia 1234, Providencia')),
+        formatted_address='Av. Providencia 1234, Providencia', lat=-33.42, lng=-70.61,
+        validation_level='accept', hit_count=3))
+    db.session.commit()
+    index = AddressPrefixIndex(refresh_interval=60)
+
+    # Disparado desde un request; la carga corre en un hilo con su propio contexto de app
+    with app.test_request_context():
+        index.refresh_if_due()
+    deadline = time.monotonic() + 5
+    while index.loaded_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [s['formatted_address'] for s in index.suggest('providencia 12', 5)] == \
+        ['Av. Providencia 1234, Providencia']
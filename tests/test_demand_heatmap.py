@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import pytest
+
+from app.services.demand_heatmap import HEATMAP_LEVELS, demand_aggregator, record_checkout_demand
+
+
+@pytest.fixture(autouse=True)
+def empty_aggregator():
+    with demand_aggregator.lock:
+        demand_aggregator.pending = {}
+    yield
+    with demand_aggregator.lock:
+        demand_aggregator.pending = {}
+
+
+def test_checkout_counts_once_with_cheapest_rate():
+    record_checkout_demand([(-33.43, -70.61, 5.0, 4000), (-33.43, -70.61, 4.2, 2500)])
+    record_checkout_demand([])
+
+    cells = list(demand_aggregator.pending.values())
+    assert len(cells) == len(HEATMAP_LEVELS)
+    assert all(cell == [1, 4.2, 2500] for cell in cells)
+
+
+def test_rebuild_groups_rows_of_one_checkout():
+    from rebuild_heatmap import group_checkouts
+
+    at = datetime(2026, 3, 2, 12, 0, 0, 1000)
+    rows = [
+        (1, 's1', at, -33.43, -70.61, 5.0, 4000, 1),
+        (2, 's1', at.replace(microsecond=9000), -33.43, -70.61, 4.2, 2500, 1),
+        # Sin sesión: cada fila es un checkout
+        (3, None, at, -33.43, -70.61, 5.0, 4000, 1),
+        (4, None, at, -33.43, -70.61, 5.0, 4000, 1),
+        # Modo dedup: los hits son del checkout, no se suman entre métodos
+        (5, 's2', at, -33.50, -70.70, 3.0, 3000, 3),
+        (6, 's2', at, -33.50, -70.70, 3.0, 2000, 3),
+    ]
+
+    checkouts = sorted(group_checkouts(rows), key=lambda checkout: checkout[4])
+    assert [(checkout[3], checkout[4], checkout[5]) for checkout in checkouts] == [
+        (3.0, 2000, 3), (4.2, 2500, 1), (5.0, 4000, 1), (5.0, 4000, 1)
+    ]
@@ -0,0 +1,25 @@
+import logging
+import queue
+import sys
+
+from app.services.log_pipeline import NonBlockingQueueHandler
+
+
+def test_prepare_merges_args_before_enqueue():
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    cart = {'items': 1}
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = logging.LogRecord('test', logging.ERROR, __file__, 1, 'carrito %s', (cart,), sys.exc_info())
+
+    handler.handle(record)
+    cart['items'] = 2
+
+    queued = log_queue.get_nowait()
+    assert queued.getMessage() == "carrito {'items': 1}"
+    assert queued.args is None and queued.exc_info is None
+    assert 'ValueError: boom' in queued.exc_text
+    # El registro original no se modifica (otros handlers)
+    assert record.args is not None and record.exc_info is not None
@@ -0,0 +1,150 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app import db
+from app import models  # noqa: F401  (registra las tablas en db.metadata)
+from app.migrations import (
+    LATEST_VERSION, MIGRATIONS, applied_versions, current_version, migrate_on_boot, pending_migrations,
+    stamp, upgrade
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def create_legacy_methods(engine):
+    """shipping_methods previa a la migración 001 (sin columnas por día)"""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE shipping_methods (
+                id INTEGER PRIMARY KEY,
+                code VARCHAR(50) NOT NULL,
+                name VARCHAR(100) NOT NULL
+            )
+        """))
+        conn.execute(text("INSERT INTO shipping_methods (id, code, name) VALUES "
+                          "(1, 'envio_hoy', 'Envío Hoy'), (2, 'normal', 'Normal')"))
+
+
+def test_upgrade_applies_everything_once(engine):
+    db.metadata.create_all(engine)
+
+    assert current_version(engine) == 0
+    assert upgrade(engine) == [m.version for m in MIGRATIONS]
+    assert current_version(engine) == LATEST_VERSION
+    assert upgrade(engine) == []
+    assert pending_migrations(applied_versions(engine)) == []
+
+
+def test_baseline_creates_schema_on_empty_database(engine):
+    upgrade(engine)
+
+    tables = set(inspect(engine).get_table_names())
+    assert set(db.metadata.tables) <= tables
+    columns = {c['name'] for c in inspect(engine).get_columns('shipping_quotes')}
+    assert {'origin_id', 'dedup_key', 'hit_count'} <= columns
+
+
+def test_baseline_repairs_database_stamped_without_tables(engine):
+    # Base marcada 1..10 por un arranque anterior sin la migración 000
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE schema_version (version INT NOT NULL PRIMARY KEY, "
+                          "name VARCHAR(100) NOT NULL, applied_at DATETIME NOT NULL)"))
+        for migration in MIGRATIONS[1:]:
+            conn.execute(text("INSERT INTO schema_version VALUES (:v, :n, CURRENT_TIMESTAMP)"),
+                         {'v': migration.version, 'n': migration.name})
+
+    assert upgrade(engine) == [0]
+    assert inspect(engine).has_table('shipping_zones')
+
+
+def test_migration_fails_when_table_is_missing(engine):
+    with pytest.raises(RuntimeError):
+        with engine.begin() as conn:
+            MIGRATIONS[2].upgrade(conn)
+
+
+def test_migrations_are_idempotent(engine):
+    # Adoptar una base creada con create_all: todas las migraciones deben ser no-op
+    db.metadata.create_all(engine)
+    before = {table: inspect(engine).get_columns(table) for table in inspect(engine).get_table_names()}
+
+    upgrade(engine)
+    for migration in MIGRATIONS:
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+
+    after = {table: inspect(engine).get_columns(table) for table in inspect(engine).get_table_names()}
+    assert set(after) == set(before) | {'schema_version'}
+    for table, columns in before.items():
+        assert [c['name'] for c in after[table]] == [c['name'] for c in columns]
+
+
+def test_weekday_migration_on_legacy_table(engine):
+    create_legacy_methods(engine)
+
+    upgrade(engine, target=1)
+    assert current_version(engine) == 1
+
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text(
+            "SELECT code, available_saturday FROM shipping_methods ORDER BY id"
+        )).all())
+    assert rows == {'envio_hoy': 0, 'normal': 1}
+
+    # Volver a ejecutarla no pisa cambios hechos desde el panel
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE shipping_methods SET available_saturday = TRUE WHERE code = 'envio_hoy'"))
+        MIGRATIONS[0].upgrade(conn)
+        assert conn.execute(text(
+            "SELECT available_saturday FROM shipping_methods WHERE code = 'envio_hoy'"
+        )).scalar() == 1
+
+
+def test_upgrade_resumes_from_partial_version(engine):
+    create_legacy_methods(engine)
+    upgrade(engine, target=3)
+
+    assert upgrade(engine) == list(range(4, LATEST_VERSION + 1))
+    assert 'pricing_mode' in {c['name'] for c in inspect(engine).get_columns('shipping_methods')}
+    assert inspect(engine).has_table('cache_invalidations')
+
+
+def test_stamp_skips_migrations(engine):
+    stamp(engine, 5)
+    assert current_version(engine) == 5
+    assert not inspect(engine).has_table('google_api_usage')
+
+    # Sellar hacia atrás no borra versiones
+    stamp(engine, 2)
+    assert current_version(engine) == 5
+
+
+def test_migrate_on_boot_fails_on_error(engine, monkeypatch):
+    def broken(conn):
+        raise RuntimeError('DDL rechazado')
+
+    from app import migrations
+
+    patched = list(MIGRATIONS)
+    patched[3] = patched[3]._replace(upgrade=broken)
+    monkeypatch.setattr(migrations, 'MIGRATIONS', patched)
+    with pytest.raises(RuntimeError):
+        migrate_on_boot(engine)
+    assert current_version(engine) == 2
+
+
+def test_migrate_on_boot(engine):
+    db.metadata.create_all(engine)
+
+    migrate_on_boot(engine, auto_migrate=False)
+    assert current_version(engine) == 0
+
+    migrate_on_boot(engine)
+    assert current_version(engine) == LATEST_VERSION
+    migrate_on_boot(engine)
+    assert current_version(engine) == LATEST_VERSION
@@ -0,0 +1,112 @@
+from datetime import datetime, time
+
+import numpy as np
+import pytest
+
+from app.services.pricing_simulator import ZoneTable, build_history, chunk_columns, offered_prices
+
+# (min_km, max_km, precio, origen): la zona 4 se traslapa con 1 y 2 (dato previo a la
+# validación del panel), 1 y 2 comparten el límite de 5 km y la 5 es la única del origen 2
+ZONES = [
+    (0, 5, 1000, None),
+    (5, 10, 2000, None),
+    (0, 3, 1500, 1),
+    (4, 8, 3000, None),
+    (2, 6, 2500, 2),
+    (3, 3.5, 1800, 1),
+]
+DISTANCES = [0, 1, 2.5, 3, 3.2, 3.5, 4, 4.5, 5, 5.5, 6, 7.9, 8, 9.99, 10, 10.5]
+ORIGINS = [None, 1, 2]
+
+
+@pytest.fixture
+def zones(db):
+    from app.models import ShippingOrigin, ShippingZone
+
+    for origin_id in (1, 2):
+        db.session.add(ShippingOrigin(id=origin_id, name=f'Bodega {origin_id}', code=f'b{origin_id}',
+                                      lat=-33.4, lng=-70.6))
+    db.session.add_all([
+        ShippingZone(min_km=min_km, max_km=max_km, price_clp=price, origin_id=origin_id)
+        for min_km, max_km, price, origin_id in ZONES
+    ])
+    db.session.commit()
+    return [{'id': zone.id, 'zone_type': 'distance', 'min_km': zone.min_km, 'max_km': zone.max_km,
+             'price_clp': zone.price_clp, 'origin_id': zone.origin_id, 'is_active': True}
+            for zone in ShippingZone.query.order_by(ShippingZone.id)]
+
+
+def test_zone_table_matches_live_rule(zones):
+    from app.routes.shipping import find_zone_for_distance
+
+    shared = ZoneTable([zone for zone in zones if zone['origin_id'] is None])
+    for origin_id in ORIGINS:
+        scoped = ZoneTable([zone for zone in zones if zone['origin_id'] == origin_id]) if origin_id else None
+        for distance in DISTANCES:
+            live = find_zone_for_distance(distance, origin_id)
+            zone_id, price = scoped.lookup(np.array([distance])) if scoped else (np.array([-1]), None)
+            if zone_id[0] < 0:
+                zone_id, price = shared.lookup(np.array([distance]))
+            assert zone_id[0] == (live.id if live else -1), (origin_id, distance)
+
+
+def test_offered_prices_match_live_rule(zones):
+    from app.routes.shipping import find_zone_for_distance
+
+    cases = [(origin_id, distance) for origin_id in ORIGINS for distance in DISTANCES]
+    created = np.array([datetime(2026, 3, 2, 12, 0, i % 60) for i in range(len(cases))],
+                       dtype='datetime64[us]').astype(np.int64)
+    history = build_history(
+        key=np.arange(len(cases), dtype=np.int64),
+        created=created,
+        method=np.ones(len(cases), dtype=np.int64),
+        origin=np.array([-1 if origin_id is None else origin_id for origin_id, _ in cases], dtype=np.int64),
+        zone=np.full(len(cases), -1, dtype=np.int64),
+        distance=np.array([distance for _, distance in cases], dtype=np.float64),
+        price=np.zeros(len(cases), dtype=np.int64),
+        hit=np.ones(len(cases), dtype=np.int64),
+    )
+    method = {'id': 1, 'code': 'normal', 'name': 'Normal', 'is_active': True,
+              'start_time': time(0, 0), 'end_time': time(23, 59, 59), 'weekdays': (True,) * 7,
+              'max_km': 100.0, 'pricing_mode': 'distance', 'origin_id': None}
+
+    _, prices = offered_prices(history, {'methods': [method], 'zones': zones})
+
+    # El orden de los checkouts sigue la clave (np.unique)
+    for index, (origin_id, distance) in enumerate(cases):
+        live = find_zone_for_distance(distance, origin_id)
+        assert prices[0][index] == (live.price_clp if live else -1), (origin_id, distance)
+
+
+def test_lookup_prefers_lower_min_km_then_id():
+    zones = [
+        {'id': 7, 'min_km': 0.0, 'max_km': 5.0, 'price_clp': 700, 'origin_id': None},
+        {'id': 3, 'min_km': 0.0, 'max_km': 5.0, 'price_clp': 300, 'origin_id': None},
+        {'id': 1, 'min_km': 2.0, 'max_km': 9.0, 'price_clp': 100, 'origin_id': None},
+    ]
+    zone_ids, prices = ZoneTable(zones).lookup(np.array([1.0, 4.0, 5.0, 7.0, 9.5]))
+
+    assert zone_ids.tolist() == [3, 3, 3, 1, -1]
+    assert prices.tolist() == [300, 300, 300, 100, 0]
+
+
+def test_checkouts_without_session_or_method():
+    at = datetime(2026, 3, 2, 12, 0, 0)
+    # (id, session_id, created_at, método, origen, zona, km, precio, hits)
+    rows = [
+        (6, 's1', at, 2, 1, 1, 4.0, 2000, 1),
+        (5, 's1', at, 1, 1, 1, 4.0, 1000, 1),
+        # Sin sesión, mismo segundo: checkouts distintos
+        (4, None, at, 1, 1, 1, 4.0, 1000, 1),
+        (3, None, at, 1, 1, 1, 4.0, 1000, 1),
+        # Sin método: se descarta
+        (2, 's2', at, None, 1, 1, 4.0, 0, 1),
+        (1, 's3', at, 1, 1, 1, 4.0, 1000, 1),
+    ]
+
+    history = build_history(**chunk_columns(rows))
+
+    assert history.rows == 5
+    assert history.checkouts == 4
+    assert sorted(history.pair_method.tolist()) == [1, 1, 1, 1, 2]
+    assert history.weight.tolist() == [1, 1, 1, 1]
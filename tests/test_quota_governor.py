@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+from app.services.quota_governor import QuotaExceeded, QuotaGovernor
+from app.services.usage import track_endpoint
+
+CHECKOUT, INTERACTIVE, BACKGROUND = 0, 1, 2
+RATE = 10
+
+
+@pytest.fixture
+def make_governor(tmp_path):
+    path = str(tmp_path / 'quota')
+
+    def make(max_wait=(0, 0, 0), reserve=(0, 0.2, 0.5), **kwargs):
+        return QuotaGovernor({'geocode': RATE, 'distance_matrix': 0}, path=path, enabled=True,
+                             max_wait=max_wait, reserve=reserve, **kwargs)
+    return make
+
+
+def set_tokens(governor, tokens, waiting=None):
+    with governor.state.locked() as buckets:
+        bucket, current = buckets.get('geocode')
+        buckets.put('geocode', [tokens, time.time(), 0.0], waiting or current)
+
+
+def test_refill(make_governor):
+    governor = make_governor()
+    now = 1000.0
+
+    # Estado nuevo: bucket lleno
+    assert governor._refill('geocode', [0.0, 0.0, 0.0], now) == [RATE, now, 0.0]
+    assert governor._refill('geocode', [2.0, now - 0.5, 0.0], now) == [7.0, now, 0.0]
+    # Tope = 1 s de tasa; reloj que retrocede reinicia el bucket
+    assert governor._refill('geocode', [5.0, now - 30, 0.0], now)[0] == RATE
+    assert governor._refill('geocode', [1.0, now + 5, 9.0], now) == [RATE, now, 0.0]
+
+
+def test_bucket_limits_burst(make_governor):
+    governor = make_governor()
+
+    for _ in range(RATE):
+        governor.acquire('geocode', priority=CHECKOUT)
+    with pytest.raises(QuotaExceeded) as error:
+        governor.acquire('geocode', priority=CHECKOUT)
+    assert (error.value.api, error.value.priority) == ('geocode', 'checkout')
+
+
+def test_waits_for_refill_within_max_wait(make_governor):
+    governor = make_governor(max_wait=(1, 1, 1))
+    set_tokens(governor, 0)
+
+    start = time.monotonic()
+    governor.acquire('geocode', priority=CHECKOUT)
+    # 1 token a 10/s: ~0.1 s
+    assert 0.05 <= time.monotonic() - start < 0.8
+
+
+def test_reserve_is_kept_for_higher_priorities(make_governor):
+    governor = make_governor()
+    set_tokens(governor, 5.5)
+
+    # background no baja de 0.5 * 10 tokens, interactive sí puede llegar a 2
+    with pytest.raises(QuotaExceeded):
+        governor.acquire('geocode', priority=BACKGROUND)
+    governor.acquire('geocode', units=3, priority=INTERACTIVE)
+    governor.acquire('geocode', units=2, priority=CHECKOUT)
+
+
+def test_announced_wait_blocks_lower_priorities(make_governor):
+    governor = make_governor(max_wait=(0.2, 0.2, 0.2))
+    set_tokens(governor, RATE, waiting=[time.time() + 5, 0.0, 0.0])
+
+    with pytest.raises(QuotaExceeded):
+        governor.acquire('geocode', priority=BACKGROUND)
+    governor.acquire('geocode', priority=CHECKOUT)
+
+
+def test_checkout_served_before_background(make_governor):
+    governor = make_governor(max_wait=(2, 2, 2), reserve=(0, 0, 0))
+    set_tokens(governor, 0)
+    order = []
+
+    def take(priority):
+        governor.acquire('geocode', units=5, priority=priority)
+        order.append(priority)
+
+    background = threading.Thread(target=take, args=(BACKGROUND,))
+    background.start()
+    time.sleep(0.05)
+    checkout = threading.Thread(target=take, args=(CHECKOUT,))
+    checkout.start()
+    background.join()
+    checkout.join()
+
+    assert order == [CHECKOUT, BACKGROUND]
+
+
+def test_priority_from_endpoint(make_governor):
+    governor = make_governor()
+    set_tokens(governor, 3)
+
+    with track_endpoint('batch'):
+        with pytest.raises(QuotaExceeded) as error:
+            governor.acquire('geocode')
+    assert error.value.priority == 'background'
+    with track_endpoint('callback'):
+        governor.acquire('geocode', units=3)
+
+
+def test_state_shared_between_instances(make_governor):
+    first, second = make_governor(), make_governor()
+
+    first.acquire('geocode', units=RATE, priority=CHECKOUT)
+    with pytest.raises(QuotaExceeded):
+        second.acquire('geocode', priority=CHECKOUT)
+
+
+def test_penalize_pauses_all_instances(make_governor):
+    governor = make_governor(max_wait=(0.3, 0.3, 0.3), cooldown=0.5)
+    other = make_governor(max_wait=(1, 1, 1), cooldown=0.5)
+
+    governor.penalize('geocode')
+    with pytest.raises(QuotaExceeded):
+        governor.acquire('geocode', priority=CHECKOUT)
+
+    start = time.monotonic()
+    other.acquire('geocode', priority=CHECKOUT)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_disabled_and_unlimited_apis(make_governor, tmp_path):
+    governor = make_governor()
+    set_tokens(governor, 0)
+
+    # Tasa 0: sin límite
+    for _ in range(100):
+        governor.acquire('distance_matrix', units=25, priority=BACKGROUND)
+
+    disabled = QuotaGovernor({'geocode': RATE}, path=str(tmp_path / 'quota'), enabled=False)
+    for _ in range(RATE * 3):
+        disabled.acquire('geocode', priority=BACKGROUND)
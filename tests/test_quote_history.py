@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.routes.shipping import decode_quote_cursor, encode_quote_cursor
+
+BASE = datetime(2026, 3, 2, 12, 0, 0)
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 2, 12, 30, 15, 123456)
+    cursor = encode_quote_cursor(created_at, 987)
+
+    assert '=' not in cursor
+    assert decode_quote_cursor(cursor) == (created_at, 987)
+
+
+@pytest.mark.parametrize('cursor', ['', 'no-es-base64!', encode_quote_cursor(BASE, 1)[:-4]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_quote_cursor(cursor)
+
+
+@pytest.fixture
+def quotes(db):
+    """25 cotizaciones; grupos de 5 comparten created_at para forzar el desempate por id"""
+    from app.models import ShippingQuote
+
+    rows = [
+        ShippingQuote(destination_address=f'Calle {i}', distance_km=1.0 + i, price_clp=1000 + 100 * i,
+                      session_id='s1' if i % 2 else 's2', created_at=BASE + timedelta(minutes=i // 5))
+        for i in range(25)
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return sorted(rows, key=lambda q: (q.created_at, q.id), reverse=True)
+
+
+def fetch_all(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        data = client.get('/shipping/admin/api/quotes', query_string=query).get_json()
+        assert data['success']
+        assert data['count'] == len(data['quotes'])
+        assert data['has_more'] == (data['next_cursor'] is not None)
+        pages.append([q['id'] for q in data['quotes']])
+        cursor = data['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_pages_cover_ties_in_order(admin_client, quotes):
+    pages = fetch_all(admin_client, limit=4)
+
+    # Los cortes caen dentro de grupos con el mismo created_at
+    assert [len(page) for page in pages] == [4] * 6 + [1]
+    assert [quote_id for page in pages for quote_id in page] == [q.id for q in quotes]
+
+
+def test_pages_with_filters(admin_client, quotes):
+    pages = fetch_all(admin_client, limit=3, session_id='s1', min_price=1500)
+
+    expected = [q.id for q in quotes if q.session_id == 's1' and q.price_clp >= 1500]
+    assert [quote_id for page in pages for quote_id in page] == expected
+
+
+def test_exact_page_has_no_next_cursor(admin_client, quotes):
+    data = admin_client.get('/shipping/admin/api/quotes', query_string={'limit': 25}).get_json()
+
+    assert data['count'] == 25
+    assert data['next_cursor'] is None
+
+
+def test_bad_params_return_400(admin_client, quotes):
+    assert admin_client.get('/shipping/admin/api/quotes?cursor=basura').status_code == 400
+    assert admin_client.get('/shipping/admin/api/quotes?date_from=ayer').status_code == 400
+    assert admin_client.get('/shipping/admin/api/quotes?method=inexistente').status_code == 400
+
+
+def test_stats_require_admin_and_count_hits(app, admin_client, quotes, db):
+    from app.models import ShippingQuote
+
+    assert app.test_client().get('/shipping/admin/api/quotes/stats').status_code == 302
+
+    ShippingQuote.query.filter_by(id=quotes[0].id).update({'hit_count': 4})
+    db.session.commit()
+    stats = admin_client.get('/shipping/admin/api/quotes/stats').get_json()['stats']
+    assert (stats['total_quotes'], stats['stored_rows']) == (28, 25)
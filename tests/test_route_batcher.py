@@ -0,0 +1,163 @@
+import threading
+import time
+
+import pytest
+
+from app.services.route_batcher import RouteBatcher
+
+ORIGIN = {'lat': -33.43, 'lng': -70.61}
+OTHER_ORIGIN = {'lat': -33.50, 'lng': -70.70}
+
+
+def point(n):
+    return {'lat': -33.0 - n / 100, 'lng': -70.0}
+
+
+class FakeMatrix:
+    """fetch_matrix falso: registra cada llamada y responde {origen, destino} por elemento"""
+
+    def __init__(self, fail_first=False, gate=None):
+        self.calls = []
+        self.fail_first = fail_first
+        self.gate = gate
+        self.lock = threading.Lock()
+
+    def __call__(self, origins, destinations):
+        with self.lock:
+            self.calls.append((list(origins), list(destinations)))
+            fail = self.fail_first and len(self.calls) == 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if fail:
+            raise RuntimeError('Distance Matrix caído')
+        return [[{'origin': origin['lat'], 'destination': destination['lat']} for origin in origins]
+                for destination in destinations]
+
+
+def run_concurrently(batcher, origins, destinations):
+    """Un hilo por destino, todos a la vez; retorna resultado o excepción por destino"""
+    barrier = threading.Barrier(len(destinations))
+    results = [None] * len(destinations)
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = batcher.calculate(origins, destinations[index])
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(destinations))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_share_one_call():
+    matrix = FakeMatrix()
+    batcher = RouteBatcher(matrix, max_wait_ms=300, max_elements=25)
+    destinations = [point(n) for n in range(5)]
+
+    results = run_concurrently(batcher, [ORIGIN, OTHER_ORIGIN], destinations)
+
+    assert len(matrix.calls) == 1
+    assert len(matrix.calls[0][1]) == 5
+    for destination, routes in zip(destinations, results):
+        assert routes == [{'origin': ORIGIN['lat'], 'destination': destination['lat']},
+                          {'origin': OTHER_ORIGIN['lat'], 'destination': destination['lat']}]
+
+
+def test_repeated_destination_shares_element():
+    matrix = FakeMatrix()
+    batcher = RouteBatcher(matrix, max_wait_ms=300, max_elements=25)
+
+    results = run_concurrently(batcher, [ORIGIN], [point(1), point(1), point(1), point(2)])
+
+    assert len(matrix.calls) == 1
+    assert sorted(d['lat'] for d in matrix.calls[0][1]) == sorted([point(1)['lat'], point(2)['lat']])
+    assert results[0] == results[1] == results[2] == [{'origin': ORIGIN['lat'], 'destination': point(1)['lat']}]
+
+
+def test_max_elements_splits_batches():
+    matrix = FakeMatrix()
+    # 2 orígenes × 3 destinos = 6 elementos por llamada
+    batcher = RouteBatcher(matrix, max_wait_ms=1000, max_elements=6)
+    destinations = [point(n) for n in range(6)]
+
+    results = run_concurrently(batcher, [ORIGIN, OTHER_ORIGIN], destinations)
+
+    assert sorted(len(call[1]) for call in matrix.calls) == [3, 3]
+    assert [routes[0]['destination'] for routes in results] == [d['lat'] for d in destinations]
+
+
+def test_different_origins_are_not_mixed():
+    matrix = FakeMatrix()
+    batcher = RouteBatcher(matrix, max_wait_ms=50, max_elements=25)
+
+    batcher.calculate([ORIGIN], point(1))
+    batcher.calculate([OTHER_ORIGIN], point(1))
+
+    assert [call[0] for call in matrix.calls] == [[ORIGIN], [OTHER_ORIGIN]]
+
+
+def test_error_is_raised_in_every_request_and_next_batch_works():
+    matrix = FakeMatrix(fail_first=True)
+    batcher = RouteBatcher(matrix, max_wait_ms=300, max_elements=25)
+
+    results = run_concurrently(batcher, [ORIGIN], [point(n) for n in range(3)])
+
+    assert len(matrix.calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.open == {}
+    assert batcher.calculate([ORIGIN], point(9)) == [{'origin': ORIGIN['lat'], 'destination': point(9)['lat']}]
+
+
+def test_follower_times_out():
+    gate = threading.Event()
+    matrix = FakeMatrix(gate=gate)
+    batcher = RouteBatcher(matrix, max_wait_ms=50, max_elements=25, timeout=0.2)
+
+    leader = threading.Thread(target=batcher.calculate, args=([ORIGIN, OTHER_ORIGIN], point(1)))
+    leader.start()
+    while not batcher.open:
+        time.sleep(0.001)
+    try:
+        assert batcher.calculate([ORIGIN, OTHER_ORIGIN], point(2)) == [None, None]
+    finally:
+        gate.set()
+        leader.join()
+
+
+@pytest.mark.parametrize('origins, max_elements', [([ORIGIN], 1), ([ORIGIN, OTHER_ORIGIN], 3)])
+def test_no_room_for_batch_calls_directly(origins, max_elements):
+    matrix = FakeMatrix()
+    batcher = RouteBatcher(matrix, max_wait_ms=1000, max_elements=max_elements)
+
+    batcher.calculate(origins, point(1))
+    batcher.calculate(origins, point(2))
+
+    assert [call[1] for call in matrix.calls] == [[point(1)], [point(2)]]
+    assert batcher.open == {}
+
+
+def test_route_matrix_respects_distance_matrix_limits(db, google_client, monkeypatch):
+    from app.services import router_service
+
+    shapes = []
+    distance_matrix = google_client.distance_matrix
+
+    def recording(origins, destinations, **kwargs):
+        shapes.append((len(origins), len(destinations)))
+        return distance_matrix(origins, destinations, **kwargs)
+
+    monkeypatch.setattr(google_client, 'distance_matrix', recording)
+    service = router_service.RouterService()
+    service.client = google_client
+
+    origins = [point(n) for n in range(30)]
+    routes = service._fetch_route_matrix(origins, [point(100 + n) for n in range(5)])
+
+    # 25 orígenes × 4 destinos = 100 elementos; el resto en llamadas aparte
+    assert shapes == [(25, 4), (25, 1), (5, 5)]
+    assert len(routes) == 5 and all(len(row) == 30 and all(row) for row in routes)
@@ -0,0 +1,111 @@
+import io
+import json
+
+import pytest
+
+from app.services.traffic_capture import Redactor, TrafficCaptureMiddleware
+
+PAYLOAD = {
+    'request': {
+        'cart_id': 'cart-123',
+        'customer': {'name': 'Ana', 'email': 'ana@example.com'},
+        'to': {
+            'name': 'Ana Pérez',
+            'phone': '+56911111111',
+            'address': 'Av. Providencia 1234',
+            'street_number': '1234',
+            'municipality_name': 'Providencia',
+            'region_name': 'Metropolitana',
+            'city': 'Santiago',
+        },
+        'products': [{'sku': 'A1', 'customer_note': 'tocar timbre'}],
+    }
+}
+
+
+def test_none_mode_keeps_payload():
+    assert Redactor('none').redact(PAYLOAD) == PAYLOAD
+
+
+def test_contact_mode_drops_contact_data_and_hashes_ids():
+    redacted = Redactor('contact').redact(PAYLOAD)['request']
+
+    assert 'customer' not in redacted
+    assert set(redacted['to']) == {'address', 'street_number', 'municipality_name', 'region_name', 'city'}
+    assert redacted['to']['address'] == 'Av. Providencia 1234'
+    assert redacted['products'] == [{'sku': 'A1'}]
+    assert redacted['cart_id'].startswith('cart_id-') and 'cart-123' not in redacted['cart_id']
+
+
+def test_address_mode_hashes_street_but_keeps_commune():
+    redacted = Redactor('address').redact(PAYLOAD)['request']['to']
+
+    assert redacted['address'].startswith('addr-')
+    assert redacted['street_number'].startswith('addr-')
+    assert redacted['municipality_name'] == 'Providencia'
+    assert redacted['region_name'] == 'Metropolitana'
+
+    quote = Redactor('address').redact({'destination': 'Av.  Providencia 1234, Providencia, Chile',
+                                        'origin': 'Lyon 1, Providencia', 'session_id': 's1'})
+    street, rest = quote['destination'].split(',', 1)
+    assert street.startswith('addr-') and rest == ' Providencia, Chile'
+    street, rest = quote['origin'].split(',', 1)
+    assert street.startswith('addr-') and rest == ' Providencia'
+
+
+def test_replay_counts_only_billed_google_calls():
+    from replay_traffic import google_calls_from_metrics
+
+    class Metrics:
+        status_code = 200
+        text = '\n'.join([
+            '# TYPE shipping_google_api_calls_total counter',
+            'shipping_google_api_calls_total{api="geocode",status="OK"} 10.0',
+            'shipping_google_api_calls_total{api="geocode",status="ZERO_RESULTS"} 2.0',
+            'shipping_google_api_calls_total{api="distance_matrix",status="THROTTLED"} 7.0',
+            'shipping_google_api_calls_total{api="distance_matrix",status="REQUEST_DENIED"} 1.0',
+            'shipping_google_api_calls_total{api="distance_matrix",status="Timeout"} 1.0',
+        ])
+
+    class Session:
+        def get(self, url, timeout):
+            return Metrics()
+
+    assert google_calls_from_metrics(Session(), 'http://localhost:5000') == 12.0
+
+
+def test_hashes_are_stable_per_salt():
+    same = Redactor('address', salt='s1')
+    # Normaliza mayúsculas y espacios: la repetición de direcciones se conserva
+    assert same.redact({'address': 'Lyon 1'}) == same.redact({'address': '  lyon   1 '})
+    assert same.redact({'cart_id': 'c1'}) == Redactor('contact', salt='s1').redact({'cart_id': 'c1'})
+    assert same.redact({'cart_id': 'c1'}) != Redactor('address', salt='s2').redact({'cart_id': 'c1'})
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        Redactor('everything')
+
+
+def test_middleware_writes_redacted_ndjson(tmp_path):
+    def wsgi_app(environ, start_response):
+        body = environ['wsgi.input'].read()
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [body]
+
+    middleware = TrafficCaptureMiddleware(wsgi_app, str(tmp_path / 'capture.ndjson'), redact='contact')
+    raw = json.dumps(PAYLOAD).encode('utf-8')
+    environ = {'REQUEST_METHOD': 'POST', 'PATH_INFO': '/shipping/api/jumpseller/callback',
+               'CONTENT_LENGTH': str(len(raw)), 'wsgi.input': io.BytesIO(raw)}
+    statuses = []
+
+    assert middleware(environ, lambda status, headers, exc_info=None: statuses.append(status)) == [raw]
+    assert statuses == ['200 OK']
+    middleware.handler.close()
+
+    [capture] = tmp_path.glob('capture.ndjson.*')
+    record = json.loads(capture.read_text(encoding='utf-8'))
+    assert record['status'] == 200
+    assert record['path'] == '/shipping/api/jumpseller/callback'
+    assert 'customer' not in record['body']['request']
+    assert 'ana@example.com' not in capture.read_text(encoding='utf-8')
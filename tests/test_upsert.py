@@ -0,0 +1,129 @@
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture(params=['native', 'fallback'])
+def upsert_db(request, db, monkeypatch):
+    """Cada prueba corre con ON CONFLICT de SQLite y con el SELECT + UPDATE/INSERT genérico"""
+    if request.param == 'fallback':
+        monkeypatch.setattr(db.engine.dialect, 'name', 'generic')
+    return db
+
+
+def quote_values(price=1000, **extra):
+    from app.models import ShippingQuote
+
+    return dict({
+        'session_id': 's1', 'destination_address': 'Av. Providencia 1234', 'distance_km': 5.0,
+        'price_clp': price, 'router_response': '{"first": true}',
+        'dedup_key': ShippingQuote.make_dedup_key('s1', 'Av. Providencia 1234', 1),
+    }, **extra)
+
+
+def test_quote_upsert_counts_hits_on_same_row(upsert_db):
+    from app.models import ShippingQuote
+
+    first_id = ShippingQuote.upsert(upsert_db.session, quote_values())
+    upsert_db.session.commit()
+    second_id = ShippingQuote.upsert(upsert_db.session, quote_values(price=1500, router_response='{}'))
+    third_id = ShippingQuote.upsert(upsert_db.session, quote_values(price=1500))
+    upsert_db.session.commit()
+
+    assert first_id == second_id == third_id
+    quote = upsert_db.session.get(ShippingQuote, first_id)
+    assert quote.hit_count == 3
+    # Se refresca el precio y se conserva la primera respuesta del router
+    assert quote.price_clp == 1500
+    assert quote.router_response == '{"first": true}'
+    assert ShippingQuote.query.count() == 1
+
+
+def test_dedup_key_normalizes_destination():
+    from app.models import ShippingQuote
+
+    assert (ShippingQuote.make_dedup_key('s1', ' Av.  PROVIDENCIA 1234 ', 1)
+            == ShippingQuote.make_dedup_key('s1', 'av. providencia 1234', 1))
+    assert ShippingQuote.make_dedup_key('s1', 'x', 1) != ShippingQuote.make_dedup_key('s2', 'x', 1)
+
+
+def test_distinct_keys_insert_rows(upsert_db):
+    from app.models import ShippingQuote
+
+    ids = {
+        ShippingQuote.upsert(upsert_db.session, quote_values(
+            dedup_key=ShippingQuote.make_dedup_key(session, 'Av. Providencia 1234', 1), session_id=session))
+        for session in ('s1', 's2', 's3')
+    }
+    upsert_db.session.commit()
+
+    assert len(ids) == 3
+    assert {q.hit_count for q in ShippingQuote.query} == {1}
+
+
+def test_google_usage_adds_counts(upsert_db):
+    from app.models import GoogleApiUsage
+
+    day = date(2026, 3, 2)
+    with upsert_db.engine.begin() as conn:
+        GoogleApiUsage.upsert(conn, day, 'callback', 'distance_matrix', 'OK', 'none', 2)
+        GoogleApiUsage.upsert(conn, day, 'callback', 'distance_matrix', 'OK', 'none', 3)
+        GoogleApiUsage.upsert(conn, day, 'callback', 'geocode', 'OK', 'none', 1)
+
+    counts = {row.api: row.count for row in GoogleApiUsage.query}
+    assert counts == {'distance_matrix': 5, 'geocode': 1}
+
+
+def test_demand_cells_add_sums(upsert_db):
+    from app.models import QuoteDemandCell
+
+    cell = {'level': 6, 'geohash': '66jcfp', 'day': date(2026, 3, 2), 'lat': -33.43, 'lng': -70.6,
+            'quote_count': 2, 'distance_km_sum': 10.0, 'price_clp_sum': 5000}
+    other = dict(cell, geohash='66jcfq', quote_count=1)
+    with upsert_db.engine.begin() as conn:
+        QuoteDemandCell.upsert_many(conn, [cell, other])
+        QuoteDemandCell.upsert_many(conn, [cell])
+
+    rows = {row.geohash: row for row in QuoteDemandCell.query}
+    assert (rows['66jcfp'].quote_count, rows['66jcfp'].distance_km_sum, rows['66jcfp'].price_clp_sum) \
+        == (4, 20.0, 10000)
+    assert rows['66jcfq'].quote_count == 1
+
+
+def test_address_suggestions_add_or_replace_hits(upsert_db):
+    from app.models import AddressSuggestion
+
+    row = {'address_key': AddressSuggestion.make_address_key('lyon 1'), 'formatted_address': 'Lyon 1',
+           'lat': -33.4, 'lng': -70.6, 'granularity': 'PREMISE', 'validation_level': 'accept',
+           'confidence': 0.9, 'location_type': 'ROOFTOP', 'place_id': 'p1', 'hit_count': 2}
+    with upsert_db.engine.begin() as conn:
+        AddressSuggestion.upsert_many(conn, [row])
+        AddressSuggestion.upsert_many(conn, [dict(row, formatted_address='Lyon 1, Providencia')])
+    suggestion = AddressSuggestion.query.one()
+    assert (suggestion.hit_count, suggestion.formatted_address) == (4, 'Lyon 1, Providencia')
+
+    with upsert_db.engine.begin() as conn:
+        AddressSuggestion.upsert_many(conn, [dict(row, hit_count=7)], replace_hits=True)
+    upsert_db.session.expire_all()
+    assert AddressSuggestion.query.one().hit_count == 7
+
+
+def test_dedup_script_merges_into_live_row(db):
+    import dedup_quotes
+    from app.models import ShippingQuote
+
+    history = dict(quote_values(), dedup_key=None, shipping_method_id=None)
+    db.session.add_all([ShippingQuote(**history) for _ in range(3)] +
+                       [ShippingQuote(**dict(history, session_id=None))])
+    db.session.commit()
+    # El servicio ya escribió la fila deduplicada de esa clave
+    live_id = ShippingQuote.upsert(db.session, quote_values(
+        dedup_key=ShippingQuote.make_dedup_key('s1', 'Av. Providencia 1234', None)))
+    db.session.commit()
+
+    assert dedup_quotes.dedup(dry_run=True) == (3, 3, 1)
+    assert dedup_quotes.dedup() == (3, 3, 1)
+    db.session.expire_all()
+    assert db.session.get(ShippingQuote, live_id).hit_count == 4
+    assert ShippingQuote.query.count() == 2
+    assert dedup_quotes.dedup() == (0, 0, 0)
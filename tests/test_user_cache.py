@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.services.cache_admin import invalidation_sync
+from app.services.user_cache import ADMIN_USER_TIER, AdminUserCache, SessionUser
+
+ADMIN_URL = '/shipping/admin/api/cache'
+
+
+@pytest.fixture(autouse=True)
+def fresh_sync():
+    """Cada prueba parte sin invalidaciones aplicadas"""
+    invalidation_sync.last_id = None
+    invalidation_sync.started_at = datetime.utcnow() - timedelta(seconds=1)
+    invalidation_sync.checked_at = 0.0
+
+
+def admin_get(client):
+    return client.get(ADMIN_URL).status_code
+
+
+def published(db):
+    return db.session.execute(text(
+        "SELECT value FROM cache_invalidations WHERE tier = :tier"), {'tier': ADMIN_USER_TIER}).scalars().all()
+
+
+def test_deactivation_in_other_worker_propagates(admin_client, db):
+    assert admin_get(admin_client) == 200
+
+    # Otro worker desactiva al usuario: aquí solo llega la fila de cache_invalidations
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE admin_users SET is_active = 0"))
+    invalidation_sync.checked_at = 0.0
+    # Sin invalidación publicada se sigue sirviendo la entrada dentro del TTL
+    assert admin_get(admin_client) == 200
+
+    with db.engine.begin() as conn:
+        user_id = conn.execute(text("SELECT id FROM admin_users")).scalar()
+        conn.execute(text("INSERT INTO cache_invalidations (tier, kind, value, created_at) "
+                          "VALUES (:tier, 'key', :value, :now)"),
+                     {'tier': ADMIN_USER_TIER, 'value': str(user_id), 'now': datetime.utcnow()})
+    invalidation_sync.checked_at = 0.0
+
+    assert admin_get(admin_client) == 302
+
+
+def test_password_change_publishes_and_ends_sessions(admin_client, db):
+    from app.models import AdminUser
+
+    assert admin_get(admin_client) == 200
+    # El login actualiza last_login: eso no publica invalidaciones
+    assert published(db) == []
+
+    user = AdminUser.query.one()
+    user.set_password('otra')
+    db.session.commit()
+
+    assert published(db) == [str(user.id)]
+    assert admin_get(admin_client) == 302
+
+
+def test_legacy_session_id_is_rejected(app, db):
+    cache = AdminUserCache(ttl=60)
+    with app.test_request_context():
+        assert cache.load('1') is None
+        assert cache.load('abc.def') is None
+
+
+def test_db_error_never_serves_expired_entry(app, monkeypatch):
+    cache = AdminUserCache(ttl=0)
+    cache.entries[1] = (0.0, SessionUser(1, 'admin', True, 'fp'))
+
+    def broken(user_id):
+        raise RuntimeError('BD caída')
+
+    monkeypatch.setattr(cache, '_fetch', broken)
+    with app.test_request_context():
+        with pytest.raises(RuntimeError):
+            cache.load('1.fp')
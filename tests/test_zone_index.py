@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from app.services.zone_index import PolygonZoneIndex, parse_polygon
+
+OUTER = [[0, 0], [0, 10], [10, 10], [10, 0]]
+HOLE = [[4, 4], [4, 6], [6, 6], [6, 4]]
+ISLAND = [[4.5, 4.5], [4.5, 5.5], [5.5, 5.5], [5.5, 4.5]]
+
+
+def build(*zones, cell_size=1.0):
+    index = PolygonZoneIndex(cell_size_deg=cell_size)
+    index.build([
+        {'id': zone_id, 'name': str(zone_id), 'price_clp': price, 'polygon': polygon, 'origin_id': None}
+        for zone_id, price, polygon in zones
+    ])
+    return index
+
+
+def found(index, lat, lng):
+    match = index.find(lat, lng)
+    return match.id if match else None
+
+
+def test_parse_polygon_formats():
+    assert parse_polygon(OUTER) == [[tuple(map(float, p)) for p in OUTER]]
+    assert len(parse_polygon(json.dumps([OUTER, HOLE]))) == 2
+    # GeoJSON repite el primer punto al final y anida polígonos en multipolígonos
+    multi = [[OUTER + [OUTER[0]], HOLE], [[[20, 20], [20, 21], [21, 21]]]]
+    rings = parse_polygon(multi)
+    assert [len(ring) for ring in rings] == [4, 4, 3]
+
+    with pytest.raises(ValueError):
+        parse_polygon([[0, 0], [1, 1]])
+    with pytest.raises(ValueError):
+        parse_polygon([[0, 0], [1, 1], [95, 0]])
+
+
+def test_point_in_hole_is_outside_zone():
+    index = build((1, 1000, [OUTER, HOLE]))
+
+    assert found(index, 2, 2) == 1
+    assert found(index, 5, 5) is None
+    assert found(index, 11, 11) is None
+
+
+def test_island_inside_hole_is_inside_zone():
+    index = build((1, 1000, [OUTER, HOLE, ISLAND]))
+
+    assert found(index, 4.2, 4.2) is None
+    assert found(index, 5, 5) == 1
+
+
+def test_geojson_multipolygon_parts():
+    index = build((1, 1000, [[OUTER, HOLE], [[[20, 20], [20, 21], [21, 21], [21, 20]]]]))
+
+    assert found(index, 20.5, 20.5) == 1
+    assert found(index, 2, 2) == 1
+    assert found(index, 5, 5) is None
+
+
+def test_smallest_zone_wins_with_holes_subtracted():
+    # La zona con agujero (100 - 4) sigue siendo mayor que la zona de 5x5 que la cruza
+    index = build((1, 1000, [OUTER, HOLE]), (2, 2000, [[1, 1], [1, 6], [6, 6], [6, 1]]))
+
+    assert found(index, 2, 2) == 2
+    assert found(index, 8, 8) == 1
+    # Dentro del agujero solo queda la zona pequeña
+    assert found(index, 4.5, 4.5) == 2
+
+
+def test_large_zone_checked_linearly():
+    index = build((1, 1000, [OUTER, HOLE]), cell_size=0.01)
+
+    assert index.large_entries
+    assert found(index, 2, 2) == 1
+    assert found(index, 5, 5) is None
+
+
+def test_polygon_index_follows_config_version(app, db):
+    from app.models import ShippingZone
+    from app.routes.shipping import get_polygon_index
+    from app.services.config_cache import config_cache
+
+    zone = ShippingZone(zone_type='polygon', name='A', min_km=0, max_km=0, price_clp=1000,
+                        polygon=json.dumps([OUTER]))
+    db.session.add(zone)
+    db.session.commit()
+    config_cache.invalidate()
+
+    assert get_polygon_index().find(5, 5).id == zone.id
+
+    # Cambio hecho por otro worker en el mismo segundo y con el mismo precio: sin
+    # invalidate_polygon_index, solo cambia la versión (config_version)
+    version = config_cache.current_version()
+    zone.polygon = json.dumps([OUTER, HOLE])
+    db.session.commit()
+    config_cache.invalidate()
+
+    assert config_cache.current_version() != version
+    assert get_polygon_index().find(5, 5) is None
+
+    zone.name = 'B'
+    db.session.commit()
+    config_cache.invalidate()
+
+    assert get_polygon_index().find(2, 2).name == 'B'